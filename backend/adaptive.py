@@ -0,0 +1,136 @@
+"""
+Adaptive frame sampling with early exit.
+
+Instead of always decoding and scoring the fixed 10-frame grid, a clip is
+first scored from a coarse subset of that grid. When the GRU score is far
+from the threshold the clip is settled there; only ambiguous clips pay for
+the remaining frames, and with a larger budget for extra shifted grids
+whose scores are averaged in.
+
+The policy is a generator so the same logic drives both the synchronous
+path (model.predict_video) and the batched async one (InferenceBatcher). It
+yields requests and receives their results:
+
+    ("frames", (slots, offset))  -> (len(slots), 2048) features for those
+                                    positions of the grid shifted by `offset`
+    ("score", sequence)          -> raw sigmoid score of a (10, 2048) sequence
+
+and returns the final raw score.
+
+The coarse score comes from repeated frames the head was never trained on,
+so ADAPTIVE_MARGIN has to be calibrated: benchmarks/bench_adaptive.py
+measures how often early exits agree with the full grid. Off by default.
+"""
+import os
+
+import numpy as np
+
+from metrics import Counter
+
+ADAPTIVE_SAMPLING = os.getenv("ADAPTIVE_SAMPLING", "0") == "1"
+# Frames scored before the first early-exit check
+ADAPTIVE_COARSE_FRAMES = int(os.getenv("ADAPTIVE_COARSE_FRAMES", "4"))
+# A score at least this far from the threshold is treated as conclusive
+ADAPTIVE_MARGIN = float(os.getenv("ADAPTIVE_MARGIN", "0.3"))
+# Max frames decoded per clip; every 10 above the first grid buys one extra shifted grid
+ADAPTIVE_MAX_FRAMES = int(os.getenv("ADAPTIVE_MAX_FRAMES", "10"))
+
+# Grid shifts (fraction of the sample spacing) for the extra passes
+_EXTRA_OFFSETS = (0.5, 0.25, 0.75)
+
+ADAPTIVE_EXITS = Counter("deepfake_adaptive_exits_total",
+                         "Adaptive predictions by the pass they stopped at (coarse, full, extended)", ["stage"])
+ADAPTIVE_FRAMES = Counter("deepfake_adaptive_frames_total", "Frames decoded and scored by adaptive sampling")
+
+
+def adaptive_signature():
+    """Settings that change adaptive results, for cache fingerprints."""
+    if not ADAPTIVE_SAMPLING:
+        return "off"
+    return f"{ADAPTIVE_COARSE_FRAMES}/{ADAPTIVE_MARGIN}/{ADAPTIVE_MAX_FRAMES}"
+
+
+def coarse_slots(num_coarse, num_frames=10):
+    """Evenly spread positions of the `num_frames` grid, always including both ends."""
+    num_coarse = max(2, min(num_coarse, num_frames))
+    return sorted(set(np.linspace(0, num_frames - 1, num_coarse).round().astype(int).tolist()))
+
+
+def fill_sequence(features, slots, num_frames=10):
+    """
+    Stretch features for a subset of grid positions to a full (num_frames, 2048)
+    sequence by repeating the nearest scored frame, so the GRU head sees the
+    clip at the timestep count it was trained on.
+    """
+    slots = np.asarray(slots)
+    nearest = np.abs(np.arange(num_frames)[:, None] - slots[None, :]).argmin(axis=1)
+    return np.asarray(features)[nearest]
+
+
+def is_conclusive(score, threshold, margin=ADAPTIVE_MARGIN):
+    return abs(score - threshold) >= margin
+
+
+def _spread(items, count):
+    """`count` evenly spread entries of `items`."""
+    if count >= len(items):
+        return list(items)
+    return [items[i] for i in np.linspace(0, len(items) - 1, count).round().astype(int)] if count > 0 else []
+
+
+def adaptive_score(threshold, num_frames=10, coarse=ADAPTIVE_COARSE_FRAMES, margin=ADAPTIVE_MARGIN,
+                   max_frames=ADAPTIVE_MAX_FRAMES):
+    """Policy generator; see the module docstring for the protocol."""
+    features = np.zeros((num_frames, 2048), dtype=np.float32)
+    scored = []
+    slots = coarse_slots(min(coarse, max_frames), num_frames)
+    if len(slots) < num_frames:
+        features[slots] = yield "frames", (slots, 0.0)
+        scored = slots
+        score = yield "score", fill_sequence(features[scored], scored, num_frames)
+        if is_conclusive(score, threshold, margin) or len(scored) >= max_frames:
+            ADAPTIVE_FRAMES.inc(len(scored))
+            ADAPTIVE_EXITS.inc(stage="coarse")
+            return score
+
+    # Ambiguous: fill in the rest of the regular grid, as far as the budget
+    # allows (with the whole grid this is the non-adaptive result)
+    rest = _spread([i for i in range(num_frames) if i not in scored], max_frames - len(scored))
+    features[rest] = yield "frames", (rest, 0.0)
+    scored = sorted(scored + rest)
+    score = yield "score", fill_sequence(features[scored], scored, num_frames)
+    used = len(scored)
+    if is_conclusive(score, threshold, margin) or used + num_frames > max_frames:
+        ADAPTIVE_FRAMES.inc(used)
+        ADAPTIVE_EXITS.inc(stage="full")
+        return score
+
+    # Still ambiguous and budget left: average in shifted grids
+    scores = [score]
+    for offset in _EXTRA_OFFSETS:
+        if used + num_frames > max_frames:
+            break
+        extra = yield "frames", (list(range(num_frames)), offset)
+        scores.append((yield "score", extra))
+        used += num_frames
+        if is_conclusive(float(np.mean(scores)), threshold, margin):
+            break
+    ADAPTIVE_FRAMES.inc(used)
+    ADAPTIVE_EXITS.inc(stage="extended")
+    return float(np.mean(scores))
+
+
+def run_adaptive(policy, extract, classify):
+    """
+    Drive `policy` synchronously.
+
+    Args:
+        extract: (slots, offset) -> (len(slots), 2048) features
+        classify: (10, 2048) sequence -> raw score
+    """
+    try:
+        kind, arg = next(policy)
+        while True:
+            kind, arg = policy.send(extract(*arg) if kind == "frames" else classify(arg))
+    except StopIteration as stop:
+        return stop.value
@@ -1,19 +1,128 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from model import predict_video
-import shutil
-import uuid
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from contextlib import AsyncExitStack, asynccontextmanager
+from fastapi.concurrency import run_in_threadpool
+from batching import InferenceBatcher
+from worker_pool import InferencePool, PoolFullError
+from result_cache import ResultCache, RESULT_CACHE_MONGO
+from model import get_feature_cache, preprocess_capture, warmup
+from engines import get_engine
+from batch_scoring import BatchJobManager
+from windowed import WINDOWED_MIN_DURATION_SEC, WINDOWED_MAX_DURATION_SEC
+from probe import InvalidVideo, PROBE_HEAD_BYTES, probe_bytes, probe_video, validate_video
+from jobs import JobRunner, JobQueueFull, create_job_queue, new_job, public_view, is_finished
+from logger import get_logger
+import metrics
+from metrics import span, ERRORS, PREDICTIONS, REQUEST_SECONDS
+from ingest import TempUpload, StreamingUpload, UploadTooLarge, save_upload, decode_stream, MAX_UPLOAD_BYTES
+import asyncio
+import json
 import os
-from database.config import db
+import time
+from datetime import datetime
+from functools import partial
+from pydantic import BaseModel
+from database.config import get_db
 from database.schemas import Prediction
+from database.writer import PredictionWriter
+from database.queries import (
+    ensure_indexes, build_filter, build_projection, encode_cursor, serialize,
+    PREDICTION_SORT, MAX_PAGE_SIZE
+)
+
+log = get_logger("api")
+
+# Shares Xception/GRU forward passes across concurrent requests
+batcher = InferenceBatcher()
+
+# Bounded pool that keeps decode/preprocessing off the event loop
+inference_pool = InferencePool()
+
+# Re-uploads of the same file (by SHA-256) skip decoding and inference;
+# its MongoDB tier is attached at startup, with the worker's client
+result_cache = ResultCache()
+
+# Write-behind persistence of Prediction records (batched, journaled on outage);
+# the collection is attached at startup too
+prediction_writer = PredictionWriter(None)
+
+# Offline re-scoring of server-side video archives (/batch)
+batch_jobs = BatchJobManager()
+# /batch only reads videos under this directory, and is off until it is set
+BATCH_INPUT_ROOT = os.getenv("BATCH_INPUT_ROOT")
+
+# Async /predict jobs (?mode=async); JOB_BACKEND=redis shares them between workers
+job_queue = create_job_queue()
+# Async uploads outlive their request, so they get their own directory
+JOB_UPLOAD_DIR = os.path.join("uploads", "jobs")
+# SSE keep-alive comment interval (keeps proxies from closing idle streams)
+SSE_KEEPALIVE_SEC = 15
+
+# Load and warm both models at startup instead of on the first /predict
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+readiness = {"ready": False, "error": None}
+
+
+async def _prepare_database():
+    # In the background: with MongoDB down, these would hold up startup for
+    # the whole server selection timeout, and nothing else needs the database
+    try:
+        await ensure_indexes(get_db())
+    except Exception as e:
+        # History queries still work without indexes, just slower
+        log.warning(f"Could not create MongoDB indexes: {e}")
+    await result_cache.purge_stale()
+
+
+async def _warmup():
+    try:
+        await run_in_threadpool(warmup)
+        readiness["ready"] = True
+    except Exception as e:
+        readiness["error"] = str(e)
+        log.error(f"Model warmup failed: {e}")
+
 
 # ============================================================
 #  FastAPI Setup
 # ============================================================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The Motor client is made here, in the worker, never before serve.py forks
+    db = get_db()
+    result_cache.collection = db.result_cache if RESULT_CACHE_MONGO else None
+    prediction_writer.collection = db.predictions
+    batcher.start()
+    prediction_writer.start()
+    batch_jobs.start()
+    job_runner.start()
+    database_task = asyncio.create_task(_prepare_database())
+    fingerprint_task = asyncio.create_task(result_cache.watch())
+    warmup_task = None
+    if WARMUP_ON_STARTUP:
+        # Warm in the background so "/" answers right away; "/ready" flips when done
+        warmup_task = asyncio.create_task(_warmup())
+    else:
+        readiness["ready"] = True
+    yield
+    for task in (database_task, fingerprint_task, warmup_task):
+        if task is not None and not task.done():
+            task.cancel()
+    await job_runner.stop()
+    await job_queue.close()
+    await prediction_writer.stop()
+    await run_in_threadpool(batch_jobs.stop)
+    batcher.stop()
+    inference_pool.shutdown()
+    get_feature_cache().flush()
+
+
 app = FastAPI(
     title="DeepFake Detection API",
     description="Upload a video (.mp4) to detect whether it is REAL or FAKE using the Xception-GRU model.",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
 # Enable CORS for frontend connection
@@ -35,68 +144,552 @@ async def predict(
     duration: float = Form(None),
     user_email: str = Form(None),
     user_name: str = Form(None),
-    user_profile: str = Form(None)
+    user_profile: str = Form(None),
+    mode: str = Query("sync", pattern="^(sync|async)$", description="async: return a job id right away")
 ):
     # Accept any video/* content-type. Some clients may send variations like
     # 'video/mp4; codecs="avc1.42E01E"' or similar, so use startswith.
-    print(file)
     if not file or not (file.content_type and file.content_type.startswith("video/")):
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload a video file (e.g. .mp4).")
 
-    if duration is not None and duration > 30:
-        raise HTTPException(status_code=400, detail="Video duration exceeds 30 seconds limit.")
+    # Longer than WINDOWED_MIN_DURATION_SEC is fine: those are scored in windows
+    if duration is not None and duration > WINDOWED_MAX_DURATION_SEC:
+        raise HTTPException(status_code=400, detail=f"Video duration exceeds {WINDOWED_MAX_DURATION_SEC:g} seconds limit.")
+
+    if mode == "async":
+        return await _submit_job(file, duration, user_email, user_name, user_profile)
     
-    # Ensure uploads directory exists
-    os.makedirs("uploads", exist_ok=True)
+    try:
+        start = time.perf_counter()
+        response = await _run_prediction(file, duration, user_email, user_name, user_profile)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint="predict")
+        return response
+    except PoolFullError as e:
+        ERRORS.inc(stage="queue_full")
+        # Shed load instead of letting latency grow without limit
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+async def _run_prediction(file, duration, user_email, user_name, user_profile):
+    # Unique temp file under uploads/, removed on every exit path
+    with TempUpload() as upload:
+        try:
+            # Save the uploaded file temporarily (blocking I/O, so off the event loop)
+            with span("upload_write"):
+                digest = await run_in_threadpool(save_upload, file.file, upload.path)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        info = await _inspect_upload(upload.path)
+        try:
+            # Admitted only now that the upload is on disk: a slow client never holds a slot
+            async with inference_pool.slot():
+                label, confidence, details = await _score_upload(upload.path, digest, info)
+            return await _record_prediction(file.filename, label, confidence, info["duration"] or duration,
+                                            user_email, user_name, user_profile, details)
 
-    # Generate a unique filename to avoid collisions
-    filename = f"uploads/temp_{uuid.uuid4()}.mp4"
+        except (HTTPException, PoolFullError):
+            raise
+        except Exception as e:
+            ERRORS.inc(stage="predict")
+            log.error(f"Prediction failed for {file.filename}: {e}")
+            # Return a proper 500 to the client with a concise message
+            raise HTTPException(status_code=500, detail=str(e))
 
-    # Save the uploaded file temporarily
-    with open(filename, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
 
+async def _inspect_upload(path, max_duration=WINDOWED_MAX_DURATION_SEC):
+    """
+    Container metadata of a saved upload, read from its headers before any
+    decode or model work. Corrupt, empty or oversized videos are a 400.
+    """
     try:
-        # Run model inference
-        label, confidence = predict_video(filename)
-
-        # Clean up temporary file
-        os.remove(filename)
-        
-        # Save to MongoDB
-        prediction = Prediction(
-            filename=file.filename,
-            label=label,
-            confidence=float(confidence),
-            duration=float(duration) if duration is not None else None,
-            user_email=user_email,
-            user_name=user_name,
-            user_profile=user_profile
-        )
-        await db.predictions.insert_one(prediction.dict())
-        
-        # Log and return
-        print(f"[INFO] Prediction complete: {file.filename} → {label} ({confidence})")
-        return {"label": label, "confidence": confidence}
+        with span("probe"):
+            info = validate_video(await run_in_threadpool(probe_video, path))
+    except InvalidVideo as e:
+        ERRORS.inc(stage="probe")
+        raise HTTPException(status_code=400, detail=f"Invalid video: {e}")
+    if info["duration"] > max_duration:
+        ERRORS.inc(stage="probe")
+        raise HTTPException(status_code=400, detail=f"Video duration exceeds {max_duration:g} seconds limit.")
+    return info
 
-    except Exception as e:
-        print(f"[ERROR] {e}")
-        # Return a proper 500 to the client with a concise message
-        raise HTTPException(status_code=500, detail=str(e))
-    
+
+async def _score_upload(path, digest, info):
+    """(label, confidence, details); `details` holds the window timeline for long videos, else None."""
+    cached = await result_cache.get(digest)
+    if cached is not None:
+        return cached
+    # Routed on the probed duration, not the one the client sent
+    if info["duration"] > WINDOWED_MIN_DURATION_SEC:
+        # Scored window by window; the timeline is cached with the verdict
+        result = await batcher.predict_windowed(path, info=info, executor=inference_pool.thread_executor)
+        label, confidence = result["label"], result["confidence"]
+        details = {k: result[k] for k in ("windows", "aggregate", "timeline")}
+    else:
+        # Run model inference: decode on the worker pool, CNN/GRU batched
+        # with other in-flight requests; the header probed above isn't read again
+        label, confidence = await batcher.predict_video(path, executor=inference_pool.executor, info=info)
+        details = None
+    await result_cache.put(digest, label, confidence, details)
+    return label, confidence, details
+
+
+async def _record_prediction(filename, label, confidence, duration, user_email, user_name, user_profile,
+                             details=None):
+    # Save to MongoDB
+    prediction = Prediction(
+        filename=filename,
+        label=label,
+        confidence=float(confidence),
+        duration=float(duration) if duration is not None else None,
+        user_email=user_email,
+        user_name=user_name,
+        user_profile=user_profile
+    )
+    # Written in the background; Mongo latency/outages don't affect the response
+    prediction_writer.enqueue(prediction.dict())
+    PREDICTIONS.inc(label=label)
     
+    # Log and return
+    log.debug(f"Prediction complete: {filename} → {label} ({confidence})")
+    return {"label": label, "confidence": confidence, **(details or {})}
+
+
 # ============================================================
-#  Get All Predictions
+#  Async prediction jobs
 # ============================================================
+async def _submit_job(file, duration, user_email, user_name, user_profile):
+    # Kept on disk until a job worker has scored it
+    upload = TempUpload(directory=JOB_UPLOAD_DIR)
+    try:
+        with span("upload_write"):
+            digest = await run_in_threadpool(save_upload, file.file, upload.path)
+    except UploadTooLarge as e:
+        upload.cleanup()
+        raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        upload.cleanup()
+        raise
+    try:
+        # Reject bad files now rather than as a failed job later
+        info = await _inspect_upload(upload.path)
+    except BaseException:
+        upload.cleanup()
+        raise
+
+    job = new_job({
+        "path": upload.path,
+        "digest": digest,
+        "filename": file.filename,
+        "duration": info["duration"] or duration,
+        "user_email": user_email,
+        "user_name": user_name,
+        "user_profile": user_profile,
+    })
+    try:
+        await job_queue.submit(job)
+    except JobQueueFull as e:
+        upload.cleanup()
+        ERRORS.inc(stage="queue_full")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception:
+        upload.cleanup()
+        raise
+    return JSONResponse(status_code=202, content=public_view(job), headers={"Location": f"/jobs/{job['id']}"})
+
+
+async def _process_job(job):
+    request = job["payload"]
+    try:
+        info = await _inspect_upload(request["path"])
+        label, confidence, details = await _score_upload(request["path"], request["digest"], info)
+    finally:
+        if os.path.exists(request["path"]):
+            os.remove(request["path"])
+    return await _record_prediction(request["filename"], label, confidence, request["duration"],
+                                    request["user_email"], request["user_name"], request["user_profile"], details)
+
+
+job_runner = JobRunner(job_queue, _process_job)
+
+
+async def _get_job(job_id):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of an async prediction; `result` holds {label, confidence} once completed."""
+    return public_view(await _get_job(job_id))
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: one `status` event per change, then `result` (or `error`) and the stream ends."""
+    job = await _get_job(job_id)
+
+    async def stream():
+        current = job
+        last_status = None
+        while current is not None:
+            if is_finished(current):
+                event = "result" if current["status"] == "completed" else "error"
+                yield f"event: {event}\ndata: {json.dumps(public_view(current))}\n\n"
+                return
+            if current["status"] != last_status:
+                last_status = current["status"]
+                yield f"event: status\ndata: {json.dumps(public_view(current))}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            current = await job_queue.wait(job_id, SSE_KEEPALIVE_SEC)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# ============================================================
+#  Streaming Prediction Endpoint
+# ============================================================
+@app.post("/predict/stream")
+async def predict_stream(
+    request: Request,
+    filename: str = Query("upload.mp4"),
+    duration: float = Query(None),
+    user_email: str = Query(None),
+    user_name: str = Query(None),
+    user_profile: str = Query(None)
+):
+    """
+    Raw-body upload (Content-Type: video/*, metadata in the query string).
+    Frames are decoded while the body is still arriving instead of after
+    the whole file has been written to disk.
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("video/"):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a video file (e.g. .mp4).")
+
+    # Stream decoding only takes the fixed 10-frame sample; long videos go through /predict
+    if duration is not None and duration > WINDOWED_MIN_DURATION_SEC:
+        raise HTTPException(status_code=400, detail=f"Video duration exceeds {WINDOWED_MIN_DURATION_SEC:g} seconds "
+                                                    "limit; upload longer videos to /predict.")
+
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+
+    try:
+        start = time.perf_counter()
+        response = await _run_stream_prediction(request, filename, duration, user_email, user_name, user_profile)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint="predict_stream")
+        return response
+    except PoolFullError as e:
+        ERRORS.inc(stage="queue_full")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+def _check_stream_info(probe, data):
+    """
+    Probe a streamed upload with `probe(data)` and reject it if the header
+    is unusable or too long for one pass. Returns the header, or None when
+    `probe` finds none.
+    """
+    try:
+        info = probe(data)
+        if info is not None:
+            validate_video(info)
+    except InvalidVideo as e:
+        ERRORS.inc(stage="probe")
+        raise HTTPException(status_code=400, detail=f"Invalid video: {e}")
+    if info is not None and info["duration"] > WINDOWED_MIN_DURATION_SEC:
+        ERRORS.inc(stage="probe")
+        raise HTTPException(status_code=400, detail=f"Video duration exceeds {WINDOWED_MIN_DURATION_SEC:g} seconds "
+                                                    "limit; upload longer videos to /predict.")
+    return info
+
+
+def _check_stream_head(head):
+    """The header from a streamed upload's first bytes, or None when they don't hold all of it."""
+    return _check_stream_info(probe_bytes, bytes(head))
+
+
+async def _start_stream_decode(upload, info, admitted):
+    """
+    Decode from the upload's FIFO while the rest arrives, holding an
+    inference slot in `admitted` (the decoder occupies a pool worker). None
+    when streaming decode is off or no slot is free right away; the file is
+    then decoded once the upload is complete.
+    """
+    if upload.fifo_path is None or not inference_pool.has_free_slot():
+        return None
+    await admitted.enter_async_context(inference_pool.slot())
+    loop = asyncio.get_running_loop()
+    decode = loop.run_in_executor(inference_pool.executor, decode_stream, upload.fifo_path, preprocess_capture, info)
+    decode.add_done_callback(partial(_decode_done, upload))
+    return decode
+
+
+def _decode_done(upload, decode):
+    upload.reader_done()
+    # Mark a decode error as seen: a rejected upload never awaits the result
+    if not decode.cancelled():
+        decode.exception()
+
+
+async def _run_stream_prediction(request, filename, duration, user_email, user_name, user_profile):
+    # Released after the upload's cleanup, which stops a decoder still reading the FIFO
+    async with AsyncExitStack() as admitted:
+        return await _stream_prediction(admitted, request, filename, duration, user_email, user_name, user_profile)
+
+
+async def _stream_prediction(admitted, request, filename, duration, user_email, user_name, user_profile):
+    with StreamingUpload() as upload:
+        upload.start()
+        info = None
+        decode = None
+
+        try:
+            # Includes waiting on the client, so slow links show up here
+            with span("upload_write"):
+                head = bytearray()
+                async for chunk in request.stream():
+                    await upload.feed(chunk)
+                    if head is not None:
+                        head += chunk
+                        if len(head) >= PROBE_HEAD_BYTES:
+                            # Decoding starts once the head is checked, so it samples by the probed frame count
+                            info = _check_stream_head(head)
+                            head = None
+                            decode = await _start_stream_decode(upload, info, admitted)
+                if head:
+                    info = _check_stream_head(head)
+                    decode = await _start_stream_decode(upload, info, admitted)
+                digest = await upload.finish()
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        finally:
+            if decode is not None and not decode.done():
+                # Upload ended early (error or client gone): unblock the decoder
+                upload.reader_done()
+        if info is None:
+            # The head didn't hold the whole header (e.g. MP4 with the moov atom at the end, or
+            # a container probe.py doesn't parse): check the file, as /predict does
+            info = await run_in_threadpool(_check_stream_info, probe_video, upload.path)
+        if decode is None:
+            # Not decoding yet: wait for a slot like /predict, now that the upload is on disk
+            await admitted.enter_async_context(inference_pool.slot())
+
+        try:
+            cached = await result_cache.get(digest)
+            if cached is not None:
+                # Never a long video's: those are refused before upload ends
+                label, confidence, _ = cached
+            else:
+                frames = None
+                if decode is not None:
+                    try:
+                        frames = await decode
+                    except Exception as e:
+                        # e.g. MP4 with the moov atom at the end can't be read from a pipe
+                        log.info(f"Streaming decode unavailable ({e}); decoding from file")
+                if frames is not None:
+                    label, confidence = await batcher.predict_frames(frames)
+                else:
+                    label, confidence = await batcher.predict_video(upload.path, executor=inference_pool.executor,
+                                                                    info=info)
+                await result_cache.put(digest, label, confidence)
+
+            # The probed duration, as for /predict; the client's only when the container has none we can read
+            duration = info["duration"] if info and info["duration"] else duration
+            return await _record_prediction(filename, label, confidence, duration, user_email, user_name, user_profile)
+
+        except Exception as e:
+            ERRORS.inc(stage="predict_stream")
+            log.error(f"Streaming prediction failed for {filename}: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============================================================
+#  Prediction History (keyset-paginated)
+# ============================================================
+def _history_query(user_email, label, since, until, fields, cursor=None):
+    try:
+        return build_filter(user_email, label, since, until, cursor), build_projection(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get("/predictions")
-async def get_predictions():
-    results = []
-    async for doc in db.predictions.find().sort("timestamp", -1):
-        doc["_id"] = str(doc["_id"])  # Convert ObjectId to string
-        results.append(doc)
-    return results
+async def get_predictions(
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    user_email: str = Query(None),
+    label: str = Query(None),
+    since: datetime = Query(None),
+    until: datetime = Query(None),
+    fields: str = Query(None, description="Comma-separated fields to return")
+):
+    query, projection = _history_query(user_email, label, since, until, fields, cursor)
+    docs = await get_db().predictions.find(query, projection).sort(PREDICTION_SORT).limit(limit + 1).to_list(limit + 1)
+
+    # One extra document tells us whether there is another page
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return {"items": [serialize(doc) for doc in docs[:limit]], "next_cursor": next_cursor}
+
+
+@app.get("/predictions/export")
+async def export_predictions(
+    user_email: str = Query(None),
+    label: str = Query(None),
+    since: datetime = Query(None),
+    until: datetime = Query(None),
+    fields: str = Query(None, description="Comma-separated fields to return")
+):
+    """Stream every matching prediction as one JSON array, without buffering it in memory."""
+    query, projection = _history_query(user_email, label, since, until, fields)
+
+    async def stream():
+        yield "["
+        first = True
+        async for doc in get_db().predictions.find(query, projection).sort(PREDICTION_SORT).batch_size(1000):
+            yield ("" if first else ",") + json.dumps(serialize(doc))
+            first = False
+        yield "]"
+
+    return StreamingResponse(stream(), media_type="application/json")
 
     
+# ============================================================
+#  Batch scoring jobs (manifest of server-side paths)
+# ============================================================
+class BatchRequest(BaseModel):
+    paths: list[str]
+    threshold: float | None = None
+    job_id: str | None = None
+
+
+def _resolve_batch_paths(paths):
+    """
+    `paths` resolved against BATCH_INPUT_ROOT (relative ones are taken from
+    there, symlinks followed). Any that end up outside it are a 400.
+    """
+    if not BATCH_INPUT_ROOT:
+        # Otherwise any client could have the server open any file it can read
+        raise HTTPException(status_code=503, detail="/batch is disabled: set BATCH_INPUT_ROOT on the server")
+    if not paths:
+        raise HTTPException(status_code=400, detail="paths must not be empty")
+    root = os.path.realpath(BATCH_INPUT_ROOT)
+    resolved = [os.path.realpath(os.path.join(root, p)) for p in paths]
+    outside = [p for p, real in zip(paths, resolved) if os.path.commonpath([root, real]) != root]
+    if outside:
+        raise HTTPException(status_code=400, detail=f"Paths outside {BATCH_INPUT_ROOT}: {outside[:5]}")
+    return resolved
+
+
+@app.post("/batch", status_code=202)
+def submit_batch(request: BatchRequest):
+    """Queue a manifest for scoring; poll GET /batch/{id} and fetch GET /batch/{id}/results."""
+    paths = _resolve_batch_paths(request.paths)
+    if request.job_id is not None and not request.job_id.replace("-", "").isalnum():
+        raise HTTPException(status_code=400, detail="job_id may only contain letters, digits and '-'")
+    try:
+        job_id = batch_jobs.submit(paths, threshold=request.threshold, job_id=request.job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return batch_jobs.status(job_id)
+
+
+@app.get("/batch/{job_id}")
+def batch_status(job_id: str):
+    job = batch_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown batch job")
+    return job
+
+
+@app.get("/batch/{job_id}/results")
+def batch_results(job_id: str):
+    """JSONL, one line per video scored so far (partial while the job is running)."""
+    if batch_jobs.status(job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown batch job")
+    path = batch_jobs.results_path(job_id)
+
+    def stream():
+        if not os.path.exists(path):
+            return
+        # The job may still be appending: send only the complete lines written so far
+        with open(path, "rb") as f:
+            data = f.read(os.path.getsize(path))
+        yield data[:data.rfind(b"\n") + 1]
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# ============================================================
+#  Inference queue status (for deployment sizing)
+# ============================================================
+@app.get("/queue")
+async def queue_status():
+    return {"pool": inference_pool.stats(), "batcher": batcher.stats(), "jobs": await job_queue.stats()}
+
+
+# ============================================================
+#  Prometheus metrics
+# ============================================================
+@metrics.register_collector
+def _collect_runtime():
+    pool = inference_pool.stats()
+    writer = prediction_writer.stats()
+    results, frames = result_cache.stats(), get_feature_cache().stats()
+    return [
+        ("deepfake_pool_in_flight", "gauge", "Requests holding an inference slot",
+         [({}, pool["in_flight"])]),
+        ("deepfake_pool_queue_depth", "gauge", "Requests waiting for an inference worker",
+         [({}, pool["queue_depth"])]),
+        ("deepfake_pool_rejected_total", "counter", "Requests rejected with 503 because the pool was full",
+         [({}, pool["rejected"])]),
+        ("deepfake_batcher_pending", "gauge", "Items waiting for a shared CNN/GRU batch",
+         [({"stage": "cnn"}, batcher.cnn.pending), ({"stage": "gru"}, batcher.gru.pending)]),
+        ("deepfake_persist_buffered", "gauge", "Prediction records waiting to be written to MongoDB",
+         [({}, writer["buffered"])]),
+        ("deepfake_cache_hits_total", "counter", "Cache hits",
+         [({"cache": "result"}, results["hits"]), ({"cache": "feature"}, frames["hits"])]),
+        ("deepfake_cache_misses_total", "counter", "Cache misses",
+         [({"cache": "result"}, results["misses"]), ({"cache": "feature"}, frames["misses"])]),
+    ]
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    text = metrics.render()
+    try:
+        jobs = await job_queue.stats()
+        text += ("# HELP deepfake_jobs_queued Async prediction jobs waiting for a worker\n"
+                 "# TYPE deepfake_jobs_queued gauge\n"
+                 f"deepfake_jobs_queued {jobs['queued']}\n")
+    except Exception as e:
+        log.warning(f"Could not read job queue stats: {e}")
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+# ============================================================
+#  Persistence status (write-behind buffer and journal)
+# ============================================================
+@app.get("/persistence")
+def persistence_status():
+    return prediction_writer.stats()
+
+
+# ============================================================
+#  Cache status (whole-upload results and per-frame features)
+# ============================================================
+@app.get("/cache")
+def cache_status():
+    return {"results": result_cache.stats(), "frames": get_feature_cache().stats()}
+
+
 # ============================================================
 #  Root route
 # ============================================================
@@ -104,6 +697,17 @@ async def get_predictions():
 def home():
     return {"message": "DeepFake Detection API is running 🚀", "status": "OK"}
 
+
+# ============================================================
+#  Readiness route (models loaded and warmed)
+# ============================================================
+@app.get("/ready")
+def ready():
+    if not readiness["ready"]:
+        detail = readiness["error"] or "Models are still loading"
+        return JSONResponse(status_code=503, content={"ready": False, "detail": detail})
+    return {"ready": True, "engine": get_engine().describe()}
+
 # ============================================================
 #  Run this app using:
 # uvicorn app:app --reload
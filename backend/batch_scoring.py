@@ -0,0 +1,353 @@
+"""
+Offline bulk scoring of video archives.
+
+Videos go through the staged decode pipeline (pipeline.py): worker
+processes decode while the main process runs Xception and the GRU head on
+frames from several videos at once. Results are
+appended to a JSONL file as they complete; that file doubles as the
+checkpoint, so re-running the same command resumes where it stopped.
+
+Usage (from backend/):
+    python batch_scoring.py manifest.txt -o results.jsonl [--workers 4] [--batch-videos 8]
+    python batch_scoring.py manifest.txt -o results.parquet    # needs pyarrow
+
+The manifest is a text file with one video path per line (blank lines and
+lines starting with # are ignored), or a .jsonl file with a "path" field.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from logger import get_logger
+
+log = get_logger("batch")
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+# Videos per CNN/GRU batch (10 frames each)
+BATCH_VIDEOS = int(os.getenv("BATCH_VIDEOS", "8"))
+# Where /batch jobs write their results
+BATCH_RESULTS_DIR = os.getenv("BATCH_RESULTS_DIR", "batch_results")
+
+
+def read_manifest(path):
+    """List of video paths from a .txt (one per line) or .jsonl ({"path": ...}) manifest."""
+    paths = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            paths.append(json.loads(line)["path"] if path.endswith(".jsonl") else line)
+    return paths
+
+
+def _checkpoint_path(output):
+    # Parquet can't be appended to, so progress goes to a JSONL side file
+    return output if output.endswith(".jsonl") else output + ".partial.jsonl"
+
+
+def load_checkpoint(output):
+    """Paths already scored (successfully or not) in a previous run."""
+    done = set()
+    checkpoint = _checkpoint_path(output)
+    if os.path.exists(checkpoint):
+        with open(checkpoint, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["path"])
+                except (ValueError, KeyError):
+                    # Torn last line from an interrupted run
+                    continue
+    return done
+
+
+# ============================================================
+#  Pipelined scorer
+# ============================================================
+def score_paths(paths, output, workers=BATCH_WORKERS, batch_videos=BATCH_VIDEOS,
+                threshold=None, resume=True, progress=None, should_stop=None):
+    """
+    Score `paths` and append one JSON line per video to the checkpoint file.
+
+    Args:
+        progress: optional callback(stats dict) called as videos complete
+        should_stop: optional callable; when it returns True no more videos
+            are started and scoring stops once those in flight finish (the
+            checkpoint keeps what's done)
+
+    Returns:
+        stats dict: total, done, failed, skipped, elapsed_sec, videos_per_sec
+    """
+    # TensorFlow is only loaded here, in the parent; the pipeline's decode
+    # workers are spawned and never import it
+    from batching import BatchStage, BATCH_MAX_WAIT_MS
+    from model import extract_frame_features, classify_features, label_from_score, DEFAULT_THRESHOLD
+    from pipeline import DecodePipeline
+
+    threshold = DEFAULT_THRESHOLD if threshold is None else threshold
+    done_before = load_checkpoint(output) if resume else set()
+    todo = [p for p in paths if p not in done_before]
+    stats = {"total": len(paths), "done": 0, "failed": 0, "skipped": len(paths) - len(todo),
+             "elapsed_sec": 0.0, "videos_per_sec": 0.0}
+
+    checkpoint = _checkpoint_path(output)
+    directory = os.path.dirname(checkpoint)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+
+    # Frames from up to `batch_videos` videos share one Xception pass
+    max_wait = BATCH_MAX_WAIT_MS / 1000.0
+    cnn = BatchStage("batch-cnn", lambda frames: extract_frame_features(frames, batch_size=batch_videos * 10),
+                      batch_videos * 10, max_wait)
+    gru = BatchStage("batch-gru", classify_features, batch_videos, max_wait)
+    pipeline = DecodePipeline(cnn, gru, workers=workers, max_frames=2 * batch_videos * 10)
+
+    with open(checkpoint, "a" if resume else "w", encoding="utf-8") as out:
+        cnn.start()
+        gru.start()
+        pipeline.start()
+        try:
+            pending = {}
+            queue = iter(todo)
+            # Keep a couple of batches' worth of videos in flight so the CNN never waits
+            max_in_flight = max(workers, 2 * batch_videos)
+
+            def refill():
+                while len(pending) < max_in_flight:
+                    path = next(queue, None)
+                    if path is None:
+                        return
+                    pending[pipeline.submit(path)] = path
+
+            refill()
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path = pending.pop(future)
+                    try:
+                        score = future.result()
+                    except Exception as e:
+                        out.write(json.dumps({"path": path, "error": str(e)}) + "\n")
+                        stats["failed"] += 1
+                        continue
+                    label, confidence = label_from_score(score, threshold)
+                    out.write(json.dumps({"path": path, "label": label, "confidence": confidence,
+                                          "score": score}) + "\n")
+                    stats["done"] += 1
+                out.flush()
+                _update_rate(stats, start)
+                if progress is not None:
+                    progress(dict(stats))
+                if should_stop is None or not should_stop():
+                    refill()
+        finally:
+            pipeline.stop()
+            cnn.stop()
+            gru.stop()
+
+    _update_rate(stats, start)
+    if not output.endswith(".jsonl") and stats["done"] + stats["failed"] + stats["skipped"] == stats["total"]:
+        _write_parquet(checkpoint, output)
+    return stats
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _update_rate(stats, start):
+    stats["elapsed_sec"] = round(time.perf_counter() - start, 3)
+    processed = stats["done"] + stats["failed"]
+    stats["videos_per_sec"] = round(processed / stats["elapsed_sec"], 3) if stats["elapsed_sec"] > 0 else 0.0
+
+
+def _write_parquet(checkpoint, output):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow); use a .jsonl output instead")
+    with open(checkpoint, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    columns = ["path", "label", "confidence", "score", "error"]
+    table = pa.table({c: [r.get(c) for r in records] for c in columns})
+    pq.write_table(table, output)
+    os.remove(checkpoint)
+
+
+# ============================================================
+#  Background batch jobs (used by the /batch endpoints)
+# ============================================================
+class BatchJobManager:
+    """
+    Runs submitted manifests one at a time on a background thread.
+
+    Each job writes BATCH_RESULTS_DIR/<job_id>.jsonl; the results file is
+    the checkpoint, so resubmitting the same paths with the same job id
+    after a restart picks up where it stopped. Job state lives in memory and
+    is mirrored to <job_id>.status.json, so every API worker sharing the
+    directory can report on a job, whichever worker runs it.
+    """
+
+    def __init__(self, results_dir=BATCH_RESULTS_DIR, workers=BATCH_WORKERS, batch_videos=BATCH_VIDEOS):
+        self.results_dir = results_dir
+        self.workers = workers
+        self.batch_videos = batch_videos
+        self._jobs = {}
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="batch-jobs", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop after the current CNN batch; unfinished jobs can be resubmitted to resume."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, paths, threshold=None, job_id=None):
+        job_id = job_id or uuid.uuid4().hex
+        with self._lock:
+            current = self._jobs.get(job_id) or self._load_status(job_id)
+            if current is not None and current["status"] in ("queued", "running"):
+                raise ValueError(f"Job {job_id} is already {current['status']}")
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "total": len(paths),
+                "done": 0,
+                "failed": 0,
+                "skipped": 0,
+                "videos_per_sec": 0.0,
+                "error": None,
+                "submitted_at": time.time(),
+                "_paths": list(paths),
+                "_threshold": threshold,
+            }
+            self._queue.append(job_id)
+            self._save_status(self._jobs[job_id])
+        self._wakeup.set()
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                # Submitted to another API worker (or before a restart)
+                return self._load_status(job_id)
+            return {k: v for k, v in job.items() if not k.startswith("_")}
+
+    def results_path(self, job_id):
+        return os.path.join(self.results_dir, f"{job_id}.jsonl")
+
+    def status_path(self, job_id):
+        return os.path.join(self.results_dir, f"{job_id}.status.json")
+
+    def _save_status(self, job):
+        state = {k: v for k, v in job.items() if not k.startswith("_")}
+        state["pid"] = os.getpid()
+        path = self.status_path(job["id"])
+        os.makedirs(self.results_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    def _load_status(self, job_id):
+        try:
+            with open(self.status_path(job_id), encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        pid = state.pop("pid", None)
+        if state["status"] in ("queued", "running") and pid is not None and not _process_alive(pid):
+            # The worker running it is gone; resubmit to resume from the results file
+            state["status"] = "interrupted"
+        return state
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait()
+            with self._lock:
+                job_id = self._queue.popleft() if self._queue else None
+                if not self._queue:
+                    self._wakeup.clear()
+            if job_id is None or self._stopping:
+                continue
+            self._run_job(job_id)
+
+    def _run_job(self, job_id):
+        job = self._jobs[job_id]
+        job["status"] = "running"
+        self._save_status(job)
+
+        def progress(stats):
+            job.update({k: stats[k] for k in ("done", "failed", "skipped", "videos_per_sec")})
+            self._save_status(job)
+
+        try:
+            stats = score_paths(job["_paths"], self.results_path(job_id), workers=self.workers,
+                                batch_videos=self.batch_videos, threshold=job["_threshold"],
+                                progress=progress, should_stop=lambda: self._stopping)
+            progress(stats)
+            finished = stats["done"] + stats["failed"] + stats["skipped"] == stats["total"]
+            job["status"] = "completed" if finished else "interrupted"
+            log.info(f"Batch job {job_id} {job['status']}: {stats['done']} scored, "
+                     f"{stats['failed']} failed ({stats['videos_per_sec']:.2f} videos/sec)")
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            log.error(f"Batch job {job_id} failed: {e}")
+        finally:
+            # Paths can be large; the results file is the record from here on
+            job.pop("_paths", None)
+            self._save_status(job)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest")
+    parser.add_argument("-o", "--output", required=True, help=".jsonl or .parquet")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="decode processes")
+    parser.add_argument("--batch-videos", type=int, default=BATCH_VIDEOS, help="videos per CNN batch")
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--no-resume", action="store_true", help="start over instead of resuming")
+    args = parser.parse_args()
+
+    paths = read_manifest(args.manifest)
+
+    def report(stats):
+        processed = stats["done"] + stats["failed"] + stats["skipped"]
+        print(f"  {processed}/{stats['total']} videos  ({stats['videos_per_sec']:.2f} videos/sec, "
+              f"{stats['failed']} failed)", flush=True)
+
+    print(f"[INFO] Scoring {len(paths)} videos with {args.workers} decode workers")
+    stats = score_paths(paths, args.output, workers=args.workers, batch_videos=args.batch_videos,
+                        threshold=args.threshold, resume=not args.no_resume, progress=report)
+    print(f"✅ Done: {stats['done']} scored, {stats['failed']} failed, {stats['skipped']} already done "
+          f"in {stats['elapsed_sec']:.1f}s ({stats['videos_per_sec']:.2f} videos/sec)")
+
+
+if __name__ == "__main__":
+    main()
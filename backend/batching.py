@@ -0,0 +1,259 @@
+import asyncio
+import functools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+from adaptive import ADAPTIVE_SAMPLING, adaptive_score
+from pipeline import DECODE_PIPELINE, DecodePipeline
+from windowed import WindowAccumulator, build_result, iter_frame_chunks
+from model import extract_frame_features, classify_features, label_from_score, preprocess_video, DEFAULT_THRESHOLD
+from preprocessing import frame_buffers, video_info
+
+# Scheduler limits (rows = frames for the CNN stage, sequences for the GRU stage)
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+
+# Frames sampled per video (the GRU head is built for 10 timesteps)
+NUM_FRAMES = 10
+
+
+# ============================================================
+#  Generic micro-batching stage
+# ============================================================
+class BatchStage:
+    """
+    Background thread that collects work items from many callers into one batch.
+
+    Each submitted item is a numpy array whose first axis is the row axis. The
+    worker waits for the first item, then keeps collecting until either
+    `max_batch_size` rows are queued or `max_wait` seconds have passed since the
+    first item arrived. The concatenated batch goes through `run_batch` once and
+    each caller's Future receives its own slice of the output.
+    """
+
+    def __init__(self, name, run_batch, max_batch_size, max_wait):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self.batches_run = 0
+        self.rows_run = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def submit(self, rows):
+        future = Future()
+        self._queue.put((rows, future))
+        return future
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        pending = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish the current batch, then exit on the next loop
+                self._queue.put(None)
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _loop(self):
+        while True:
+            pending = self._collect()
+            if pending is None:
+                return
+            # Skip callers that gave up (e.g. client disconnected)
+            pending = [(rows, fut) for rows, fut in pending if fut.set_running_or_notify_cancel()]
+            if not pending:
+                continue
+            try:
+                outputs = self.run_batch(np.concatenate([rows for rows, _ in pending], axis=0))
+            except Exception as e:
+                for _, fut in pending:
+                    fut.set_exception(e)
+                continue
+            self.batches_run += 1
+            start = 0
+            for rows, fut in pending:
+                fut.set_result(outputs[start:start + len(rows)])
+                start += len(rows)
+            self.rows_run += start
+
+
+# ============================================================
+#  Cross-request inference scheduler
+# ============================================================
+class InferenceBatcher:
+    """
+    Shares Xception and GRU forward passes across concurrent /predict requests.
+
+    Frames from every in-flight request are pooled into shared CNN batches, and
+    the resulting feature sequences are pooled again into shared GRU batches.
+    """
+
+    def __init__(self, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, pipeline=DECODE_PIPELINE):
+        max_wait = max_wait_ms / 1000.0
+        self.cnn = BatchStage("cnn-batcher", self._run_cnn, max_batch_size, max_wait)
+        self.gru = BatchStage("gru-batcher", classify_features, max_batch_size, max_wait)
+        self.max_batch_size = max_batch_size
+        # Decode processes streaming frames into the stages above (DECODE_PIPELINE=1)
+        self.pipeline = DecodePipeline(self.cnn, self.gru) if pipeline else None
+
+    def _run_cnn(self, frames):
+        return extract_frame_features(frames, batch_size=self.max_batch_size)
+
+    def start(self):
+        self.cnn.start()
+        self.gru.start()
+        if self.pipeline is not None:
+            self.pipeline.start()
+
+    def stop(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        self.cnn.stop()
+        self.gru.stop()
+
+    async def extract_features(self, frames):
+        """Xception features for (num_frames, 299, 299, 3) frames, batched with other requests."""
+        return await asyncio.wrap_future(self.cnn.submit(frames))
+
+    async def classify(self, features):
+        """Raw sigmoid score for one (num_frames, 2048) feature sequence."""
+        scores = await asyncio.wrap_future(self.gru.submit(np.expand_dims(features, axis=0)))
+        return float(scores[0])
+
+    async def predict_video(self, video_path, threshold=DEFAULT_THRESHOLD, executor=None, info=None):
+        """
+        Async counterpart of model.predict_video that goes through the shared batches.
+        Decoding runs on `executor` (the default loop executor if None), or
+        in the decode pipeline's processes when DECODE_PIPELINE=1. `info` is
+        the probed header, if the caller has it, so it isn't read again.
+        """
+        loop = asyncio.get_running_loop()
+        if ADAPTIVE_SAMPLING:
+            return await self.predict_video_adaptive(video_path, threshold, executor, info)
+        if self.pipeline is not None:
+            # Frames reach the CNN stage one by one while the rest are still decoding
+            raw_score = await asyncio.wrap_future(self.pipeline.submit(video_path, NUM_FRAMES, info=info))
+            return label_from_score(raw_score, threshold)
+        if isinstance(executor, ProcessPoolExecutor):
+            # Frames come back pickled from the worker process; nothing to reuse
+            frames = await loop.run_in_executor(executor, functools.partial(preprocess_video, video_path, info=info))
+            return await self.predict_frames(frames, threshold)
+
+        buffer = frame_buffers.acquire(NUM_FRAMES)
+        try:
+            frames = await loop.run_in_executor(executor, functools.partial(
+                preprocess_video, video_path, NUM_FRAMES, buffer, info=info))
+            return await self.predict_frames(frames, threshold)
+        finally:
+            # The CNN stage copies frames into its batch, so the buffer is free again
+            frame_buffers.release(buffer)
+
+    async def predict_video_adaptive(self, video_path, threshold=DEFAULT_THRESHOLD, executor=None, info=None):
+        """
+        Adaptive sampling (see adaptive.py): each round decodes only the grid
+        positions the policy asks for, so clear-cut clips stop after a few frames.
+        """
+        loop = asyncio.get_running_loop()
+        if info is None:
+            # Every round decodes the same file; read its header once
+            info = await loop.run_in_executor(executor, video_info, video_path)
+        policy = adaptive_score(threshold)
+        try:
+            kind, arg = next(policy)
+            while True:
+                if kind == "frames":
+                    slots, offset = arg
+                    frames = await loop.run_in_executor(executor, functools.partial(
+                        preprocess_video, video_path, NUM_FRAMES, slots=slots, offset=offset, info=info))
+                    result = await self.extract_features(frames)
+                else:
+                    result = await self.classify(arg)
+                kind, arg = policy.send(result)
+        except StopIteration as stop:
+            return label_from_score(stop.value, threshold)
+
+    async def predict_windowed(self, video_path, threshold=DEFAULT_THRESHOLD, info=None, executor=None):
+        """
+        Async counterpart of model.predict_video_windowed. Chunks are decoded
+        on `executor`, which must run threads (the decoder keeps state between
+        chunks; the default loop executor if None); their frames and windows
+        share batches with other requests.
+        """
+        loop = asyncio.get_running_loop()
+        chunks = iter_frame_chunks(video_path, info=info)
+        accumulator = WindowAccumulator()
+        spans, scores = [], []
+        try:
+            while True:
+                chunk = await loop.run_in_executor(executor, next, chunks, None)
+                if chunk is None:
+                    break
+                timestamps, frames = chunk
+                ready = accumulator.add(await self.extract_features(frames), timestamps)
+                await self._score_windows(ready, spans, scores)
+            await self._score_windows(accumulator.finish(), spans, scores)
+        finally:
+            try:
+                chunks.close()
+            except ValueError:
+                # Cancelled while a chunk is decoding; the generator is released when that finishes
+                pass
+        return build_result(spans, scores, threshold, label_from_score)
+
+    async def _score_windows(self, ready, spans, scores):
+        if ready:
+            batch = np.stack([features for _, _, features in ready])
+            scores.extend(float(s) for s in await asyncio.wrap_future(self.gru.submit(batch)))
+            spans.extend((start, end) for start, end, _ in ready)
+
+    async def predict_frames(self, frames, threshold=DEFAULT_THRESHOLD):
+        """Score already preprocessed (num_frames, 299, 299, 3) frames."""
+        features = await self.extract_features(frames)
+        raw_score = await self.classify(features)
+        return label_from_score(raw_score, threshold)
+
+    def stats(self):
+        stats = {
+            "cnn_batches": self.cnn.batches_run,
+            "cnn_frames": self.cnn.rows_run,
+            "gru_batches": self.gru.batches_run,
+            "gru_sequences": self.gru.rows_run,
+        }
+        if self.pipeline is not None:
+            stats["pipeline"] = self.pipeline.stats()
+        return stats
@@ -0,0 +1,196 @@
+"""
+Sweep worker count, thread pool sizes and CPU pinning on this host.
+
+For every combination, WORKERS processes (standing in for serve.py / uvicorn
+workers) each warm up, wait for the others, then score --videos benchmark
+clips back to back with the result and feature caches off. Every process
+starts fresh, because TensorFlow's thread pools are fixed once it runs its
+first op. Reported per combination: per-video latency, and throughput
+across all workers.
+
+Three settings are recommended: the lowest p95 latency, the highest
+throughput, and "balanced". Balanced is the highest throughput whose p95
+stays within --latency-budget times the best p95. Each is printed as the
+environment variables to deploy it with.
+
+Usage (from backend/):
+    python -m benchmarks.autotune [--workers 1,2,4] [--videos 6] [--latency-budget 1.5]
+        [--report bench_reports/autotune.json]
+
+This takes a while: the default grid on a 4-core host is about 20
+combinations. Narrow it with --workers/--intra/--inter/--opencv/--affinity.
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_pipeline import CLIPS
+from benchmarks.report import summarize, write_report
+from benchmarks.synthetic import clip_path
+from cpu import available_cpus, pin_cpus, worker_cpus
+from engines import INFERENCE_ENGINE
+
+
+# ============================================================
+#  Worker (one benchmark process)
+# ============================================================
+def run_worker(paths, videos, cpus):
+    if cpus:
+        pin_cpus(cpus)
+    # Imported after pinning so the thread pools size to the pinned cores
+    import model
+
+    model.warmup()
+    print("ready", flush=True)
+    sys.stdin.readline()
+    latencies = []
+    start = time.time()
+    for i in range(videos):
+        t = time.perf_counter()
+        model.predict_video(paths[i % len(paths)])
+        latencies.append(time.perf_counter() - t)
+    print(json.dumps({"start": start, "end": time.time(), "latencies": latencies}), flush=True)
+
+
+# ============================================================
+#  Sweep
+# ============================================================
+def _env(intra, inter, opencv):
+    env = dict(os.environ, TF_INTRA_OP_THREADS=str(intra), TF_INTER_OP_THREADS=str(inter),
+               OPENCV_THREADS=str(opencv), FEATURE_CACHE_SIZE="0", LOG_LEVEL="WARNING",
+               TF_CPP_MIN_LOG_LEVEL="2")
+    env.pop("FEATURE_CACHE_DIR", None)
+    return env
+
+
+def _read_line(proc, prefix):
+    # Skip anything a library printed to stdout
+    for line in proc.stdout:
+        if line.startswith(prefix):
+            return line
+    raise RuntimeError(f"benchmark worker exited with status {proc.wait()}")
+
+
+def run_combination(workers, intra, inter, opencv, affinity, paths, videos):
+    """Start `workers` benchmark processes, release them together, and collect their timings."""
+    env = _env(intra, inter, opencv)
+    procs = []
+    for slot in range(workers):
+        cmd = [sys.executable, "-m", "benchmarks.autotune", "--worker", "--videos", str(videos),
+               "--clips", ",".join(paths)]
+        cpus = worker_cpus(slot, workers, "auto") if affinity else None
+        if cpus:
+            cmd += ["--cpus", ",".join(map(str, cpus))]
+        procs.append(subprocess.Popen(cmd, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True))
+    try:
+        for proc in procs:
+            _read_line(proc, "ready")
+        for proc in procs:
+            proc.stdin.write("go\n")
+            proc.stdin.flush()
+        results = [json.loads(_read_line(proc, "{")) for proc in procs]
+    except BaseException:
+        for proc in procs:
+            proc.kill()
+        raise
+    finally:
+        for proc in procs:
+            proc.wait()
+    latencies = [t for r in results for t in r["latencies"]]
+    wall = max(r["end"] for r in results) - min(r["start"] for r in results)
+    stats = summarize(latencies)
+    stats["videos_per_sec"] = round(len(latencies) / wall, 3)
+    return stats
+
+
+def grid(args, cores):
+    worker_counts = [int(w) for w in args.workers.split(",")] if args.workers \
+        else sorted({1, max(1, cores // 2), cores})
+    for workers in worker_counts:
+        share = max(1, cores // workers)
+        # "share" = the worker's fair share of the cores; 0 = TensorFlow's default
+        intras = sorted({share if v == "share" else int(v) for v in args.intra.split(",")})
+        for intra, inter, opencv, affinity in itertools.product(
+                intras, map(int, args.inter.split(",")), map(int, args.opencv.split(",")),
+                [a == "on" for a in args.affinity.split(",")]):
+            if affinity and (workers == 1 or not hasattr(os, "sched_setaffinity")):
+                continue
+            yield workers, intra, inter, opencv, affinity
+
+
+def _settings(name, workers, intra, inter, opencv, affinity):
+    return (f"{name}: WEB_WORKERS={workers} TF_INTRA_OP_THREADS={intra} TF_INTER_OP_THREADS={inter} "
+            f"OPENCV_THREADS={opencv} CPU_AFFINITY={'auto' if affinity else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=None, help="worker counts to try (default: 1, cores/2, cores)")
+    parser.add_argument("--intra", default="share,0",
+                        help="TF intra-op threads; 'share' = cores / workers, 0 = TensorFlow default")
+    parser.add_argument("--inter", default="1,2", help="TF inter-op threads")
+    parser.add_argument("--opencv", default="-1,1", help="OpenCV threads (-1 = OpenCV default)")
+    parser.add_argument("--affinity", default="off,on", help="pin each worker to its share of the cores")
+    parser.add_argument("--videos", type=int, default=6, help="videos scored per worker")
+    parser.add_argument("--latency-budget", type=float, default=1.5,
+                        help="balanced pick: max p95 as a multiple of the best p95")
+    parser.add_argument("--dir", default="bench_clips")
+    parser.add_argument("--report", default=None, help="write a JSON report to this path")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--clips", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--cpus", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        cpus = [int(c) for c in args.cpus.split(",")] if args.cpus else None
+        run_worker(args.clips.split(","), args.videos, cpus)
+        return
+
+    cores = len(available_cpus())
+    paths = [clip_path(args.dir, num_frames, size, codec) for num_frames, size, codec in CLIPS]
+    combos = list(grid(args, cores))
+    print(f"[INFO] {cores} cores, {len(combos)} combinations, {args.videos} videos per worker")
+    print(f"{'workers':>7} {'intra':>5} {'inter':>5} {'opencv':>6} {'pinned':>6} "
+          f"{'p50':>9} {'p95':>9} {'videos/s':>9}")
+    results = {}
+    measured = []
+    for combo in combos:
+        workers, intra, inter, opencv, affinity = combo
+        try:
+            stats = run_combination(workers, intra, inter, opencv, affinity, paths, args.videos)
+        except Exception as e:
+            print(f"[WARN] {combo} failed: {e}")
+            continue
+        name = f"autotune/w{workers}_intra{intra}_inter{inter}_cv{opencv}_{'pinned' if affinity else 'free'}"
+        results[name] = stats
+        measured.append((combo, stats))
+        print(f"{workers:>7} {intra:>5} {inter:>5} {opencv:>6} {'yes' if affinity else 'no':>6} "
+              f"{stats['p50_ms']:>7.0f}ms {stats['p95_ms']:>7.0f}ms {stats['videos_per_sec']:>9.2f}")
+
+    if not measured:
+        sys.exit("[WARN] No combination completed")
+    fastest = min(measured, key=lambda m: m[1]["p95_ms"])
+    busiest = max(measured, key=lambda m: m[1]["videos_per_sec"])
+    budget = fastest[1]["p95_ms"] * args.latency_budget
+    balanced = max((m for m in measured if m[1]["p95_ms"] <= budget), key=lambda m: m[1]["videos_per_sec"])
+    print()
+    for label, (combo, stats) in (("lowest latency", fastest), ("highest throughput", busiest),
+                                  ("balanced", balanced)):
+        print(_settings(label, *combo))
+        print(f"    p95 {stats['p95_ms']:.0f}ms, {stats['videos_per_sec']:.2f} videos/s")
+
+    if args.report:
+        config = {"cores": cores, "videos_per_worker": args.videos, "latency_budget": args.latency_budget,
+                  "engine": INFERENCE_ENGINE,
+                  "recommended": {label: dict(zip(("workers", "intra", "inter", "opencv", "affinity"), combo))
+                                  for label, (combo, _) in (("latency", fastest), ("throughput", busiest),
+                                                            ("balanced", balanced))}}
+        write_report(args.report, "autotune", config, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Calibrate adaptive sampling: how often does an early exit agree with the full grid?
+
+The coarse pass feeds the GRU head 10 timesteps built by repeating a few
+scored frames (adaptive.fill_sequence). The head was never trained on such
+sequences, so its score is only trustworthy where it is far enough from
+the threshold. For every clip this decodes the regular 10-frame grid once,
+scores it, and then for each --coarse count and --margins value checks
+whether the coarse pass would have exited early and, if so, whether its
+label matches the full-grid label. The coarse slots are a subset of the
+grid, so their features come from the same CNN pass.
+
+Also timed: decoding only the coarse slots vs the whole grid.
+
+Recommended: for each coarse count, the smallest margin whose early exits
+all agree (or at least --min-agreement of them) over at least --min-exits
+clips. Use a manifest of real, labelled-like clips; on the synthetic
+clips the scores mean nothing.
+
+Usage (from backend/):
+    python -m benchmarks.bench_adaptive --manifest heldout.txt [--coarse 3,4,5]
+        [--margins 0.1,0.15,0.2,0.25,0.3,0.35,0.4] [--min-agreement 1.0]
+        [--report bench_reports/adaptive.json]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from adaptive import coarse_slots, fill_sequence
+from batch_scoring import read_manifest
+from benchmarks.bench_pipeline import CLIPS
+from benchmarks.report import summarize, write_report
+from benchmarks.synthetic import clip_path
+from preprocessing import preprocess_video
+from probe import probe_file
+
+NUM_FRAMES = 10
+
+
+def score_clips(paths, coarse_counts, batch_size):
+    """Per clip: full-grid score, coarse score per count, and decode times."""
+    from engines import get_engine
+
+    engine = get_engine()
+    engine.load()
+    clips = []
+    for path in paths:
+        try:
+            info = probe_file(path)
+            start = time.perf_counter()
+            frames = preprocess_video(path, info=info)
+            full_decode = time.perf_counter() - start
+        except (ValueError, OSError) as e:
+            print(f"[WARN] Skipping {path}: {e}")
+            continue
+        features = engine.run_cnn(frames, batch_size)
+        clip = {"path": path, "full": float(engine.classify(features[None])[0]),
+                "full_decode": full_decode, "coarse": {}, "coarse_decode": {}}
+        for count in coarse_counts:
+            slots = coarse_slots(count, NUM_FRAMES)
+            sequence = fill_sequence(features[slots], slots, NUM_FRAMES)
+            clip["coarse"][count] = float(engine.classify(sequence[None])[0])
+            start = time.perf_counter()
+            preprocess_video(path, slots=slots, info=info)
+            clip["coarse_decode"][count] = time.perf_counter() - start
+        clip["vfr"] = bool(info and info["vfr"])
+        clips.append(clip)
+    return engine, clips
+
+
+def agreement(clips, count, margin, threshold):
+    """(exit rate, label agreement among exits, exits) for one coarse count and margin."""
+    exits = [c for c in clips if abs(c["coarse"][count] - threshold) >= margin]
+    if not exits:
+        return 0.0, None, 0
+    agree = [(c["coarse"][count] >= threshold) == (c["full"] >= threshold) for c in exits]
+    return len(exits) / len(clips), float(np.mean(agree)), len(exits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--manifest", help="videos to score (default: synthetic clips)")
+    parser.add_argument("--coarse", default="3,4,5", help="coarse frame counts to try")
+    parser.add_argument("--margins", default="0.1,0.15,0.2,0.25,0.3,0.35,0.4")
+    parser.add_argument("--min-agreement", type=float, default=1.0,
+                        help="share of early exits that must match the full grid")
+    parser.add_argument("--min-exits", type=int, default=20,
+                        help="fewer early exits than this is not enough evidence for a margin")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--dir", default="bench_clips")
+    parser.add_argument("--report", default=None, help="write a JSON report to this path")
+    args = parser.parse_args()
+
+    coarse_counts = [int(c) for c in args.coarse.split(",")]
+    margins = sorted(float(m) for m in args.margins.split(","))
+    if args.manifest:
+        paths = read_manifest(args.manifest)
+    else:
+        print("[WARN] No --manifest: synthetic clips give timings only, their agreement means nothing")
+        paths = [clip_path(args.dir, num_frames, size, codec) for num_frames, size, codec in CLIPS]
+
+    engine, clips = score_clips(paths, coarse_counts, args.batch_size)
+    if not clips:
+        raise SystemExit("[WARN] None of the videos could be decoded")
+    threshold = engine.threshold
+    print(f"[INFO] {len(clips)} clips, {engine.name} engine, threshold {threshold}")
+
+    results = {"decode/full": summarize([c["full_decode"] for c in clips])}
+    recommended = {}
+    print(f"{'coarse':>6} {'margin':>6} {'exits':>6} {'agree':>7}")
+    for count in coarse_counts:
+        results[f"decode/coarse_{count}"] = summarize([c["coarse_decode"][count] for c in clips])
+        for margin in margins:
+            rate, agree, exits = agreement(clips, count, margin, threshold)
+            results[f"agreement/coarse_{count}/margin_{margin:g}"] = {
+                "exit_rate": round(rate, 4), "exits": exits,
+                "label_agreement": round(agree, 4) if agree is not None else None,
+            }
+            shown = f"{agree:>7.1%}" if agree is not None else f"{'-':>7}"
+            print(f"{count:>6} {margin:>6.2f} {rate:>6.0%} {shown}")
+            if count not in recommended and agree is not None and agree >= args.min_agreement \
+                    and exits >= args.min_exits:
+                recommended[count] = margin
+
+    full_ms = results["decode/full"]["p50_ms"]
+    for count in coarse_counts:
+        coarse_ms = results[f"decode/coarse_{count}"]["p50_ms"]
+        print(f"[INFO] decode p50: {count} coarse frames {coarse_ms:.0f}ms vs full grid {full_ms:.0f}ms")
+    if any(c["vfr"] for c in clips):
+        print("[INFO] variable-frame-rate clips are decoded sequentially, so their coarse pass saves no decode time")
+    print()
+    for count in coarse_counts:
+        if count in recommended:
+            print(f"coarse {count}: ADAPTIVE_COARSE_FRAMES={count} ADAPTIVE_MARGIN={recommended[count]:g}")
+        else:
+            print(f"coarse {count}: no margin met {args.min_agreement:.0%} agreement over {args.min_exits}+ exits; "
+                  f"keep ADAPTIVE_SAMPLING off")
+
+    if args.report:
+        config = {"engine": engine.describe(), "videos": len(clips), "coarse": coarse_counts, "margins": margins,
+                  "min_agreement": args.min_agreement, "min_exits": args.min_exits,
+                  "recommended": {str(count): margin for count, margin in recommended.items()}}
+        write_report(args.report, "adaptive", config, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Side-by-side benchmark and parity check across inference engines.
+
+Every video is decoded once; its frames then go through each engine's CNN
+and head. Reports ms per frame (CNN) and ms per sequence (head) for each
+engine, plus feature cosine similarity, score difference and label
+agreement against the reference engine, each at its own threshold.
+
+Usage (from backend/):
+    python -m benchmarks.bench_engines --manifest heldout.txt [--engines numpy,fp16,int8]
+        [--reference numpy] [--report bench_reports/engines.json]
+
+Without --manifest, the synthetic benchmark clips are used (timings only;
+their labels mean nothing).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from batch_scoring import read_manifest
+from benchmarks.bench_pipeline import CLIPS
+from benchmarks.report import summarize, write_report
+from benchmarks.synthetic import clip_path
+from preprocessing import preprocess_video
+
+
+def _cosine(a, b):
+    return np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12)
+
+
+def bench_engines(paths, names, reference, batch_size, label_from_score):
+    from engines import get_engine
+
+    engines = [get_engine(name) for name in names]
+    for engine in engines:
+        engine.load()
+        # Warm up each engine so graph tracing isn't timed
+        engine.classify(engine.run_cnn(np.zeros((10, 299, 299, 3), np.float32), batch_size)[None])
+
+    cnn_times = {e.name: [] for e in engines}
+    head_times = {e.name: [] for e in engines}
+    parity = {e.name: {"cosine": [], "score_diff": [], "agree": []} for e in engines if e.name != reference}
+    for path in paths:
+        try:
+            frames = preprocess_video(path)
+        except ValueError as e:
+            print(f"[WARN] Skipping {path}: {e}")
+            continue
+        outputs = {}
+        for engine in engines:
+            start = time.perf_counter()
+            features = engine.run_cnn(frames, batch_size)
+            cnn_times[engine.name].append((time.perf_counter() - start) / len(frames))
+            start = time.perf_counter()
+            score = float(engine.classify(features[None])[0])
+            head_times[engine.name].append(time.perf_counter() - start)
+            outputs[engine.name] = (features, score, label_from_score(score, engine.threshold)[0])
+
+        ref_features, ref_score, ref_label = outputs[reference]
+        for name, stats in parity.items():
+            features, score, label = outputs[name]
+            stats["cosine"].extend(_cosine(ref_features, features).tolist())
+            stats["score_diff"].append(abs(score - ref_score))
+            stats["agree"].append(label == ref_label)
+
+    if not cnn_times[reference]:
+        raise ValueError("None of the videos could be decoded")
+    results = {}
+    for engine in engines:
+        results[f"cnn_per_frame/{engine.name}"] = summarize(cnn_times[engine.name])
+        results[f"head/{engine.name}"] = summarize(head_times[engine.name])
+    for name, stats in parity.items():
+        diffs = np.asarray(stats["score_diff"])
+        results[f"parity/{name}"] = {
+            "feature_cosine_mean": round(float(np.mean(stats["cosine"])), 6),
+            "feature_cosine_min": round(float(np.min(stats["cosine"])), 6),
+            "score_abs_diff_mean": round(float(diffs.mean()), 6),
+            "score_abs_diff_max": round(float(diffs.max()), 6),
+            "label_agreement": round(float(np.mean(stats["agree"])), 4),
+        }
+    return engines, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--manifest", help="videos to score (default: synthetic clips)")
+    parser.add_argument("--engines", default=None, help="comma-separated engine names (default: all registered)")
+    parser.add_argument("--reference", default="numpy", help="engine the others are compared against")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--dir", default="bench_clips")
+    parser.add_argument("--report", default=None, help="write a JSON report to this path")
+    args = parser.parse_args()
+
+    # TensorFlow is imported here so --help stays fast
+    from engines import engine_names
+    from model import label_from_score
+
+    names = args.engines.split(",") if args.engines else engine_names()
+    if args.reference not in names:
+        names.insert(0, args.reference)
+    if args.manifest:
+        paths = read_manifest(args.manifest)
+    else:
+        paths = [clip_path(args.dir, num_frames, size, codec) for num_frames, size, codec in CLIPS]
+
+    engines, results = bench_engines(paths, names, args.reference, args.batch_size, label_from_score)
+    print(f"{'engine':<8} {'cnn p50/frame':>14} {'head p50':>10} {'cosine':>9} {'|Δscore|':>9} {'labels':>7}")
+    for engine in engines:
+        cnn = results[f"cnn_per_frame/{engine.name}"]["p50_ms"]
+        head = results[f"head/{engine.name}"]["p50_ms"]
+        line = f"{engine.name:<8} {cnn:>12.1f}ms {head:>8.2f}ms"
+        parity = results.get(f"parity/{engine.name}")
+        if parity:
+            line += (f" {parity['feature_cosine_mean']:>9.4f} {parity['score_abs_diff_mean']:>9.4f} "
+                     f"{parity['label_agreement']:>7.1%}")
+        else:
+            line += f" {'(reference)':>27}"
+        print(line)
+
+    if args.report:
+        config = {"engines": [engine.describe() for engine in engines], "reference": args.reference,
+                  "batch_size": args.batch_size, "videos": len(paths)}
+        write_report(args.report, "engines", config, results)
+
+
+if __name__ == "__main__":
+    main()
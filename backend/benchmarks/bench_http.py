@@ -0,0 +1,153 @@
+"""
+HTTP load test for POST /predict with concurrent clients.
+
+Each concurrency level sends --requests uploads of a synthetic clip and
+records client-side latency (p50/p95/p99), throughput and status codes
+(503s from the inference pool are counted, not retried).
+
+Usage (from backend/):
+    python -m benchmarks.bench_http --spawn [--concurrency 1,4,16] [--requests 32]
+    python -m benchmarks.bench_http --url http://127.0.0.1:8000
+
+--spawn starts `uvicorn app:app` in a subprocess (with the result and
+feature caches disabled so every request runs the model) and stops it at
+the end. Against an existing server, identical uploads hit the caches
+unless they are disabled there too; --unique makes every upload distinct
+at the byte level, which defeats the result cache only.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.report import summarize, write_report
+from benchmarks.synthetic import clip_path
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+async def _wait_ready(client, url, timeout, server=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode} before it was ready")
+        try:
+            if (await client.get(f"{url}/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} was not ready after {timeout:.0f}s")
+
+
+async def run_level(client, url, payload, concurrency, num_requests, unique):
+    latencies = []
+    statuses = {}
+    counter = iter(range(num_requests))
+
+    async def worker():
+        for _ in counter:
+            # Trailing bytes are ignored by the demuxer but change the SHA-256
+            body = payload + os.urandom(16) if unique else payload
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/predict", files={"file": ("bench.mp4", body, "video/mp4")})
+                status = response.status_code
+            except httpx.TransportError:
+                status = "error"
+            elapsed = time.perf_counter() - start
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    stats = summarize(latencies)
+    stats.update({
+        "concurrency": concurrency,
+        "requests": num_requests,
+        "statuses": statuses,
+        "throughput_rps": round(len(latencies) / wall, 3) if wall > 0 else 0.0,
+    })
+    return stats
+
+
+async def run(args, payload, server=None):
+    results = {}
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=max(args.concurrency))) as client:
+        await _wait_ready(client, args.url, args.ready_timeout, server)
+        # One request first so lazy initialization isn't counted
+        await client.post(f"{args.url}/predict", files={"file": ("bench.mp4", payload, "video/mp4")})
+
+        print(f"{'concurrency':>11} {'ok':>5} {'p50':>10} {'p95':>10} {'p99':>10} {'req/s':>8}  statuses")
+        for concurrency in args.concurrency:
+            stats = await run_level(client, args.url, payload, concurrency, args.requests, args.unique)
+            results[f"http/predict/c{concurrency}"] = stats
+            if stats["n"]:
+                print(f"{concurrency:>11} {stats['n']:>5} {stats['p50_ms']:>8.1f}ms {stats['p95_ms']:>8.1f}ms "
+                      f"{stats['p99_ms']:>8.1f}ms {stats['throughput_rps']:>8.2f}  {stats['statuses']}")
+            else:
+                print(f"{concurrency:>11} {0:>5} {'-':>10} {'-':>10} {'-':>10} {'-':>8}  {stats['statuses']}")
+    return results
+
+
+def _spawn_server(port):
+    env = dict(os.environ)
+    env.setdefault("RESULT_CACHE_SIZE", "0")
+    env.setdefault("FEATURE_CACHE_SIZE", "0")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)], env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="server to test (default: the --spawn server)")
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn app:app for the test")
+    parser.add_argument("--port", type=int, default=8765, help="port for --spawn")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--unique", action="store_true", help="make every upload distinct (defeats the result cache)")
+    parser.add_argument("--clip-frames", type=int, default=300)
+    parser.add_argument("--clip-size", default="640x360")
+    parser.add_argument("--codec", default="mp4v")
+    parser.add_argument("--dir", default="bench_clips")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout (s)")
+    parser.add_argument("--ready-timeout", type=float, default=300.0, help="wait for /ready (s)")
+    parser.add_argument("--report", default=None, help="write a JSON report to this path")
+    args = parser.parse_args()
+
+    if httpx is None:
+        sys.exit("bench_http needs httpx (pip install httpx)")
+    if not args.url and not args.spawn:
+        parser.error("pass --url or --spawn")
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+    args.url = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+
+    width, height = (int(v) for v in args.clip_size.split("x"))
+    path = clip_path(args.dir, args.clip_frames, (width, height), args.codec)
+    with open(path, "rb") as f:
+        payload = f.read()
+
+    server = _spawn_server(args.port) if args.spawn else None
+    try:
+        results = asyncio.run(run(args, payload, server))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=60)
+
+    if args.report:
+        config = {"clip": os.path.basename(path), "requests": args.requests, "unique": args.unique,
+                  "spawned": args.spawn}
+        write_report(args.report, "http", config, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Time each stage of the prediction pipeline on synthetic clips.
+
+Stages: decode (frame sampling), resize (resize + normalize into the float32
+buffer), cnn (Xception, feature cache bypassed), gru (classifier head) and
+total (preprocess_video + cnn + gru, i.e. one uncached prediction).
+
+Usage (from backend/):
+    python -m benchmarks.bench_pipeline [--repeat 5] [--report bench_reports/pipeline.json]
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.report import summarize, write_report
+from benchmarks.synthetic import clip_path
+from preprocessing import frames_to_buffer, preprocess_video
+from sampling import sample_frames
+
+NUM_FRAMES = 10
+
+CLIPS = [
+    # (num_frames, (width, height), codec)
+    (90, (640, 360), "mp4v"),
+    (900, (640, 360), "mp4v"),
+    (300, (1280, 720), "mp4v"),
+    (300, (1920, 1080), "mp4v"),
+    (300, (640, 360), "MJPG"),
+]
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def bench_clip(path, repeat, model):
+    timings = {"decode": [], "resize": [], "cnn": [], "gru": [], "total": []}
+    for _ in range(repeat):
+        cap = cv2.VideoCapture(path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        indices = np.linspace(0, frame_count - 1, NUM_FRAMES).astype(int)
+        decoded, t = _timed(sample_frames, cap, indices, None, frame_count)
+        cap.release()
+        timings["decode"].append(t)
+
+        (frames, _), t = _timed(frames_to_buffer, decoded, NUM_FRAMES)
+        timings["resize"].append(t)
+
+        features, t = _timed(model._run_cnn, frames, model.FEATURE_BATCH_SIZE)
+        timings["cnn"].append(t)
+
+        _, t = _timed(model.classify_features, features[None])
+        timings["gru"].append(t)
+
+        # One full uncached prediction, measured end to end
+        start = time.perf_counter()
+        frames = preprocess_video(path)
+        model.classify_features(model._run_cnn(frames, model.FEATURE_BATCH_SIZE)[None])
+        timings["total"].append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dir", default="bench_clips")
+    parser.add_argument("--report", default=None, help="write a JSON report to this path")
+    args = parser.parse_args()
+
+    # TensorFlow is imported here so --help stays fast
+    import model
+    model.warmup(NUM_FRAMES)
+
+    results = {}
+    print(f"{'clip':<28} {'stage':<8} {'p50':>10} {'p95':>10} {'max':>10}")
+    for num_frames, size, codec in CLIPS:
+        path = clip_path(args.dir, num_frames, size, codec)
+        name = f"{size[0]}x{size[1]}_{num_frames}f_{codec}"
+        for stage, samples in bench_clip(path, args.repeat, model).items():
+            stats = summarize(samples)
+            results[f"stage/{stage}/{name}"] = stats
+            print(f"{name:<28} {stage:<8} {stats['p50_ms']:>8.1f}ms {stats['p95_ms']:>8.1f}ms "
+                  f"{stats['max_ms']:>8.1f}ms")
+
+    if args.report:
+        config = {"repeat": args.repeat, "num_frames": NUM_FRAMES,
+                  "feature_batch_size": model.FEATURE_BATCH_SIZE, "engine": model.get_engine().describe()}
+        write_report(args.report, "pipeline", config, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare frame sampling strategies on synthetic clips.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sampling [--samples 10] [--repeat 3] [--dir bench_clips]
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from sampling import sample_frames, estimate_gop_size, choose_strategy
+from benchmarks.synthetic import clip_path
+
+CLIPS = [
+    # (num_frames, (width, height), codec)
+    (90, (640, 360), "mp4v"),
+    (900, (640, 360), "mp4v"),
+    (900, (1280, 720), "mp4v"),
+    (900, (640, 360), "MJPG"),
+]
+
+
+def time_strategy(path, strategy, num_samples, repeat):
+    best = float("inf")
+    got = 0
+    for _ in range(repeat):
+        cap = cv2.VideoCapture(path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        indices = np.linspace(0, frame_count - 1, num_samples).astype(int)
+        start = time.perf_counter()
+        frames = sample_frames(cap, indices, strategy=strategy, frame_count=frame_count)
+        best = min(best, time.perf_counter() - start)
+        got = len(frames)
+        cap.release()
+    return best, got
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dir", default="bench_clips")
+    args = parser.parse_args()
+
+    print(f"{'clip':<42} {'gop':>5} {'auto→':>11} {'sequential':>12} {'seek':>12} {'legacy':>12}")
+    for num_frames, size, codec in CLIPS:
+        path = clip_path(args.dir, num_frames, size, codec)
+        cap = cv2.VideoCapture(path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        gop = estimate_gop_size(cap)
+        cap.release()
+        picked = choose_strategy(frame_count, args.samples, gop)
+
+        results = {}
+        for strategy in ("sequential", "seek"):
+            results[strategy], _ = time_strategy(path, strategy, args.samples, args.repeat)
+        results["legacy"] = time_legacy(path, args.samples, args.repeat)
+
+        name = path.split("/")[-1]
+        print(f"{name:<42} {gop:>5} {picked:>11} "
+              f"{results['sequential'] * 1000:>10.1f}ms {results['seek'] * 1000:>10.1f}ms "
+              f"{results['legacy'] * 1000:>10.1f}ms")
+
+
+def time_legacy(path, num_samples, repeat):
+    """The original per-index CAP_PROP_POS_FRAMES + read() loop, for reference."""
+    best = float("inf")
+    for _ in range(repeat):
+        cap = cv2.VideoCapture(path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        start = time.perf_counter()
+        for idx in np.linspace(0, frame_count - 1, num_samples).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            cap.read()
+        best = min(best, time.perf_counter() - start)
+        cap.release()
+    return best
+
+
+if __name__ == "__main__":
+    main()
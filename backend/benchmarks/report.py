@@ -0,0 +1,124 @@
+"""
+Latency summaries and JSON benchmark reports that can be diffed between commits.
+
+Usage (from backend/):
+    python -m benchmarks.report old.json new.json [--tolerance 0.10]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+def summarize(samples):
+    """Latency stats in milliseconds for a list of durations in seconds."""
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    if ms.size == 0:
+        return {"n": 0}
+    return {
+        "n": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "min_ms": round(float(ms.min()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    env = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    for module in ("cv2", "tensorflow"):
+        if module in sys.modules:
+            env[module] = getattr(sys.modules[module], "__version__", None)
+    return env
+
+
+def write_report(path, kind, config, results):
+    """
+    Write {"kind", "created_at", "environment", "config", "results"} as JSON.
+    `results` maps a stable name (e.g. "stage/cnn/640x360_90f_mp4v") to a
+    summarize() dict, which is what compare() matches on.
+    """
+    report = {
+        "kind": kind,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "config": config,
+        "results": results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"📄 Report written to {path}")
+    return report
+
+
+# ============================================================
+#  Diff two reports
+# ============================================================
+def compare(old, new, metric="p50_ms", tolerance=0.10):
+    """
+    Rows of (name, old, new, relative change, regressed) for every result
+    present in both reports. A result regresses when `metric` grew by more
+    than `tolerance` (0.10 = 10%).
+    """
+    rows = []
+    for name in sorted(set(old["results"]) & set(new["results"])):
+        before = old["results"][name].get(metric)
+        after = new["results"][name].get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        rows.append((name, before, after, change, change > tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="p50_ms")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"{old['environment'].get('commit')} → {new['environment'].get('commit')}  ({args.metric})")
+    rows = compare(old, new, args.metric, args.tolerance)
+    for name, before, after, change, regressed in rows:
+        flag = "  ❌ regression" if regressed else ""
+        print(f"{name:<56} {before:>10.1f} {after:>10.1f} {change:>+8.1%}{flag}")
+
+    regressions = sum(1 for row in rows if row[4])
+    if regressions:
+        print(f"[WARN] {regressions} result(s) slower by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Synthetic test clips for the benchmarks, generated locally with cv2.VideoWriter.
+"""
+import os
+
+import cv2
+import numpy as np
+
+
+def make_clip(path, num_frames=300, size=(640, 360), fps=30.0, codec="mp4v"):
+    """
+    Write a clip of moving gradients/noise (so inter-frame compression has
+    real work to do) and return its path.
+    """
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open VideoWriter for {path} with codec {codec!r}")
+
+    rng = np.random.default_rng(0)
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    ys = np.linspace(0, 255, height, dtype=np.float32)
+    base = (xs[None, :] + ys[:, None]) / 2
+    for i in range(num_frames):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = (base + i * 3) % 256
+        frame[..., 1] = (base[::-1] + i * 5) % 256
+        frame[..., 2] = rng.integers(0, 64, size=(height, width), dtype=np.uint8)
+        # A moving box so consecutive frames differ structurally
+        x = (i * 7) % max(1, width - 40)
+        cv2.rectangle(frame, (x, height // 3), (x + 40, height // 3 + 40), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def clip_path(directory, num_frames, size, codec, fps=30.0):
+    """Generate (or reuse) a clip in `directory` named after its parameters."""
+    os.makedirs(directory, exist_ok=True)
+    ext = "avi" if codec == "MJPG" else "mp4"
+    path = os.path.join(directory, f"synthetic_{size[0]}x{size[1]}_{num_frames}f_{codec}.{ext}")
+    if not os.path.exists(path):
+        make_clip(path, num_frames=num_frames, size=size, fps=fps, codec=codec)
+    return path
@@ -0,0 +1,97 @@
+"""
+CPU thread pools and affinity.
+
+One process runs several thread pools over the same cores:
+- TensorFlow's intra-op pool, which splits a single op across threads;
+- its inter-op pool, which runs independent ops side by side;
+- OpenCV's pool, used by resize and color conversion;
+- the TFLite interpreter's threads.
+
+By default each sizes itself to every core, so a few concurrent requests,
+or a few uvicorn workers, already oversubscribe the CPU. The settings below
+cap each pool per process. serve.py can also pin each worker to its own
+cores (CPU_AFFINITY). Pools created after pinning size themselves to the
+pinned cores.
+
+`python -m benchmarks.autotune` finds the best combination for a host.
+"""
+import os
+
+from logger import get_logger
+
+log = get_logger("cpu")
+
+# 0 = TensorFlow's default (every core the process may run on)
+TF_INTRA_OP_THREADS = int(os.getenv("TF_INTRA_OP_THREADS", "0"))
+TF_INTER_OP_THREADS = int(os.getenv("TF_INTER_OP_THREADS", "0"))
+# -1 = OpenCV's default; 0 or 1 = no extra OpenCV threads
+OPENCV_THREADS = int(os.getenv("OPENCV_THREADS", "-1"))
+# serve.py worker pinning: "" = off, "auto" = split the available cores
+# evenly between workers, or a CPU list ("0-7", "0,2,4,6") split the same way
+CPU_AFFINITY = os.getenv("CPU_AFFINITY", "")
+
+
+def available_cpus():
+    """CPUs this process may run on (respects affinity, unlike os.cpu_count())."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpu_list(value):
+    """Parse a CPU list: "0-3,6" -> [0, 1, 2, 3, 6]."""
+    cpus = set()
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def worker_cpus(slot, workers, spec=CPU_AFFINITY):
+    """The CPUs worker `slot` of `workers` is pinned to under `spec`, or None when pinning is off."""
+    if not spec:
+        return None
+    cpus = available_cpus() if spec == "auto" else parse_cpu_list(spec)
+    if workers >= len(cpus):
+        # Fewer cores than workers: one core each, wrapping around
+        return [cpus[slot % len(cpus)]]
+    return cpus[slot * len(cpus) // workers:(slot + 1) * len(cpus) // workers]
+
+
+def pin_cpus(cpus):
+    """Restrict this process, and every thread it starts from now on, to `cpus`."""
+    if not hasattr(os, "sched_setaffinity"):
+        log.warning("⚠️ CPU pinning is not supported on this platform; ignoring CPU_AFFINITY")
+        return False
+    os.sched_setaffinity(0, cpus)
+    return True
+
+
+def configure_tensorflow():
+    """Size TensorFlow's thread pools. Has no effect once TensorFlow has run an op."""
+    import tensorflow as tf
+
+    try:
+        if TF_INTRA_OP_THREADS:
+            tf.config.threading.set_intra_op_parallelism_threads(TF_INTRA_OP_THREADS)
+        if TF_INTER_OP_THREADS:
+            tf.config.threading.set_inter_op_parallelism_threads(TF_INTER_OP_THREADS)
+    except RuntimeError as e:
+        log.warning(f"⚠️ Could not set TensorFlow thread pools: {e}")
+
+
+def configure_opencv():
+    if OPENCV_THREADS >= 0:
+        import cv2
+        cv2.setNumThreads(OPENCV_THREADS)
+
+
+def thread_settings():
+    """Effective settings for this process, for logs and reports."""
+    return {
+        "cpus": len(available_cpus()),
+        "tf_intra_op_threads": TF_INTRA_OP_THREADS,
+        "tf_inter_op_threads": TF_INTER_OP_THREADS,
+        "opencv_threads": OPENCV_THREADS,
+        "cpu_affinity": CPU_AFFINITY,
+    }
@@ -13,5 +13,16 @@ DB_NAME = os.getenv("DB_NAME", "deepfake_db")
 if not MONGO_URL:
     raise RuntimeError("❌ MONGO_URL not found. Please add it to database/.env")
 
-client = AsyncIOMotorClient(MONGO_URL)
-db = client[DB_NAME]
+# One client per process, created on first use: pymongo clients aren't
+# fork-safe, so one made before serve.py forks its workers must not be inherited
+_client = None
+_client_pid = None
+
+
+def get_db():
+    """This process's database handle; the Motor client is created on the first call."""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        _client = AsyncIOMotorClient(MONGO_URL)
+        _client_pid = os.getpid()
+    return _client[DB_NAME]
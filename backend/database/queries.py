@@ -0,0 +1,86 @@
+# backend/database/queries.py
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+from database.schemas import Prediction
+
+# Newest first; _id breaks ties between predictions with the same timestamp
+PREDICTION_SORT = [("timestamp", DESCENDING), ("_id", DESCENDING)]
+
+PREDICTION_FIELDS = set(Prediction.model_fields)
+
+MAX_PAGE_SIZE = 500
+
+
+async def ensure_indexes(db):
+    """Indexes backing the /predictions filters + keyset pagination."""
+    await db.predictions.create_index(PREDICTION_SORT, name="timestamp_id")
+    await db.predictions.create_index([("user_email", ASCENDING)] + PREDICTION_SORT, name="user_email_timestamp_id")
+    await db.predictions.create_index([("label", ASCENDING)] + PREDICTION_SORT, name="label_timestamp_id")
+
+
+# ============================================================
+#  Keyset cursors
+# ============================================================
+def encode_cursor(doc):
+    """Opaque cursor pointing just past `doc` in PREDICTION_SORT order."""
+    payload = {"t": doc["timestamp"].isoformat(), "id": str(doc["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns (timestamp, ObjectId); raises ValueError on a malformed cursor."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload["t"]), ObjectId(payload["id"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+# ============================================================
+#  Filters and projection
+# ============================================================
+def build_filter(user_email=None, label=None, since=None, until=None, cursor=None):
+    query = {}
+    if user_email is not None:
+        query["user_email"] = user_email
+    if label is not None:
+        query["label"] = label
+    if since is not None or until is not None:
+        query["timestamp"] = {}
+        if since is not None:
+            query["timestamp"]["$gte"] = since
+        if until is not None:
+            query["timestamp"]["$lt"] = until
+    if cursor is not None:
+        timestamp, oid = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": oid}},
+        ]}]}
+    return query
+
+
+def build_projection(fields):
+    """
+    Comma-separated field list -> Mongo projection (None = all fields).
+    timestamp and _id are always returned since cursors are built from them.
+    """
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - PREDICTION_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return {f: 1 for f in requested | {"timestamp"}}
+
+
+def serialize(doc):
+    doc["_id"] = str(doc["_id"])  # Convert ObjectId to string
+    if isinstance(doc.get("timestamp"), datetime):
+        doc["timestamp"] = doc["timestamp"].isoformat()
+    return doc
@@ -0,0 +1,311 @@
+# backend/database/writer.py
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: one API process per journal
+    fcntl = None
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from logger import get_logger
+from metrics import ERRORS, span
+from worker_files import worker_path
+
+log = get_logger("writer")
+
+# Flush when this many documents are buffered, or after this many seconds
+PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "100"))
+PERSIST_FLUSH_INTERVAL_SEC = float(os.getenv("PERSIST_FLUSH_INTERVAL_SEC", "1.0"))
+# Beyond this many buffered documents, new ones go straight to the journal
+PERSIST_MAX_BUFFER = int(os.getenv("PERSIST_MAX_BUFFER", "10000"))
+# Local append-only spill file used while MongoDB is unreachable
+PERSIST_JOURNAL_PATH = os.getenv("PERSIST_JOURNAL_PATH", "journal/predictions.jsonl")
+
+_RETRY_BASE_SEC = 0.5
+_RETRY_MAX_SEC = 30.0
+_DUPLICATE_KEY = 11000
+
+
+def _to_json(doc):
+    out = dict(doc)
+    out["_id"] = str(out["_id"])
+    if isinstance(out.get("timestamp"), datetime):
+        out["timestamp"] = out["timestamp"].isoformat()
+    return json.dumps(out)
+
+
+def _from_json(line):
+    doc = json.loads(line)
+    doc["_id"] = ObjectId(doc["_id"])
+    if isinstance(doc.get("timestamp"), str):
+        doc["timestamp"] = datetime.fromisoformat(doc["timestamp"])
+    return doc
+
+
+def _file_id(st):
+    # The inode alone can be reused once the file we read is deleted
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+# ============================================================
+#  Write-behind persistence for Prediction documents
+# ============================================================
+class PredictionWriter:
+    """
+    Buffers prediction documents and writes them with insert_many in the
+    background, so MongoDB latency (or an outage) never reaches /predict.
+
+    - Flushes by size (batch_size) or time (flush_interval).
+    - Failed flushes are retried with exponential backoff; while the database
+      is down, batches are appended to a local JSONL journal and replayed once
+      it is reachable again.
+    - Every document gets its _id up front, so a retried batch that partially
+      succeeded before is de-duplicated by MongoDB.
+    - Journal appends (with fsync), the file lock and replay reads run on one
+      dedicated thread, in order, never on the event loop: they happen
+      exactly while the database is down and requests are piling up.
+    """
+
+    def __init__(self, collection, batch_size=PERSIST_BATCH_SIZE, flush_interval=PERSIST_FLUSH_INTERVAL_SEC,
+                 max_buffer=PERSIST_MAX_BUFFER, journal_path=PERSIST_JOURNAL_PATH):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._journal_base = journal_path
+        self.journal_path = journal_path
+        self._buffer = deque()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        self._backoff = 0.0
+        self._journal_thread = None
+        self.written = 0
+        self.failed_flushes = 0
+        self.journaled = 0
+        self.last_flush_at = None
+
+    def start(self):
+        if self._task is None:
+            # The writer may be built in serve.py's parent; each worker spills to its own journal
+            self.journal_path = worker_path(self._journal_base)
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything that's buffered; whatever can't be written is journaled."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        if self._buffer and not await self._flush(list(self._buffer)):
+            await self._in_journal_thread(self._journal, list(self._buffer))
+        elif await self._in_journal_thread(self.journal_pending):
+            await self._replay_journal()
+        self._buffer.clear()
+        if self._journal_thread is not None:
+            # Let spills queued by enqueue() reach the disk
+            await asyncio.get_running_loop().run_in_executor(None, self._journal_thread.shutdown)
+            self._journal_thread = None
+
+    def enqueue(self, doc):
+        """Queue one document for writing. Never blocks and never raises on DB errors."""
+        doc = dict(doc)
+        doc.setdefault("_id", ObjectId())
+        if len(self._buffer) >= self.max_buffer:
+            self._spill([(time.monotonic(), doc)])
+            return
+        self._buffer.append((time.monotonic(), doc))
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval + self._backoff)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                return
+            try:
+                await self._step()
+            except Exception as e:
+                # Keep the writer alive: a dead task would silently stop persisting
+                ERRORS.inc(stage="persist")
+                log.error(f"Prediction writer error: {e}")
+                self._backoff = self._next_backoff()
+
+    async def _step(self):
+        batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        if batch:
+            if not await self._flush(batch):
+                self._backoff = self._next_backoff()
+                if self._backoff >= _RETRY_MAX_SEC or len(self._buffer) + len(batch) >= self.max_buffer:
+                    # Database has been down a while: move the batch to disk
+                    await self._in_journal_thread(self._journal, batch)
+                else:
+                    self._buffer.extendleft(reversed(batch))
+                return
+            self._backoff = 0.0
+
+        # Replaying the journal doubles as the "is the database back?" probe
+        if await self._in_journal_thread(self.journal_pending):
+            self._backoff = 0.0 if await self._replay_journal() else self._next_backoff()
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _next_backoff(self):
+        return min(_RETRY_MAX_SEC, max(_RETRY_BASE_SEC, self._backoff * 2))
+
+    async def _flush(self, batch):
+        docs = [doc for _, doc in batch]
+        try:
+            with span("db_insert"):
+                await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate _ids mean an earlier attempt already wrote those documents
+            if any(err.get("code") != _DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+                return self._flush_failed(e)
+        except Exception as e:
+            return self._flush_failed(e)
+        self.written += len(docs)
+        self.last_flush_at = datetime.utcnow()
+        return True
+
+    def _flush_failed(self, error):
+        self.failed_flushes += 1
+        ERRORS.inc(stage="db_insert")
+        log.warning(f"Prediction flush failed: {error}")
+        return False
+
+    # ------------------------------------------------------------
+    #  Local journal (file I/O only on the journal thread)
+    # ------------------------------------------------------------
+    @property
+    def _journal_executor(self):
+        if self._journal_thread is None:
+            self._journal_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+        return self._journal_thread
+
+    async def _in_journal_thread(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._journal_executor, fn, *args)
+
+    def _spill(self, batch):
+        """Journal `batch` without waiting for it, for callers that can't await."""
+        self._journal_executor.submit(self._journal, batch).add_done_callback(self._spill_done)
+
+    def _spill_done(self, future):
+        error = future.exception()
+        if error is not None:
+            ERRORS.inc(stage="persist")
+            log.error(f"Could not journal predictions: {error}")
+
+    @contextmanager
+    def _journal_lock(self):
+        """
+        Exclusive lock shared by every process using this journal, held
+        around appends and around moving the journal aside for replay.
+        Never held across an await.
+        """
+        directory = os.path.dirname(self.journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.journal_path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _journal(self, batch):
+        with self._journal_lock():
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                for _, doc in batch:
+                    f.write(_to_json(doc) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.journaled += len(batch)
+
+    def journal_pending(self):
+        if os.path.exists(self.journal_path + ".replay"):
+            return True
+        try:
+            return os.path.getsize(self.journal_path) > 0
+        except OSError:
+            return False
+
+    def _take_journal(self):
+        """
+        (documents, file id) to replay: the pending .replay file, else the
+        journal moved aside. ([], None) when there is nothing left.
+        """
+        replaying = self.journal_path + ".replay"
+        with self._journal_lock():
+            try:
+                # Move the journal aside first so new spills don't race with the replay
+                if not os.path.exists(replaying):
+                    os.replace(self.journal_path, replaying)
+                with open(replaying, encoding="utf-8") as f:
+                    lines = [line for line in f if line.strip()]
+                    file_id = _file_id(os.fstat(f.fileno()))
+            except FileNotFoundError:
+                # Another process replayed it first
+                return [], None
+        docs = []
+        for line in lines:
+            try:
+                docs.append((0.0, _from_json(line)))
+            except ValueError:
+                # A line cut short by a crash; the rest is still good
+                log.warning(f"Skipping unreadable journal line: {line[:80]!r}")
+        return docs, file_id
+
+    def _finish_replay(self, file_id):
+        replaying = self.journal_path + ".replay"
+        with self._journal_lock():
+            try:
+                # Only the file we replayed: another process may have moved a newer journal there since
+                if _file_id(os.stat(replaying)) == file_id:
+                    os.remove(replaying)
+            except FileNotFoundError:
+                # Another process replayed the same file; _ids made that harmless
+                pass
+
+    async def _replay_journal(self):
+        """Write journaled documents back to MongoDB, then remove them."""
+        docs, file_id = await self._in_journal_thread(self._take_journal)
+        for start in range(0, len(docs), self.batch_size):
+            if not await self._flush(docs[start:start + self.batch_size]):
+                # Still unreachable; keep the replay file for the next attempt
+                return False
+        if file_id is not None:
+            await self._in_journal_thread(self._finish_replay, file_id)
+        return True
+
+    def stats(self):
+        oldest = self._buffer[0][0] if self._buffer else None
+        return {
+            "buffered": len(self._buffer),
+            "lag_seconds": round(time.monotonic() - oldest, 3) if oldest is not None else 0.0,
+            "written": self.written,
+            "failed_flushes": self.failed_flushes,
+            "journaled": self.journaled,
+            "journal_pending": self.journal_pending(),
+            "last_flush_at": self.last_flush_at.isoformat() if self.last_flush_at else None,
+        }
@@ -0,0 +1,150 @@
+"""
+Inference engine registry.
+
+An engine pairs an Xception runtime with a classifier head and a decision
+threshold. Which one serves requests is configuration (INFERENCE_ENGINE),
+so a faster backend can be A/B tested by starting a second deployment with
+a different setting, and compared offline with benchmarks/bench_engines.py.
+
+Built-in engines:
+    numpy   float32 Xception graph + NumPy GRU head (default)
+    keras   float32 Xception graph + Keras GRU head
+    fp16    float16 TFLite Xception + NumPy GRU head
+    int8    int8 TFLite Xception + NumPy GRU head
+
+Model weights are process-wide singletons in model.py, so engines sharing a
+component (e.g. numpy and keras share the Xception graph) load it once.
+Other runtimes plug in with register_engine(name, cls=...) and a subclass
+of InferenceEngine overriding run_cnn/classify.
+"""
+import os
+import threading
+
+# Sigmoid output >= threshold is REAL (matches Colab performance)
+BASE_THRESHOLD = 0.55
+
+# Legacy knobs, still honoured when INFERENCE_ENGINE is unset
+CNN_BACKEND = os.getenv("CNN_BACKEND", "tf")
+GRU_HEAD = os.getenv("GRU_HEAD", "numpy")
+
+
+def _default_engine():
+    if CNN_BACKEND != "tf":
+        return CNN_BACKEND
+    return "keras" if GRU_HEAD == "keras" else "numpy"
+
+
+def _parse_thresholds(value):
+    thresholds = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, threshold = item.partition("=")
+        thresholds[name.strip()] = float(threshold)
+    return thresholds
+
+
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE") or _default_engine()
+# Per-engine thresholds, e.g. "int8=0.56,keras=0.55"; unlisted engines use
+# INFERENCE_THRESHOLD (default BASE_THRESHOLD)
+INFERENCE_THRESHOLD = float(os.getenv("INFERENCE_THRESHOLD", str(BASE_THRESHOLD)))
+ENGINE_THRESHOLDS = _parse_thresholds(os.getenv("ENGINE_THRESHOLDS", ""))
+
+_registry = {}
+_instances = {}
+_lock = threading.Lock()
+
+
+# ============================================================
+#  Engine interface
+# ============================================================
+class InferenceEngine:
+    """
+    Xception runtime `cnn` ("tf", "fp16" or "int8") plus classifier `head`
+    ("numpy" or "keras").
+    """
+
+    def __init__(self, name, cnn, head, threshold, description=""):
+        self.name = name
+        self.cnn = cnn
+        self.head = head
+        self.threshold = threshold
+        self.description = description
+
+    def load(self):
+        """Load every component now rather than on the first request."""
+        import model
+        if self.cnn == "tf" or model.get_tflite_cnn(self.cnn) is None:
+            model.get_base_cnn()
+        if self.head == "keras" or model.get_numpy_head() is None:
+            model.get_gru_model()
+
+    def weight_paths(self):
+        """Weight files this engine loads through weights.py (TFLite models map their own file)."""
+        from weights import XCEPTION_WEIGHTS_PATH, GRU_WEIGHTS_PATH, DENSE_WEIGHTS_PATH
+        paths = [GRU_WEIGHTS_PATH, DENSE_WEIGHTS_PATH]
+        if self.cnn == "tf":
+            paths.insert(0, XCEPTION_WEIGHTS_PATH)
+        return paths
+
+    def run_cnn(self, frames, batch_size):
+        """(n, 299, 299, 3) float32 frames -> (n, 2048) features (no feature cache)."""
+        import model
+        if self.cnn != "tf":
+            tflite_cnn = model.get_tflite_cnn(self.cnn)
+            if tflite_cnn is not None:
+                return tflite_cnn.run(frames, batch_size)
+        return model._run_cnn_float32(frames, batch_size)
+
+    def classify(self, features_batch):
+        """(batch, num_frames, 2048) features -> (batch,) raw sigmoid scores."""
+        import model
+        if self.head == "numpy":
+            head = model.get_numpy_head()
+            if head is not None:
+                return head.predict(features_batch)
+        return model.get_gru_model().predict(features_batch, verbose=0)[:, 0]
+
+    def cnn_signature(self):
+        """Identifies the Xception runtime, for cache invalidation."""
+        from tflite_cnn import tflite_signature
+        return "tf" if self.cnn == "tf" else tflite_signature(self.cnn)
+
+    def describe(self):
+        return {"name": self.name, "cnn": self.cnn, "head": self.head, "threshold": self.threshold,
+                "description": self.description}
+
+
+# ============================================================
+#  Registry
+# ============================================================
+def register_engine(name, cnn="tf", head="numpy", description="", cls=InferenceEngine):
+    _registry[name] = (cls, cnn, head, description)
+
+
+def engine_names():
+    return list(_registry)
+
+
+def engine_threshold(name):
+    return ENGINE_THRESHOLDS.get(name, INFERENCE_THRESHOLD)
+
+
+def get_engine(name=None):
+    """The engine called `name` (INFERENCE_ENGINE by default), created once per process."""
+    name = name or INFERENCE_ENGINE
+    engine = _instances.get(name)
+    if engine is None:
+        with _lock:
+            engine = _instances.get(name)
+            if engine is None:
+                if name not in _registry:
+                    raise ValueError(f"Unknown inference engine: {name!r} (expected one of {engine_names()})")
+                cls, cnn, head, description = _registry[name]
+                engine = cls(name, cnn, head, engine_threshold(name), description)
+                _instances[name] = engine
+    return engine
+
+
+register_engine("numpy", "tf", "numpy", "float32 Xception graph + NumPy GRU head")
+register_engine("keras", "tf", "keras", "float32 Xception graph + Keras GRU head")
+register_engine("fp16", "fp16", "numpy", "float16 TFLite Xception + NumPy GRU head")
+register_engine("int8", "int8", "numpy", "int8 TFLite Xception + NumPy GRU head")
@@ -1,12 +1,40 @@
 """
 Extract weights from the TimeDistributed model and save them separately.
 Run this script ONCE to extract the weights, then the main app can use them.
+
+Besides the compressed .npz files, every weight set is also written
+uncompressed as saved_models/<name>/arr_<i>.npy, which the app memory-maps
+at startup instead of decompressing.
+
+To convert existing .npz files without the .keras model:
+    python extract_weights.py --from-npz
 """
-import tensorflow as tf
 import numpy as np
 import os
+import sys
+
+from weights import save_weight_arrays
 
 MODEL_PATH = "saved_models/xception_gru_model.keras"
+NPZ_PATHS = [
+    "saved_models/xception_weights.npz",
+    "saved_models/gru_weights.npz",
+    "saved_models/dense_weights.npz",
+]
+
+if "--from-npz" in sys.argv:
+    print("Converting .npz weights to memory-mappable .npy directories...")
+    for npz_path in NPZ_PATHS:
+        if not os.path.exists(npz_path):
+            print(f"  ⚠️ Not found: {npz_path}")
+            continue
+        data = np.load(npz_path)
+        arrays = [data[f'arr_{i}'] for i in range(len(data.files))]
+        directory = save_weight_arrays(npz_path, arrays)
+        print(f"  ✅ {npz_path} → {directory}/ ({len(arrays)} arrays)")
+    sys.exit(0)
+
+import tensorflow as tf
 
 print("=" * 60)
 print("WEIGHT EXTRACTION SCRIPT")
@@ -75,6 +103,8 @@ if xception_weights:
     np.savez_compressed('saved_models/xception_weights.npz', *xception_weights)
     print("  ✅ Saved: saved_models/xception_weights.npz")
     print(f"     Size: {os.path.getsize('saved_models/xception_weights.npz') / 1024 / 1024:.2f} MB")
+    save_weight_arrays('saved_models/xception_weights.npz', xception_weights)
+    print("  ✅ Saved: saved_models/xception_weights/ (uncompressed .npy, memory-mappable)")
 else:
     print("  ⚠️ No Xception weights found")
 
@@ -82,6 +112,8 @@ if gru_weights:
     np.savez_compressed('saved_models/gru_weights.npz', *gru_weights)
     print("  ✅ Saved: saved_models/gru_weights.npz")
     print(f"     Size: {os.path.getsize('saved_models/gru_weights.npz') / 1024:.2f} KB")
+    save_weight_arrays('saved_models/gru_weights.npz', gru_weights)
+    print("  ✅ Saved: saved_models/gru_weights/ (uncompressed .npy, memory-mappable)")
 else:
     print("  ⚠️ No GRU weights found")
 
@@ -89,6 +121,8 @@ if dense_weights:
     np.savez_compressed('saved_models/dense_weights.npz', *dense_weights)
     print("  ✅ Saved: saved_models/dense_weights.npz")
     print(f"     Size: {os.path.getsize('saved_models/dense_weights.npz') / 1024:.2f} KB")
+    save_weight_arrays('saved_models/dense_weights.npz', dense_weights)
+    print("  ✅ Saved: saved_models/dense_weights/ (uncompressed .npy, memory-mappable)")
 else:
     print("  ⚠️ No Dense weights found")
 
@@ -99,4 +133,5 @@ print("\nExtracted files:")
 print("  - saved_models/xception_weights.npz")
 print("  - saved_models/gru_weights.npz")
 print("  - saved_models/dense_weights.npz")
+print("  - saved_models/{xception,gru,dense}_weights/arr_<i>.npy (memory-mapped by the app)")
 print("\nNext: Update model.py to load these .npz files")
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+Optional face-region cropping before the Xception pass.
+
+Most of the deepfake signal is in the face, so instead of squeezing the
+whole frame into 299x299 the sampled frames are cropped to a square around
+the largest face. The face is detected once and then tracked: later frames
+are searched only in a window around the previous box, falling back to a
+full-frame search, then to the full frame when no face is found.
+
+Detectors (both run on CPU):
+- Haar cascade (cv2.CascadeClassifier + cv2.data.haarcascades), bundled
+  with opencv-python 4.x.
+- YuNet (cv2.FaceDetectorYN), used when FACE_DETECTOR_MODEL points at its
+  .onnx file. OpenCV 5 builds have no Haar cascades, so this is the option
+  there.
+"""
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from logger import get_logger
+from metrics import Counter
+
+log = get_logger("face_crop")
+
+FACE_CROP = os.getenv("FACE_CROP", "0") == "1"
+# YuNet .onnx model; unset = Haar cascade from cv2.data
+FACE_DETECTOR_MODEL = os.getenv("FACE_DETECTOR_MODEL")
+FACE_CASCADE_PATH = os.getenv("FACE_CASCADE_PATH") or (
+    os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+    if hasattr(cv2, "data") and hasattr(cv2.data, "haarcascades") else None)
+# Extra context around the detected box (0.4 = 40% of the face size)
+FACE_MARGIN = float(os.getenv("FACE_MARGIN", "0.4"))
+# Frames are downscaled to this width for detection
+FACE_DETECT_WIDTH = int(os.getenv("FACE_DETECT_WIDTH", "480"))
+# While tracking, the search window is scaled so the last face is this many pixels wide
+_TRACK_FACE_PX = 60
+# Consecutive sampled frames that may reuse the last box when the face is lost
+FACE_MAX_MISSES = int(os.getenv("FACE_MAX_MISSES", "2"))
+
+FACE_CROPS = Counter("deepfake_face_crops_total",
+                     "Sampled frames by crop outcome (detected, tracked, reused, full_frame)", ["result"])
+
+_local = threading.local()
+_unavailable_logged = False
+
+
+# ============================================================
+#  Detectors (one per thread; OpenCV detectors keep internal state)
+# ============================================================
+class _HaarDetector:
+    def __init__(self, path):
+        if not hasattr(cv2, "CascadeClassifier"):
+            raise RuntimeError("this OpenCV build has no CascadeClassifier; set FACE_DETECTOR_MODEL to a YuNet .onnx")
+        if not path or not os.path.exists(path):
+            raise FileNotFoundError(f"Haar cascade not found: {path}")
+        self._cascade = cv2.CascadeClassifier(path)
+
+    def detect(self, bgr, min_side=None, max_side=None):
+        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        min_side = min_side or max(24, min(gray.shape) // 10)
+        max_side = max_side or 0
+        boxes = self._cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5,
+                                               minSize=(min_side, min_side), maxSize=(max_side, max_side))
+        return [tuple(int(v) for v in box) for box in boxes]
+
+
+class _YuNetDetector:
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"YuNet model not found: {path}")
+        self._detector = cv2.FaceDetectorYN.create(path, "", (320, 320), score_threshold=0.7)
+
+    def detect(self, bgr, min_side=None, max_side=None):
+        self._detector.setInputSize((bgr.shape[1], bgr.shape[0]))
+        _, faces = self._detector.detect(bgr)
+        if faces is None:
+            return []
+        return [tuple(int(v) for v in face[:4]) for face in faces]
+
+
+def _get_detector():
+    """This thread's detector, or None (logged once) if none can be loaded."""
+    global _unavailable_logged
+    if not hasattr(_local, "detector"):
+        try:
+            _local.detector = _YuNetDetector(FACE_DETECTOR_MODEL) if FACE_DETECTOR_MODEL \
+                else _HaarDetector(FACE_CASCADE_PATH)
+        except Exception as e:
+            _local.detector = None
+            if not _unavailable_logged:
+                _unavailable_logged = True
+                log.warning(f"⚠️ Face detector unavailable ({e}); using full frames")
+    return _local.detector
+
+
+# ============================================================
+#  Tracking across sampled frames
+# ============================================================
+def _largest(boxes):
+    return max(boxes, key=lambda b: b[2] * b[3]) if boxes else None
+
+
+def _square(box, side, width, height):
+    """Top-left corner of a `side` x `side` crop centered on `box`, kept inside the frame."""
+    x, y, w, h = box
+    cx, cy = x + w / 2, y + h / 2
+    x0 = int(round(min(max(cx - side / 2, 0), width - side)))
+    y0 = int(round(min(max(cy - side / 2, 0), height - side)))
+    return x0, y0
+
+
+class FaceTracker:
+    """
+    Crops a sequence of frames from one clip to the same face.
+
+    Detection runs on a downscaled copy. After the first hit, the next frame
+    is searched only in a window three times the size of the last box, at a
+    narrow range of face sizes; the crop side is smoothed across frames so the
+    face stays at a steady scale.
+    """
+
+    def __init__(self, detector, margin=FACE_MARGIN, detect_width=FACE_DETECT_WIDTH, max_misses=FACE_MAX_MISSES):
+        self.detector = detector
+        self.margin = margin
+        self.detect_width = detect_width
+        self.max_misses = max_misses
+        self._box = None
+        self._side = None
+        self._misses = 0
+
+    def _detect(self, frame, window=None):
+        """Largest face as (x, y, w, h) in full-frame coordinates, searching only `window` if given."""
+        x0, y0 = 0, 0
+        region = frame
+        min_side = max_side = None
+        if window is None:
+            scale = min(1.0, self.detect_width / max(1, region.shape[1]))
+        else:
+            x0, y0, x1, y1 = window
+            region = frame[y0:y1, x0:x1]
+            # The face won't change size much between samples: search a small
+            # scale range around the last one, at low resolution
+            scale = min(1.0, _TRACK_FACE_PX / max(self._box[2], self._box[3]))
+            last = max(self._box[2], self._box[3]) * scale
+            min_side, max_side = max(20, int(last * 0.6)), int(last * 1.6) + 1
+        small = cv2.resize(region, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else region
+        box = _largest(self.detector.detect(small, min_side, max_side))
+        if box is None:
+            return None
+        x, y, w, h = (v / scale for v in box)
+        return int(x + x0), int(y + y0), int(w), int(h)
+
+    def _search_window(self, width, height):
+        x, y, w, h = self._box
+        cx, cy = x + w / 2, y + h / 2
+        # Sampled frames can be a second or more apart, so allow for real motion
+        half = 1.5 * max(w, h)
+        return (int(max(0, cx - half)), int(max(0, cy - half)),
+                int(min(width, cx + half)), int(min(height, cy + half)))
+
+    def crop(self, frame):
+        height, width = frame.shape[:2]
+        box = None
+        if self._box is not None:
+            box = self._detect(frame, self._search_window(width, height))
+            result = "tracked"
+        if box is None:
+            box = self._detect(frame)
+            result = "detected"
+
+        if box is None:
+            self._misses += 1
+            if self._box is None or self._misses > self.max_misses:
+                FACE_CROPS.inc(result="full_frame")
+                return frame
+            # Brief miss (blink, motion blur, profile): keep the last box
+            box = self._box
+            result = "reused"
+        else:
+            self._misses = 0
+
+        self._box = box
+        side = max(box[2], box[3]) * (1 + self.margin)
+        if self._side is not None and result != "detected":
+            # Smooth the scale so the face doesn't jump in size between samples
+            side = 0.5 * self._side + 0.5 * side
+        side = max(1, min(int(round(side)), width, height))
+        self._side = side
+        x0, y0 = _square(box, side, width, height)
+        FACE_CROPS.inc(result=result)
+        return frame[y0:y0 + side, x0:x0 + side]
+
+
+def face_tracker():
+    """A FaceTracker for one clip, or None when no detector is available."""
+    detector = _get_detector()
+    return FaceTracker(detector) if detector is not None else None
+
+
+def crop_faces(frames):
+    """
+    Crop each decoded BGR frame of one clip to the tracked face. Frames stay
+    whole when no detector is available or no face is found.
+    """
+    tracker = face_tracker()
+    if tracker is None:
+        return frames
+    return [tracker.crop(np.ascontiguousarray(frame)) for frame in frames]
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from weights import source_signature
+from worker_files import worker_path
+
+FEATURE_DIM = 2048
+
+# In-memory entries (2048 float32 = 8 KB each, stored as copies); 0 (the default) disables the cache
+FEATURE_CACHE_SIZE = int(os.getenv("FEATURE_CACHE_SIZE", "0"))
+# Optional memory-mapped on-disk tier (unset = memory only)
+FEATURE_CACHE_DIR = os.getenv("FEATURE_CACHE_DIR")
+FEATURE_CACHE_DISK_ENTRIES = int(os.getenv("FEATURE_CACHE_DISK_ENTRIES", "65536"))
+
+# One disk-tier row: frame digest, row checksum, features
+_ROW = np.dtype([("key", np.uint8, 16), ("check", "<u8"), ("feature", "<f4", FEATURE_DIM)])
+
+
+def frame_digest(frame):
+    """
+    128-bit BLAKE2b digest of a preprocessed (299, 299, 3) frame.
+
+    Only bit-identical frames share features. A perceptual hash would also
+    match lightly edited frames, and a face-swapped frame must never get
+    the features of the frame it was made from.
+    """
+    return hashlib.blake2b(np.ascontiguousarray(frame, dtype=np.float32).tobytes(), digest_size=16).digest()
+
+
+def _row_check(key, feature):
+    h = hashlib.blake2b(key, digest_size=8)
+    h.update(feature.tobytes())
+    return int.from_bytes(h.digest(), "little")
+
+
+# ============================================================
+#  Memory-mapped disk tier
+# ============================================================
+class _DiskTier:
+    """
+    Direct-mapped table of features on disk: slot = digest % capacity.
+    A colliding insert overwrites the previous entry, so size stays fixed.
+
+    Several processes may share the table. It is created under a temp name
+    and linked into place, so nobody maps a half-initialized file, and each
+    row carries a checksum over its key and features that is written last:
+    a row caught mid-write, or torn by two writers, reads as a miss.
+    """
+
+    def __init__(self, directory, capacity):
+        os.makedirs(directory, exist_ok=True)
+        self.capacity = capacity
+        path = os.path.join(directory, f"features-{capacity}.rows")
+        if not os.path.exists(path):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            np.memmap(tmp, dtype=_ROW, mode="w+", shape=(capacity,)).flush()
+            try:
+                # Unlike os.replace, never swaps out a table another process already maps
+                os.link(tmp, path)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(tmp)
+        self.rows = np.memmap(path, dtype=_ROW, mode="r+", shape=(capacity,))
+
+    def _slot(self, key):
+        return int.from_bytes(key[:8], "little") % self.capacity
+
+    def get(self, key):
+        row = np.array(self.rows[self._slot(key)])
+        if row["key"].tobytes() != key:
+            return None
+        feature = row["feature"]
+        if int(row["check"]) != _row_check(key, feature):
+            return None
+        return feature
+
+    def put(self, key, feature):
+        row = self.rows[self._slot(key)]
+        row["check"] = 0
+        row["key"] = np.frombuffer(key, dtype=np.uint8)
+        row["feature"] = feature
+        row["check"] = _row_check(key, feature)
+
+    def flush(self):
+        self.rows.flush()
+
+
+# ============================================================
+#  Per-frame feature cache
+# ============================================================
+class FeatureCache:
+    """
+    Xception feature vectors keyed by the digest of the input frame.
+    A bounded in-memory LRU, optionally backed by a memory-mapped disk tier.
+    """
+
+    def __init__(self, max_entries=FEATURE_CACHE_SIZE, disk_dir=FEATURE_CACHE_DIR,
+                 disk_entries=FEATURE_CACHE_DISK_ENTRIES, namespace=""):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        if disk_dir:
+            # Features depend on the CNN weights, so each weight set gets its own files,
+            # and each serve.py worker its own table
+            self._disk = _DiskTier(worker_path(os.path.join(disk_dir, namespace or "default")), disk_entries)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 or self._disk is not None
+
+    def get(self, key):
+        with self._lock:
+            feature = self._entries.get(key)
+            if feature is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return feature
+            if self._disk is not None:
+                feature = self._disk.get(key)
+                if feature is not None:
+                    self._remember(key, feature)
+                    self.hits += 1
+                    return feature
+            self.misses += 1
+            return None
+
+    def put(self, key, feature):
+        # Always a copy: a row view would keep the caller's whole batch array alive
+        feature = np.array(feature, dtype=np.float32)
+        with self._lock:
+            self._remember(key, feature)
+            if self._disk is not None:
+                self._disk.put(key, feature)
+
+    def _remember(self, key, feature):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = feature
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def flush(self):
+        if self._disk is not None:
+            with self._lock:
+                self._disk.flush()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_entries": self._disk.capacity if self._disk is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def weights_namespace(*paths):
+    """Short id for a set of weight files (size + mtime), used to separate disk tiers."""
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(f"{source_signature(path)}|".encode())
+    return h.hexdigest()[:16]
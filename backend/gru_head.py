@@ -0,0 +1,114 @@
+"""
+Pure-NumPy inference for the GRU(128) + Dense(1) classifier head.
+
+The head is tiny (~0.8M params), so Keras' fixed per-call overhead dominates
+its runtime. This implementation loads the same .npz weights and reproduces
+Keras GRU semantics (gate order z, r, h; `reset_after` bias layout; sigmoid
+recurrent activation, tanh activation). Dropout is a no-op at inference.
+
+tests/test_gru_head.py checks parity with Keras layers on random weights.
+To check it against the deployed weights (needs TensorFlow):
+    python gru_head.py
+"""
+import numpy as np
+
+from weights import load_weight_arrays
+
+
+def _sigmoid(x):
+    # Numerically stable for large |x| in float32
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+# ============================================================
+#  NumPy GRU + Dense head
+# ============================================================
+class NumpyGRUHead:
+    """
+    Batched GRU + sigmoid Dense head over (batch, timesteps, 2048) features.
+
+    Weight layout follows Keras:
+        kernel            (input_dim, 3 * units)   columns [z | r | h]
+        recurrent_kernel  (units, 3 * units)       columns [z | r | h]
+        bias              (2, 3 * units) if reset_after (input, recurrent rows)
+                          (3 * units,)   otherwise
+    """
+
+    def __init__(self, kernel, recurrent_kernel, bias, dense_kernel, dense_bias):
+        self.kernel = np.asarray(kernel, dtype=np.float32)
+        self.recurrent_kernel = np.asarray(recurrent_kernel, dtype=np.float32)
+        self.units = self.recurrent_kernel.shape[0]
+        bias = np.asarray(bias, dtype=np.float32)
+        self.reset_after = bias.ndim == 2
+        if self.reset_after:
+            self.input_bias, self.recurrent_bias = bias[0], bias[1]
+        else:
+            self.input_bias, self.recurrent_bias = bias, np.zeros_like(bias)
+        self.dense_kernel = np.asarray(dense_kernel, dtype=np.float32)
+        self.dense_bias = np.asarray(dense_bias, dtype=np.float32)
+
+    @classmethod
+    def from_npz(cls, gru_path, dense_path):
+        """Load from gru_weights.npz / dense_weights.npz (or their .npy directories)."""
+        kernel, recurrent_kernel, bias = load_weight_arrays(gru_path)
+        dense_kernel, dense_bias = load_weight_arrays(dense_path)
+        return cls(kernel, recurrent_kernel, bias, dense_kernel, dense_bias)
+
+    def final_state(self, features):
+        """Last GRU hidden state, shape (batch, units)."""
+        x = np.asarray(features, dtype=np.float32)
+        batch, steps, _ = x.shape
+        u = self.units
+
+        # Input projections for every timestep in one matmul
+        x_proj = (x.reshape(batch * steps, -1) @ self.kernel + self.input_bias).reshape(batch, steps, 3 * u)
+        u_zr = self.recurrent_kernel[:, :2 * u]
+        u_h = self.recurrent_kernel[:, 2 * u:]
+        b_zr = self.recurrent_bias[:2 * u]
+        b_h = self.recurrent_bias[2 * u:]
+
+        h = np.zeros((batch, u), dtype=np.float32)
+        for t in range(steps):
+            xt = x_proj[:, t]
+            zr = _sigmoid(xt[:, :2 * u] + h @ u_zr + b_zr)
+            z, r = zr[:, :u], zr[:, u:]
+            if self.reset_after:
+                hh = np.tanh(xt[:, 2 * u:] + r * (h @ u_h + b_h))
+            else:
+                hh = np.tanh(xt[:, 2 * u:] + (r * h) @ u_h)
+            h = z * h + (1.0 - z) * hh
+        return h
+
+    def predict(self, features):
+        """Sigmoid scores, shape (batch,)."""
+        logits = self.final_state(features) @ self.dense_kernel + self.dense_bias
+        return _sigmoid(logits)[:, 0]
+
+    __call__ = predict
+
+
+def check_parity(batch=4, steps=10, atol=1e-5, seed=0):
+    """
+    Compare against model.build_gru_classifier() on random features.
+    Uses the trained weights when present, otherwise the Keras random init.
+    Returns the max absolute difference; raises AssertionError past `atol`.
+    """
+    from model import get_gru_model
+
+    keras_model = get_gru_model()
+    gru = keras_model.get_layer("gru")
+    dense = keras_model.get_layer("dense")
+    head = NumpyGRUHead(*gru.get_weights(), *dense.get_weights())
+
+    rng = np.random.default_rng(seed)
+    features = rng.normal(0, 1, size=(batch, steps, head.kernel.shape[0])).astype(np.float32)
+    expected = keras_model.predict(features, verbose=0)[:, 0]
+    actual = head.predict(features)
+    diff = float(np.max(np.abs(expected - actual)))
+    assert diff <= atol, f"NumPy head differs from Keras by {diff:.3g} (atol={atol})"
+    return diff
+
+
+if __name__ == "__main__":
+    diff = check_parity()
+    print(f"✅ NumPy GRU head matches Keras (max abs diff {diff:.2e})")
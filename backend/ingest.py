@@ -0,0 +1,231 @@
+import asyncio
+import errno
+import hashlib
+import os
+import queue
+import threading
+import time
+import uuid
+
+import cv2
+
+# Uploads larger than this are rejected while they stream in
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+# Decode from a FIFO while the upload is still arriving (POSIX only)
+STREAM_DECODE = os.getenv("STREAM_DECODE", "1") == "1" and hasattr(os, "mkfifo")
+# How long to wait for the decoder to open the FIFO before giving up on it
+FIFO_OPEN_TIMEOUT_SEC = float(os.getenv("FIFO_OPEN_TIMEOUT_SEC", "5"))
+
+UPLOAD_DIR = "uploads"
+CHUNK_SIZE = 1024 * 1024
+_QUEUE_CHUNKS = 64
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload goes over MAX_UPLOAD_BYTES."""
+
+
+# ============================================================
+#  Temp-file upload with guaranteed cleanup
+# ============================================================
+class TempUpload:
+    """
+    A uniquely named file under uploads/ that is always removed on exit,
+    whether the request succeeds, fails or is cancelled.
+    """
+
+    def __init__(self, directory=UPLOAD_DIR, suffix=".mp4"):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"temp_{uuid.uuid4()}{suffix}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+    def cleanup(self):
+        _unlink(self.path)
+
+
+def save_upload(src, path, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Copy a file-like upload to `path` in chunks, hashing it on the way.
+    Returns the SHA-256 hex digest; raises UploadTooLarge past `max_bytes`.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as buffer:
+        while chunk := src.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            digest.update(chunk)
+            buffer.write(chunk)
+    return digest.hexdigest()
+
+
+def _unlink(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# ============================================================
+#  Streaming ingest: decode while bytes are still arriving
+# ============================================================
+class StreamingUpload(TempUpload):
+    """
+    Tees an incoming byte stream to a temp file and to a FIFO.
+
+    A decoder can open `fifo_path` with cv2.VideoCapture and start sampling
+    frames while the upload is still arriving. The temp file is kept as a
+    fallback for containers that can't be decoded from a pipe (e.g. MP4 with
+    the moov atom at the end) and to compute the content hash.
+
+    Usage:
+        with StreamingUpload() as upload:
+            upload.start()
+            async for chunk in request.stream():
+                await upload.feed(chunk)
+            digest = await upload.finish()
+    """
+
+    def __init__(self, directory=UPLOAD_DIR, max_bytes=MAX_UPLOAD_BYTES, stream_decode=STREAM_DECODE):
+        super().__init__(directory)
+        self.max_bytes = max_bytes
+        self.fifo_path = self.path + ".fifo" if stream_decode else None
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._chunks = queue.Queue(maxsize=_QUEUE_CHUNKS)
+        self._writer = None
+        self._error = None
+        self._aborted = threading.Event()
+        self._reader_gone = threading.Event()
+
+    def start(self):
+        if self.fifo_path is not None:
+            os.mkfifo(self.fifo_path)
+        self._writer = threading.Thread(target=self._write_loop, name="upload-writer", daemon=True)
+        self._writer.start()
+
+    async def feed(self, chunk):
+        """Append one chunk; raises UploadTooLarge once the limit is crossed."""
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+        self._digest.update(chunk)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._chunks.put, chunk)
+
+    def reader_done(self):
+        """Tell the writer the decoder has stopped reading the FIFO."""
+        self._reader_gone.set()
+
+    async def finish(self):
+        """Wait until every chunk is on disk; returns the SHA-256 hex digest."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._chunks.put, None)
+        await loop.run_in_executor(None, self._writer.join)
+        if self._error is not None:
+            raise self._error
+        return self._digest.hexdigest()
+
+    def cleanup(self):
+        if self._writer is not None and self._writer.is_alive():
+            self._aborted.set()
+            self._reader_gone.set()
+            # Unblock the writer if it is waiting on a full queue
+            try:
+                self._chunks.put_nowait(None)
+            except queue.Full:
+                pass
+            self._writer.join(timeout=FIFO_OPEN_TIMEOUT_SEC)
+        if self.fifo_path is not None:
+            _release_fifo_reader(self.fifo_path)
+            _unlink(self.fifo_path)
+        super().cleanup()
+
+    def _write_loop(self):
+        fifo = None
+        fifo_failed = self.fifo_path is None
+        try:
+            with open(self.path, "wb") as out:
+                while not self._aborted.is_set():
+                    chunk = self._chunks.get()
+                    if chunk is None:
+                        break
+                    out.write(chunk)
+                    if fifo_failed:
+                        continue
+                    try:
+                        if fifo is None:
+                            fifo = _open_fifo_writer(self.fifo_path, FIFO_OPEN_TIMEOUT_SEC, self._reader_gone)
+                        _write_all(fifo, chunk)
+                    except OSError:
+                        # Decoder gone (done sampling, or can't read this container from a pipe);
+                        # keep writing the temp file only.
+                        fifo_failed = True
+        except Exception as e:
+            self._error = e
+        finally:
+            if fifo is not None:
+                os.close(fifo)
+            elif self.fifo_path is not None:
+                _release_fifo_reader(self.fifo_path)
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _open_fifo_writer(path, timeout, give_up):
+    """
+    Open the FIFO for writing once a reader has it open. Raises OSError on
+    timeout or once `give_up` is set (the reader is gone or the upload aborted).
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            if e.errno != errno.ENXIO or give_up.is_set() or time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+            continue
+        os.set_blocking(fd, True)
+        return fd
+
+
+def _release_fifo_reader(path):
+    """
+    Make a reader blocked in open() on the FIFO see EOF, so a decoder that is
+    still waiting for data never hangs once the upload is abandoned.
+    """
+    try:
+        fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+        os.close(fd)
+    except OSError:
+        pass
+
+
+def decode_stream(fifo_path, preprocess_capture, info=None):
+    """
+    Open the FIFO with OpenCV and run `preprocess_capture` on it.
+    Pipes can't seek, so frames are sampled in one sequential pass. `info`
+    is the header probed from the upload's first bytes; without it the
+    frame count is OpenCV's estimate.
+    """
+    cap = cv2.VideoCapture(fifo_path, cv2.CAP_FFMPEG)
+    try:
+        if not cap.isOpened():
+            raise ValueError("Could not open upload stream for decoding")
+        return preprocess_capture(cap, strategy="sequential", source="upload stream", info=info)
+    finally:
+        cap.release()
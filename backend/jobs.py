@@ -0,0 +1,355 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from logger import get_logger
+from metrics import ERRORS
+
+log = get_logger("jobs")
+
+# "memory" (this process only) or "redis" (shared by every API worker)
+JOB_BACKEND = os.getenv("JOB_BACKEND", "memory")
+JOB_REDIS_URL = os.getenv("JOB_REDIS_URL", "redis://localhost:6379/0")
+# Concurrent async jobs processed by each API process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Queued jobs allowed before async submissions get 503
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "256"))
+# Finished jobs are kept (and pollable) for this long
+JOB_TTL_SEC = int(os.getenv("JOB_TTL_SEC", "3600"))
+# Redis: a running job whose worker hasn't renewed its lease for this long is requeued
+JOB_LEASE_SEC = float(os.getenv("JOB_LEASE_SEC", "60"))
+# Redis: runs a job may start before it is failed instead of requeued
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+
+JOB_STATUSES = ("queued", "running", "completed", "failed")
+_REDIS_POLL_SEC = 0.25
+
+
+class JobQueueFull(Exception):
+    """Raised when JOB_MAX_QUEUED jobs are already waiting."""
+
+
+def new_job(payload):
+    """
+    Fresh job record. `payload` holds what the worker needs and is never
+    returned to clients. `payload["path"]`, if set, is a file the job owns;
+    it is deleted when the job is dropped without being processed.
+    """
+    return {
+        "id": uuid.uuid4().hex,
+        "status": "queued",
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "result": None,
+        "error": None,
+        "payload": payload,
+    }
+
+
+def public_view(job):
+    return {k: v for k, v in job.items() if k != "payload"}
+
+
+def is_finished(job):
+    return job["status"] in ("completed", "failed")
+
+
+def _discard_upload(job):
+    path = job["payload"].get("path")
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# ============================================================
+#  In-process backend
+# ============================================================
+class InMemoryJobQueue:
+    """
+    Jobs and their queue live in this process. Only the API worker that
+    accepted a job can process or report it, so use it with a single worker.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_queued=JOB_MAX_QUEUED, ttl=JOB_TTL_SEC):
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._jobs = {}
+        self._pending = asyncio.Queue()
+        self._changed = {}
+
+    async def submit(self, job):
+        if self._pending.qsize() >= self.max_queued:
+            raise JobQueueFull(f"Job queue is full ({self._pending.qsize()} waiting)")
+        self._prune()
+        self._jobs[job["id"]] = job
+        self._pending.put_nowait(job["id"])
+
+    async def claim(self, timeout):
+        """Next queued job, marked running, or None after `timeout` seconds."""
+        try:
+            job_id = await asyncio.wait_for(self._pending.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return await self.update(job_id, status="running", started_at=time.time())
+
+    async def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    async def update(self, job_id, **fields):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        # Wake everyone waiting on this job, then arm a fresh event
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+        return job
+
+    async def wait(self, job_id, timeout):
+        """Return the job after its next update, or as-is after `timeout` seconds."""
+        event = self._changed.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._jobs.get(job_id)
+
+    async def renew(self, job_id):
+        pass
+
+    async def requeue_expired(self):
+        # Running jobs die with this process; there is no one else to hand them to
+        return 0
+
+    async def abandon_pending(self):
+        """Fail jobs that never started: nothing will run them once this process exits."""
+        while not self._pending.empty():
+            job = await self.update(self._pending.get_nowait(), status="failed", error="Server shutting down",
+                                    finished_at=time.time())
+            if job is not None:
+                _discard_upload(job)
+
+    async def close(self):
+        pass
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j["id"] for j in self._jobs.values() if is_finished(j) and j["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+            self._changed.pop(job_id, None)
+
+    async def stats(self):
+        statuses = [j["status"] for j in self._jobs.values()]
+        return {"backend": self.name, "queued": self._pending.qsize(),
+                **{s: statuses.count(s) for s in JOB_STATUSES if s != "queued"}}
+
+
+# ============================================================
+#  Redis backend (shared between API workers)
+# ============================================================
+class RedisJobQueue:
+    """
+    Job records are JSON strings under jobs:<id> (expiring after `ttl`) and
+    the queue is the jobs:queue list, so any API worker can accept, process
+    or report any job. Anything that speaks the Redis protocol works
+    (redis-server, Valkey, KeyDB...). Uploads are read from the local
+    uploads/ directory, so all workers must share it.
+
+    A running job holds a lease in the jobs:leases sorted set, renewed by
+    its worker while it works. When a worker dies, its lease runs out and
+    requeue_expired() puts the job back in the queue, or fails it once it
+    has been started `max_attempts` times.
+    """
+
+    name = "redis"
+    QUEUE_KEY = "jobs:queue"
+    LEASE_KEY = "jobs:leases"
+
+    def __init__(self, url=JOB_REDIS_URL, max_queued=JOB_MAX_QUEUED, ttl=JOB_TTL_SEC, lease=JOB_LEASE_SEC,
+                 max_attempts=JOB_MAX_ATTEMPTS):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("JOB_BACKEND=redis needs the redis package (pip install redis)")
+        self._redis = redis.from_url(url, decode_responses=True)
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.lease = lease
+        self.max_attempts = max_attempts
+
+    @staticmethod
+    def _key(job_id):
+        return f"jobs:{job_id}"
+
+    async def submit(self, job):
+        queued = await self._redis.llen(self.QUEUE_KEY)
+        if queued >= self.max_queued:
+            raise JobQueueFull(f"Job queue is full ({queued} waiting)")
+        await self._redis.set(self._key(job["id"]), json.dumps(job), ex=self.ttl)
+        await self._redis.rpush(self.QUEUE_KEY, job["id"])
+
+    async def claim(self, timeout):
+        item = await self._redis.blpop([self.QUEUE_KEY], timeout=max(1, int(timeout)))
+        if item is None:
+            return None
+        job = await self.get(item[1])
+        if job is None:
+            return None
+        await self.renew(job["id"])
+        return await self.update(job["id"], status="running", started_at=time.time(),
+                                 attempts=job.get("attempts", 0) + 1)
+
+    async def renew(self, job_id):
+        """Extend the lease of a job this worker is running."""
+        await self._redis.zadd(self.LEASE_KEY, {job_id: time.time() + self.lease})
+
+    async def requeue_expired(self):
+        """Requeue (or fail) running jobs whose lease ran out; returns how many were requeued."""
+        requeued = 0
+        for job_id in await self._redis.zrangebyscore(self.LEASE_KEY, "-inf", time.time()):
+            # Only one worker removes each lease, so every expired job is handled once
+            if not await self._redis.zrem(self.LEASE_KEY, job_id):
+                continue
+            job = await self.get(job_id)
+            if job is None or job["status"] != "running":
+                continue
+            if job.get("attempts", 1) >= self.max_attempts:
+                log.warning(f"Job {job_id} lost its worker {job.get('attempts', 1)} times; failing it")
+                await self.update(job_id, status="failed", error="Worker stopped while processing the job",
+                                  finished_at=time.time())
+                _discard_upload(job)
+            else:
+                log.warning(f"Job {job_id} lost its worker; requeueing it")
+                await self.update(job_id, status="queued", started_at=None)
+                await self._redis.rpush(self.QUEUE_KEY, job_id)
+                requeued += 1
+        return requeued
+
+    async def get(self, job_id):
+        raw = await self._redis.get(self._key(job_id))
+        return json.loads(raw) if raw is not None else None
+
+    async def update(self, job_id, **fields):
+        # Each job is only ever written by the worker that claimed it, so a
+        # plain read-modify-write is enough
+        job = await self.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        await self._redis.set(self._key(job_id), json.dumps(job), ex=self.ttl)
+        if is_finished(job):
+            await self._redis.zrem(self.LEASE_KEY, job_id)
+        return job
+
+    async def wait(self, job_id, timeout):
+        # Polls; the API worker serving the client may not be the one running the job
+        before = await self.get(job_id)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(_REDIS_POLL_SEC)
+            job = await self.get(job_id)
+            if job is None or before is None or job["status"] != before["status"]:
+                return job
+        return before
+
+    async def abandon_pending(self):
+        # Queued jobs stay in Redis for the other workers, or for the next start
+        pass
+
+    async def close(self):
+        await self._redis.aclose()
+
+    async def stats(self):
+        return {"backend": self.name, "queued": await self._redis.llen(self.QUEUE_KEY)}
+
+
+def create_job_queue(backend=JOB_BACKEND):
+    if backend == "memory":
+        return InMemoryJobQueue()
+    if backend == "redis":
+        return RedisJobQueue()
+    raise ValueError(f"Unknown JOB_BACKEND: {backend!r} (expected 'memory' or 'redis')")
+
+
+# ============================================================
+#  Job workers
+# ============================================================
+class JobRunner:
+    """
+    `concurrency` asyncio tasks that claim jobs from `queue` and hand them
+    to `handler(job) -> result dict`. Exceptions mark the job failed. While
+    a job runs its lease is renewed, and one more task requeues jobs whose
+    worker stopped renewing theirs.
+    """
+
+    def __init__(self, queue, handler, concurrency=JOB_WORKERS):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self._tasks = []
+        self.processed = 0
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+            self._tasks.append(asyncio.create_task(self._requeue_expired()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.queue.abandon_pending()
+
+    async def _work(self):
+        while True:
+            try:
+                job = await self.queue.claim(timeout=5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Backend unreachable; don't spin
+                log.warning(f"Could not claim job: {e}")
+                await asyncio.sleep(1)
+                continue
+            if job is None:
+                continue
+            heartbeat = asyncio.create_task(self._renew(job["id"]))
+            try:
+                result = await self.handler(job)
+                await self.queue.update(job["id"], status="completed", result=result, finished_at=time.time())
+            except asyncio.CancelledError:
+                await self.queue.update(job["id"], status="failed", error="Server shutting down",
+                                        finished_at=time.time())
+                raise
+            except Exception as e:
+                ERRORS.inc(stage="job")
+                log.error(f"Job {job['id']} failed: {e}")
+                await self.queue.update(job["id"], status="failed", error=str(e), finished_at=time.time())
+            finally:
+                heartbeat.cancel()
+            self.processed += 1
+
+    async def _renew(self, job_id):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SEC / 3)
+            try:
+                await self.queue.renew(job_id)
+            except Exception as e:
+                log.warning(f"Could not renew the lease of job {job_id}: {e}")
+
+    async def _requeue_expired(self):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SEC / 3)
+            try:
+                await self.queue.requeue_expired()
+            except Exception as e:
+                log.warning(f"Could not requeue expired jobs: {e}")
@@ -0,0 +1,31 @@
+import logging
+import os
+import sys
+
+# DEBUG shows per-request progress; WARNING keeps only problems; OFF silences everything
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+_configured = False
+
+
+def _configure():
+    global _configured
+    root = logging.getLogger("deepfake")
+    if LOG_LEVEL == "OFF":
+        root.addHandler(logging.NullHandler())
+        root.setLevel(logging.CRITICAL + 1)
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+    # Don't print twice when uvicorn has configured the root logger too
+    root.propagate = False
+    _configured = True
+
+
+def get_logger(name):
+    """Logger under the "deepfake" hierarchy, configured from LOG_LEVEL on first use."""
+    if not _configured:
+        _configure()
+    return logging.getLogger(f"deepfake.{name}")
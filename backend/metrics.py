@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds (Xception on CPU sits around 0.1-2 s per batch)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+_collectors = []
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# ============================================================
+#  Metric types (Prometheus text format, no client library needed)
+# ============================================================
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, counts in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {counts[-1]!r}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def register_collector(fn):
+    """
+    `fn()` is called at scrape time and returns (name, type, help, samples)
+    tuples, where samples is a list of ({label: value}, number). Used for
+    values other components already track (queue depth, cache hit counts).
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def render():
+    """The whole registry in Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            families = collector()
+        except Exception as e:
+            # A broken collector shouldn't take /metrics down with it
+            lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {e}")
+            continue
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================
+#  Pipeline metrics
+# ============================================================
+STAGE_SECONDS = Histogram(
+    "deepfake_stage_seconds",
+    "Time spent in each pipeline stage (upload_write, decode, resize, cnn, gru, db_insert)",
+    ["stage"],
+)
+REQUEST_SECONDS = Histogram("deepfake_request_seconds", "End-to-end prediction latency", ["endpoint"])
+PREDICTIONS = Counter("deepfake_predictions_total", "Predictions served, by label", ["label"])
+ERRORS = Counter("deepfake_errors_total", "Failures, by where they happened", ["stage"])
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block into deepfake_stage_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+# ============================================================
+#  Process memory (per worker when serve.py forks several)
+# ============================================================
+def process_memory(pid="self"):
+    """
+    Memory of process `pid` in bytes from /proc/<pid>/smaps_rollup: rss,
+    pss (shared pages split between the processes mapping them), uss (pages
+    no other process maps) and shared. None where that file doesn't exist.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+@register_collector
+def _collect_memory():
+    memory = process_memory()
+    if memory is None:
+        return []
+    return [("deepfake_process_memory_bytes", "gauge", "Memory of the worker that served this scrape",
+             [({"pid": os.getpid(), "kind": kind}, value) for kind, value in memory.items()])]
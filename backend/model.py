@@ -1,15 +1,40 @@
 import tensorflow as tf
 import numpy as np
-import cv2
 import os
 
-#  Load weights from .npz files (generated from Colab)
-XCEPTION_WEIGHTS_PATH = "saved_models/xception_weights.npz"
-GRU_WEIGHTS_PATH = "saved_models/gru_weights.npz"
-DENSE_WEIGHTS_PATH = "saved_models/dense_weights.npz"
+from cpu import configure_tensorflow
+from adaptive import ADAPTIVE_SAMPLING, adaptive_score, run_adaptive
+from windowed import score_windowed
+from feature_cache import FeatureCache, FEATURE_DIM, frame_digest, weights_namespace
+# Decoding lives in preprocessing.py (no TensorFlow import, so decode worker
+# processes stay light); re-exported here for existing callers.
+from preprocessing import preprocess_video, preprocess_capture, video_info, XCEPTION_PREPROCESS
+from gru_head import NumpyGRUHead
+# Load weights from .npz files (generated from Colab)
+from weights import (weights_exist, weights_source, load_weight_arrays, XCEPTION_WEIGHTS_PATH, GRU_WEIGHTS_PATH,
+                     DENSE_WEIGHTS_PATH)
+from tflite_cnn import TFLiteCNN
+from engines import INFERENCE_ENGINE, engine_threshold, get_engine
+from logger import get_logger
+from metrics import span
+
+log = get_logger("model")
+
+# Thread pool sizes must be set before TensorFlow runs its first op
+configure_tensorflow()
+
+# Threshold of the configured engine (0.55 unless ENGINE_THRESHOLDS overrides it)
+DEFAULT_THRESHOLD = engine_threshold(INFERENCE_ENGINE)
+
+# Max frames per Xception forward pass (bounds activation memory on long clips)
+FEATURE_BATCH_SIZE = int(os.getenv("FEATURE_BATCH_SIZE", "16"))
 
 _base_cnn = None
+_cnn_forward = None
+_feature_cache = None
+_tflite_cnns = {}
 _gru_model = None
+_numpy_head = None
 
 # ============================================================
 #  Load Xception CNN for feature extraction
@@ -23,30 +48,32 @@ def get_base_cnn():
     if _base_cnn is None:
         from tensorflow.keras.applications import Xception
         
-        print("📦 Creating Xception base model...")
+        has_custom = weights_exist(XCEPTION_WEIGHTS_PATH)
+        
+        log.info("📦 Creating Xception base model...")
         _base_cnn = Xception(
             include_top=False,
-            weights='imagenet',  # Use pretrained weights as fallback
+            # Custom weights overwrite everything, so don't load ImageNet first
+            weights=None if has_custom else 'imagenet',
             input_shape=(299, 299, 3),
             pooling='avg'
         )
-        print("✅ Xception base model created")
+        log.info("✅ Xception base model created")
         
-        # Try to load custom trained weights from .npz file
-        if os.path.exists(XCEPTION_WEIGHTS_PATH):
+        # Try to load custom trained weights (.npy dir or .npz file)
+        if has_custom:
             try:
-                print(f"🔄 Loading custom Xception weights from {XCEPTION_WEIGHTS_PATH}...")
-                weights_data = np.load(XCEPTION_WEIGHTS_PATH)
-                weights = [weights_data[f'arr_{i}'] for i in range(len(weights_data.files))]
+                log.info(f"🔄 Loading custom Xception weights from {weights_source(XCEPTION_WEIGHTS_PATH)}...")
+                weights = load_weight_arrays(XCEPTION_WEIGHTS_PATH)
                 _base_cnn.set_weights(weights)
-                print(f"  ✅ Loaded {len(weights)} weight arrays from trained model!")
+                log.info(f"✅ Loaded {len(weights)} weight arrays from trained model!")
             except Exception as e:
-                print(f"⚠️ Could not load custom Xception weights: {e}")
-                print("   Using ImageNet pretrained weights instead")
+                log.warning(f"⚠️ Could not load custom Xception weights: {e}; falling back to ImageNet pretrained weights")
+                _base_cnn = Xception(include_top=False, weights='imagenet',
+                                     input_shape=(299, 299, 3), pooling='avg')
         else:
-            print(f"⚠️ Custom weights file not found: {XCEPTION_WEIGHTS_PATH}")
-            print("   Using ImageNet pretrained weights instead")
-            print("   Run COLAB_SAVE_WEIGHTS.py in your Colab to generate weight files")
+            log.warning(f"⚠️ Custom weights file not found: {XCEPTION_WEIGHTS_PATH}; using ImageNet pretrained weights instead. "
+                        "Run COLAB_SAVE_WEIGHTS.py in your Colab to generate weight files")
     
     return _base_cnn
 
@@ -82,156 +109,281 @@ def get_gru_model():
     """
     global _gru_model
     if _gru_model is None:
-        print("📦 Building GRU classifier...")
+        log.info("📦 Building GRU classifier...")
         _gru_model = build_gru_classifier()
         
         # Load GRU weights from .npz file
-        if os.path.exists(GRU_WEIGHTS_PATH):
+        if weights_exist(GRU_WEIGHTS_PATH):
             try:
-                print(f"🔄 Loading GRU weights from {GRU_WEIGHTS_PATH}...")
-                weights_data = np.load(GRU_WEIGHTS_PATH)
-                gru_weights = [weights_data[f'arr_{i}'] for i in range(len(weights_data.files))]
+                log.info(f"🔄 Loading GRU weights from {weights_source(GRU_WEIGHTS_PATH)}...")
+                gru_weights = load_weight_arrays(GRU_WEIGHTS_PATH)
                 gru_layer = _gru_model.get_layer('gru')
                 gru_layer.set_weights(gru_weights)
-                print(f"  ✅ Loaded GRU weights: {len(gru_weights)} arrays")
+                log.info(f"✅ Loaded GRU weights: {len(gru_weights)} arrays")
             except Exception as e:
-                print(f"  ⚠️ Could not load GRU weights: {e}")
+                log.warning(f"⚠️ Could not load GRU weights: {e}")
         else:
-            print(f"⚠️ GRU weights file not found: {GRU_WEIGHTS_PATH}")
-            print("   Run COLAB_SAVE_WEIGHTS.py in your Colab to generate weight files")
+            log.warning(f"⚠️ GRU weights file not found: {GRU_WEIGHTS_PATH}. "
+                        "Run COLAB_SAVE_WEIGHTS.py in your Colab to generate weight files")
         
         # Load Dense layer weights from .npz file
-        if os.path.exists(DENSE_WEIGHTS_PATH):
+        if weights_exist(DENSE_WEIGHTS_PATH):
             try:
-                print(f"🔄 Loading Dense weights from {DENSE_WEIGHTS_PATH}...")
-                weights_data = np.load(DENSE_WEIGHTS_PATH)
-                dense_weights = [weights_data[f'arr_{i}'] for i in range(len(weights_data.files))]
+                log.info(f"🔄 Loading Dense weights from {weights_source(DENSE_WEIGHTS_PATH)}...")
+                dense_weights = load_weight_arrays(DENSE_WEIGHTS_PATH)
                 dense_layer = _gru_model.get_layer('dense')
                 dense_layer.set_weights(dense_weights)
-                print(f"  ✅ Loaded Dense weights: {len(dense_weights)} arrays")
+                log.info(f"✅ Loaded Dense weights: {len(dense_weights)} arrays")
             except Exception as e:
-                print(f"  ⚠️ Could not load Dense weights: {e}")
+                log.warning(f"⚠️ Could not load Dense weights: {e}")
         else:
-            print(f"⚠️ Dense weights file not found: {DENSE_WEIGHTS_PATH}")
-            print("   Run COLAB_SAVE_WEIGHTS.py in your Colab to generate weight files")
+            log.warning(f"⚠️ Dense weights file not found: {DENSE_WEIGHTS_PATH}. "
+                        "Run COLAB_SAVE_WEIGHTS.py in your Colab to generate weight files")
         
         # Check if weights were loaded successfully
-        if not os.path.exists(GRU_WEIGHTS_PATH) or not os.path.exists(DENSE_WEIGHTS_PATH):
-            print("\n" + "="*60)
-            print("⚠️ WARNING: Using random initialization - predictions unreliable!")
-            print("="*60)
-            print("To fix: Run COLAB_SAVE_WEIGHTS.py in your Colab notebook")
-            print("Then download and place the .npz files in saved_models/")
-            print("="*60 + "\n")
+        if not weights_exist(GRU_WEIGHTS_PATH) or not weights_exist(DENSE_WEIGHTS_PATH):
+            log.warning("⚠️ Using random initialization - predictions unreliable! "
+                        "To fix: run COLAB_SAVE_WEIGHTS.py in your Colab notebook, then download "
+                        "and place the .npz files in saved_models/")
     
     return _gru_model
 
 
-# ============================================================
-#  Preprocess video
-# ============================================================
-def preprocess_video(video_path, num_frames=10):
-    """Extract and preprocess frames from video."""
-    cap = cv2.VideoCapture(video_path)
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    
-    if frame_count == 0:
-        raise ValueError(f"Could not read frames from {video_path}")
-    
-    frame_indices = np.linspace(0, frame_count - 1, num_frames).astype(int)
-    frames = []
+def _get_cnn_forward():
+    """
+    Build (once) a compiled forward pass over the Xception base model.
+    Calling the graph directly avoids the per-call setup cost of Model.predict().
+    """
+    global _cnn_forward
+    if _cnn_forward is None:
+        base_cnn = get_base_cnn()
+
+        @tf.function(reduce_retracing=True)
+        def forward(batch):
+            return base_cnn(batch, training=False)
+
+        _cnn_forward = forward
+    return _cnn_forward
+
+
+def get_feature_cache():
+    """Per-frame Xception feature cache, keyed by frame digest."""
+    global _feature_cache
+    if _feature_cache is None:
+        # Features depend on the weights and on the input scaling
+        namespace = f"{weights_namespace(XCEPTION_WEIGHTS_PATH)}-{XCEPTION_PREPROCESS}-{get_engine().cnn}"
+        _feature_cache = FeatureCache(namespace=namespace)
+    return _feature_cache
+
+
+def get_tflite_cnn(mode):
+    """
+    The TFLite Xception for `mode` ("fp16"/"int8"), loaded once per process,
+    or None when the .tflite file is missing or stale (the float32 graph is
+    used then).
+    """
+    if mode not in _tflite_cnns:
+        try:
+            _tflite_cnns[mode] = TFLiteCNN.load(mode, XCEPTION_WEIGHTS_PATH, XCEPTION_PREPROCESS)
+            log.info(f"✅ Loaded {mode} TFLite Xception ({_tflite_cnns[mode].path})")
+        except Exception as e:
+            log.warning(f"⚠️ Could not load {mode} TFLite Xception: {e}; using the float32 graph")
+            _tflite_cnns[mode] = None
+    return _tflite_cnns[mode]
+
+
+def cnn_signature():
+    """Identifies the Xception runtime in use, for result cache invalidation."""
+    return get_engine().cnn_signature()
 
-    for idx in frame_indices:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        ret, frame = cap.read()
-        if not ret:
-            continue
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame = cv2.resize(frame, (299, 299))
-        frame = frame / 255.0
-        frames.append(frame)
-    cap.release()
 
-    frames = np.array(frames)
-    if len(frames) < num_frames:
-        # Pad with zeros if needed
-        pad = num_frames - len(frames)
-        frames = np.pad(frames, ((0, pad), (0, 0), (0, 0), (0, 0)), "constant")
+def _run_cnn(frames, batch_size):
+    return get_engine().run_cnn(frames, batch_size)
 
-    return frames  # shape: (10, 299, 299, 3)
+
+def _run_cnn_float32(frames, batch_size):
+    forward = _get_cnn_forward()
+    # Micro-batch long clips so activations stay bounded
+    features = []
+    for start in range(0, len(frames), batch_size):
+        batch = tf.convert_to_tensor(frames[start:start + batch_size])
+        features.append(forward(batch).numpy())
+    return np.concatenate(features, axis=0)
 
 
-def extract_frame_features(frames):
+def extract_frame_features(frames, batch_size=None):
     """
     Extract features from frames using Xception CNN.
-    This replaces TimeDistributed - we process frames in Python loop instead.
+    All frames go through the network as batched forward passes instead of
+    one predict() call per frame. Frames already in the feature cache (same
+    digest) skip the CNN entirely.
     
     Args:
         frames: numpy array of shape (num_frames, 299, 299, 3)
+        batch_size: max frames per forward pass (defaults to FEATURE_BATCH_SIZE)
     
     Returns:
         features: numpy array of shape (num_frames, 2048)
     """
-    base_cnn = get_base_cnn()
+    batch_size = batch_size or FEATURE_BATCH_SIZE
+    frames = np.asarray(frames, dtype=np.float32)
+    cache = get_feature_cache()
+    if not cache.enabled:
+        with span("cnn"):
+            return _run_cnn(frames, batch_size)
     
-    # Process each frame through Xception
-    features = []
-    for frame in frames:
-        # Add batch dimension: (299, 299, 3) -> (1, 299, 299, 3)
-        frame_batch = np.expand_dims(frame, axis=0)
-        # Extract features
-        frame_features = base_cnn.predict(frame_batch, verbose=0)
-        # Remove batch dimension: (1, 2048) -> (2048,)
-        features.append(frame_features[0])
-    
-    # Stack into array: (num_frames, 2048)
-    features = np.array(features)
+    # Look every frame up first, then run the CNN only on the misses
+    keys = [frame_digest(frame) for frame in frames]
+    features = np.empty((len(frames), FEATURE_DIM), dtype=np.float32)
+    missing = []
+    for i, key in enumerate(keys):
+        cached = cache.get(key)
+        if cached is None:
+            missing.append(i)
+        else:
+            features[i] = cached
+    
+    if missing:
+        with span("cnn"):
+            computed = _run_cnn(frames[missing], batch_size)
+        for i, feature in zip(missing, computed):
+            features[i] = feature
+            cache.put(keys[i], feature)
+    
+    # Shape: (num_frames, 2048)
     return features
 
 
+# ============================================================
+#  GRU classifier head
+# ============================================================
+def get_numpy_head():
+    """
+    NumPy GRU + Dense head loaded straight from the .npz files, or None when
+    the trained weights are missing (the Keras model is used then).
+    """
+    global _numpy_head
+    if _numpy_head is None:
+        if weights_exist(GRU_WEIGHTS_PATH) and weights_exist(DENSE_WEIGHTS_PATH):
+            _numpy_head = NumpyGRUHead.from_npz(GRU_WEIGHTS_PATH, DENSE_WEIGHTS_PATH)
+            log.info("✅ Using NumPy GRU head")
+    return _numpy_head
+
+
+def classify_features(features_batch):
+    """
+    Run the GRU classifier over a batch of frame-feature sequences.
+    
+    Args:
+        features_batch: numpy array of shape (batch, num_frames, 2048)
+    
+    Returns:
+        scores: numpy array of shape (batch,) with the raw sigmoid outputs
+    """
+    features_batch = np.asarray(features_batch, dtype=np.float32)
+    with span("gru"):
+        return get_engine().classify(features_batch)
+
+
+def label_from_score(raw_score, threshold=DEFAULT_THRESHOLD):
+    """
+    Map a raw sigmoid score to a (label, confidence) pair.
+    
+    Inverted logic: High score = REAL, Low score = FAKE
+    This assumes the model was trained with 1=REAL, 0=FAKE
+    """
+    confidence = float(raw_score)
+    label = "REAL" if confidence >= threshold else "FAKE"
+    conf_adj = confidence if confidence >= threshold else 1 - confidence
+    return label, round(conf_adj, 2)
+
+
 # ============================================================
 #  Prediction function
 # ============================================================
-def predict_video(video_path, threshold=0.55):
+def predict_video(video_path, threshold=DEFAULT_THRESHOLD, info=None):
     """
     Predict if video is FAKE or REAL.
     
     Threshold of 0.55 matches Colab performance.
-    Sigmoid output >= 0.55 = FAKE, < 0.55 = REAL
+    Sigmoid output >= 0.55 = REAL, < 0.55 = FAKE
     
     This version bypasses TimeDistributed by:
     1. Extracting frames in Python (not TF)
-    2. Processing each frame through Xception in Python loop
+    2. Processing the frames through Xception in batched forward passes
     3. Feeding extracted features to GRU model
+
+    `info` is the probed header (probe.probe_file), if the caller has it.
     """
-    print(f"[INFO] Processing video: {os.path.basename(video_path)}")
+    log.debug(f"Processing video: {os.path.basename(video_path)}")
+    if ADAPTIVE_SAMPLING:
+        return predict_video_adaptive(video_path, threshold, info)
     
     # Step 1: Extract and preprocess frames
-    frames = preprocess_video(video_path)
-    print(f"  ✓ Extracted {len(frames)} frames")
+    frames = preprocess_video(video_path, info=info)
+    log.debug(f"✓ Extracted {len(frames)} frames")
     
     # Step 2: Extract features from each frame using Xception
-    print("  🔄 Extracting frame features...")
     features = extract_frame_features(frames)
-    print(f"  ✓ Features extracted, shape: {features.shape}")
+    log.debug(f"✓ Features extracted, shape: {features.shape}")
     
     # Step 3: Feed features to GRU classifier
-    print("  🔄 Running GRU classifier...")
-    gru_model = get_gru_model()
     features_batch = np.expand_dims(features, axis=0)  # Add batch dim: (1, 10, 2048)
-    preds = gru_model.predict(features_batch, verbose=0)
+    raw_score = float(classify_features(features_batch)[0])
+    log.debug(f"📊 Raw model output (sigmoid): {raw_score:.4f}")
     
-    raw_score = float(preds[0][0])
-    print(f"  📊 Raw model output (sigmoid): {raw_score:.4f}")
-    
-    # Inverted logic: High score = REAL, Low score = FAKE
-    # This assumes the model was trained with 1=REAL, 0=FAKE
-    confidence = raw_score
-    label = "REAL" if confidence >= threshold else "FAKE"
-    conf_adj = confidence if confidence >= threshold else 1 - confidence
+    label, conf_adj = label_from_score(raw_score, threshold)
 
-    print(f"[INFO] {os.path.basename(video_path)} → {label} ({conf_adj:.2f}) [threshold={threshold}]")
-    return label, round(conf_adj, 2)
+    log.debug(f"{os.path.basename(video_path)} → {label} ({conf_adj:.2f}) [threshold={threshold}]")
+    return label, conf_adj
+
+
+def predict_video_adaptive(video_path, threshold=DEFAULT_THRESHOLD, info=None):
+    """predict_video with adaptive sampling: stop at a coarse subset of frames for clear-cut clips."""
+    # Every round decodes the same file; read its header once
+    if info is None:
+        info = video_info(video_path)
+
+    def extract(slots, offset):
+        return extract_frame_features(preprocess_video(video_path, slots=slots, offset=offset, info=info))
+
+    def classify(sequence):
+        return float(classify_features(np.expand_dims(sequence, axis=0))[0])
+
+    raw_score = run_adaptive(adaptive_score(threshold), extract, classify)
+    label, conf_adj = label_from_score(raw_score, threshold)
+    log.debug(f"{os.path.basename(video_path)} → {label} ({conf_adj:.2f}) [adaptive, threshold={threshold}]")
+    return label, conf_adj
+
+
+def predict_video_windowed(video_path, threshold=DEFAULT_THRESHOLD):
+    """
+    Score a long video in 10-frame windows (see windowed.py).
+
+    Returns:
+        dict with the video `label`/`confidence` and a per-window `timeline`
+    """
+    result = score_windowed(video_path, threshold, extract_frame_features, classify_features, label_from_score)
+    log.debug(f"{os.path.basename(video_path)} → {result['label']} ({result['confidence']:.2f}) "
+              f"[{result['windows']} windows]")
+    return result
+
+
+# ============================================================
+#  Startup warmup
+# ============================================================
+def warmup(num_frames=10):
+    """
+    Load both models and push a dummy batch through them, so the first real
+    request doesn't pay for weight loading, graph tracing and allocator warmup.
+    """
+    engine = get_engine()
+    engine.load()
+    dummy_frames = np.zeros((num_frames, 299, 299, 3), dtype=np.float32)
+    # Bypass the feature cache: the dummy batch shouldn't become a cache entry
+    features = engine.run_cnn(dummy_frames, FEATURE_BATCH_SIZE)
+    classify_features(np.expand_dims(features, axis=0))
+    log.info(f"✅ Models loaded and warmed up ({engine.name} engine)")
 
 
 # For backward compatibility - keep the same function name
@@ -240,7 +392,7 @@ def get_model():
     Compatibility function. 
     The new approach doesn't use a single model - it uses separate components.
     """
-    print("⚠️ This version uses separate CNN and GRU models, not a single model")
+    log.warning("⚠️ This version uses separate CNN and GRU models, not a single model")
     get_base_cnn()
     get_gru_model()
     return None
@@ -0,0 +1,298 @@
+"""
+Staged decode -> normalize -> CNN -> GRU pipeline.
+
+Without it, one video is decoded completely before any of its frames reach
+Xception. Here each stage runs on its own and frames flow on as soon as
+they exist:
+
+    decode processes   sample + resize each frame to 299x299 uint8
+                       (resizing before the queue cuts IPC ~20x vs. raw frames)
+        | bounded frame queue (PIPELINE_QUEUE_FRAMES)
+    feeder thread      normalize to float32, hand each frame to the CNN stage
+        | at most PIPELINE_MAX_FRAMES frames waiting on the CNN
+    CNN BatchStage     frames from every video in flight share batches
+    GRU BatchStage     once all of a video's frames have features
+
+Backpressure runs back up the chain: a busy CNN holds the feeder, the
+feeder stops draining the frame queue, and decode workers block on put().
+Memory is bounded by the two limits above, whatever the number of videos.
+
+Decode workers are spawned (not forked) and never import TensorFlow.
+"""
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from functools import partial
+
+import cv2
+import numpy as np
+
+from face_crop import FACE_CROP, face_tracker
+from logger import get_logger
+from preprocessing import FRAME_SIZE, normalize_frames, sample_grid, to_model_pixels
+from probe import probe_file
+from sampling import iter_sampled_frames
+
+log = get_logger("pipeline")
+
+DECODE_PIPELINE = os.getenv("DECODE_PIPELINE", "0") == "1"
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", str(os.cpu_count() or 1)))
+# Decoded frames waiting for the feeder (~270 KB each)
+PIPELINE_QUEUE_FRAMES = int(os.getenv("PIPELINE_QUEUE_FRAMES", "32"))
+# Normalized frames handed to the CNN stage but not yet extracted (~1 MB each)
+PIPELINE_MAX_FRAMES = int(os.getenv("PIPELINE_MAX_FRAMES", "64"))
+
+_WORKER_CHECK_SEC = 0.5
+
+
+# ============================================================
+#  Decode workers (separate processes)
+# ============================================================
+def _decode_video(video_id, path, num_frames, out, info=None):
+    if info is None:
+        info = probe_file(path)
+    cap = cv2.VideoCapture(path)
+    try:
+        frame_count = info["frame_count"] if info else int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count <= 0:
+            raise ValueError(f"Could not read frames from {path}")
+        indices = sample_grid(frame_count, num_frames)
+        # Short clips repeat indices; each repeat fills its own slot, as in preprocess_video
+        repeats = Counter(indices.tolist())
+        tracker = face_tracker() if FACE_CROP else None
+        slot = 0
+        for index, frame in iter_sampled_frames(cap, indices, frame_count=frame_count, info=info):
+            if tracker is not None:
+                frame = tracker.crop(frame)
+            pixels = to_model_pixels(frame)
+            for _ in range(repeats[index]):
+                out.put(("frame", video_id, slot, pixels))
+                slot += 1
+        return slot
+    finally:
+        cap.release()
+
+
+def _decode_worker(worker_id, tasks, out):
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        video_id, path, num_frames, info = task
+        out.put(("start", video_id, worker_id))
+        try:
+            count = _decode_video(video_id, path, num_frames, out, info)
+            out.put(("done", video_id, count))
+        except Exception as e:
+            out.put(("error", video_id, str(e)))
+
+
+class _Video:
+    def __init__(self, video_id, path, num_frames):
+        self.id = video_id
+        self.path = path
+        self.num_frames = num_frames
+        self.features = None
+        self.decoded = None   # frame count, once the worker has finished
+        self.returned = 0     # slots with features
+        self.classifying = False
+        self.future = Future()
+
+
+# ============================================================
+#  Pipeline
+# ============================================================
+class DecodePipeline:
+    """
+    Scores videos through decode worker processes feeding shared CNN/GRU
+    BatchStages (see batching.py). `submit()` returns a Future of the raw
+    sigmoid score.
+    """
+
+    def __init__(self, cnn_stage, gru_stage, workers=PIPELINE_WORKERS,
+                 queue_frames=PIPELINE_QUEUE_FRAMES, max_frames=PIPELINE_MAX_FRAMES):
+        self.cnn = cnn_stage
+        self.gru = gru_stage
+        self.workers = max(1, workers)
+        self.queue_frames = queue_frames
+        self.max_frames = max(1, max_frames)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._tasks = None
+        self._frames = None
+        self._processes = {}
+        self._current = {}    # worker id -> video id being decoded
+        self._videos = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._cnn_slots = threading.Semaphore(self.max_frames)
+        self._feeder = None
+        self._running = False
+        self.videos_done = 0
+        self.videos_failed = 0
+        self.frames_fed = 0
+
+    def start(self):
+        if self._running:
+            return
+        self._tasks = self._ctx.Queue()
+        self._frames = self._ctx.Queue(maxsize=self.queue_frames)
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+        self._running = True
+        self._feeder = threading.Thread(target=self._feed, name="pipeline-feeder", daemon=True)
+        self._feeder.start()
+        log.info(f"✅ Decode pipeline started ({self.workers} workers)")
+
+    def _spawn(self, worker_id):
+        process = self._ctx.Process(target=_decode_worker, args=(worker_id, self._tasks, self._frames),
+                                    name=f"pipeline-decode-{worker_id}", daemon=True)
+        process.start()
+        self._processes[worker_id] = process
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        for _ in self._processes:
+            self._tasks.put(None)
+        self._feeder.join()
+        for process in self._processes.values():
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes.clear()
+        with self._lock:
+            videos, self._videos = list(self._videos.values()), {}
+        for video in videos:
+            if not video.future.done():
+                video.future.set_exception(RuntimeError("Decode pipeline stopped"))
+
+    def submit(self, path, num_frames=10, info=None):
+        """Future for the video's raw score. `info`: its probed header, if the caller has it."""
+        if not self._running:
+            raise RuntimeError("Decode pipeline is not running")
+        video_id = next(self._ids)
+        video = _Video(video_id, path, num_frames)
+        with self._lock:
+            self._videos[video_id] = video
+        self._tasks.put((video_id, path, num_frames, info))
+        return video.future
+
+    @property
+    def in_flight(self):
+        return len(self._videos)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "videos_in_flight": self.in_flight,
+            "videos_done": self.videos_done,
+            "videos_failed": self.videos_failed,
+            "frames_fed": self.frames_fed,
+        }
+
+    # ------------------------------------------------------------
+    #  Feeder thread
+    # ------------------------------------------------------------
+    def _feed(self):
+        next_check = time.monotonic() + _WORKER_CHECK_SEC
+        while self._running:
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + _WORKER_CHECK_SEC
+            try:
+                message = self._frames.get(timeout=_WORKER_CHECK_SEC)
+            except queue.Empty:
+                continue
+            kind, video_id, value = message[:3]
+            with self._lock:
+                video = self._videos.get(video_id)
+            if kind == "start":
+                self._current[value] = video_id
+            elif video is None:
+                continue  # already failed
+            elif kind == "frame":
+                self._feed_frames(video_id, video, [value], message[3][None])
+            elif kind == "done":
+                self._decoded(video_id, video, value)
+            elif kind == "error":
+                self._fail(video_id, ValueError(value))
+
+    def _feed_frames(self, video_id, video, slots, pixels):
+        frames = np.empty((len(slots), FRAME_SIZE, FRAME_SIZE, 3), dtype=np.float32)
+        normalize_frames(pixels, frames)
+        for _ in slots:
+            self._cnn_slots.acquire()
+        self.frames_fed += len(slots)
+        self.cnn.submit(frames).add_done_callback(partial(self._on_features, video_id, video, slots))
+
+    def _decoded(self, video_id, video, count):
+        if count == 0:
+            self._fail(video_id, ValueError(f"Could not decode any frames from {video.path}"))
+            return
+        if count < video.num_frames:
+            # Missing frames are zero-padded, as in preprocess_video
+            slots = list(range(count, video.num_frames))
+            self._feed_frames(video_id, video, slots, np.zeros((len(slots), FRAME_SIZE, FRAME_SIZE, 3), np.uint8))
+        with self._lock:
+            video.decoded = count
+        self._maybe_classify(video)
+
+    def _on_features(self, video_id, video, slots, future):
+        # Runs on the CNN stage thread
+        for _ in slots:
+            self._cnn_slots.release()
+        try:
+            features = future.result()
+        except Exception as e:
+            self._fail(video_id, e)
+            return
+        with self._lock:
+            if video.features is None:
+                video.features = np.zeros((video.num_frames, features.shape[-1]), dtype=np.float32)
+            video.features[slots] = features
+            video.returned += len(slots)
+        self._maybe_classify(video)
+
+    def _maybe_classify(self, video):
+        with self._lock:
+            if video.decoded is None or video.returned < video.num_frames or video.classifying:
+                return
+            video.classifying = True
+        self.gru.submit(video.features[None]).add_done_callback(partial(self._on_score, video))
+
+    def _on_score(self, video, future):
+        with self._lock:
+            self._videos.pop(video.id, None)
+        try:
+            score = float(future.result()[0])
+        except Exception as e:
+            self.videos_failed += 1
+            if not video.future.done():
+                video.future.set_exception(e)
+            return
+        self.videos_done += 1
+        if not video.future.done():
+            video.future.set_result(score)
+
+    def _fail(self, video_id, error):
+        with self._lock:
+            video = self._videos.pop(video_id, None)
+        if video is not None and not video.future.done():
+            self.videos_failed += 1
+            video.future.set_exception(error)
+
+    def _check_workers(self):
+        """Respawn dead decode workers and fail the video each was decoding."""
+        for worker_id, process in list(self._processes.items()):
+            if self._running and not process.is_alive():
+                video_id = self._current.pop(worker_id, None)
+                if video_id is not None:
+                    self._fail(video_id, RuntimeError(f"Decode worker exited with code {process.exitcode}"))
+                log.warning(f"⚠️ Decode worker {worker_id} exited ({process.exitcode}); restarting")
+                self._spawn(worker_id)
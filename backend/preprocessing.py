@@ -0,0 +1,213 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from cpu import configure_opencv
+from face_crop import FACE_CROP, crop_faces
+from metrics import span
+from probe import probe_file
+from sampling import FRAME_SAMPLER, sample_frames
+
+FRAME_SIZE = 299
+
+configure_opencv()
+
+# Pixel scaling applied before Xception:
+# - "legacy":   x / 255 -> [0, 1]. What the Colab model was trained with, so it
+#               is the default and must stay so for the shipped .npz weights.
+# - "xception": x / 127.5 - 1 -> [-1, 1], i.e. keras.applications.xception
+#               .preprocess_input. Matches the ImageNet weights; only use it
+#               with weights trained (or fine-tuned) on that range.
+XCEPTION_PREPROCESS = os.getenv("XCEPTION_PREPROCESS", "legacy")
+PREPROCESS_MODES = ("legacy", "xception")
+
+# Idle float32 frame buffers kept per process for reuse
+FRAME_BUFFER_POOL_SIZE = int(os.getenv("FRAME_BUFFER_POOL_SIZE", "8"))
+
+
+def normalize_frames(pixels, out, mode=None):
+    """
+    Scale a uint8 (n, 299, 299, 3) block into the float32 `out` in one pass
+    (no float64 intermediates).
+    """
+    mode = mode or XCEPTION_PREPROCESS
+    if mode == "legacy":
+        np.divide(pixels, np.float32(255.0), out=out, dtype=np.float32)
+    elif mode == "xception":
+        np.divide(pixels, np.float32(127.5), out=out, dtype=np.float32)
+        out -= np.float32(1.0)
+    else:
+        raise ValueError(f"Unknown XCEPTION_PREPROCESS mode: {mode!r} (expected one of {PREPROCESS_MODES})")
+    return out
+
+
+# ============================================================
+#  Reusable frame buffers
+# ============================================================
+class FrameBufferPool:
+    """
+    Hands out preallocated float32 (num_frames, 299, 299, 3) buffers.
+
+    A buffer stays checked out until `release()` (i.e. until the CNN has
+    consumed it), so a worker reuses the same ~10 MB block across requests
+    instead of allocating and copying fresh arrays every time.
+    """
+
+    def __init__(self, max_free=FRAME_BUFFER_POOL_SIZE):
+        self.max_free = max_free
+        self._free = {}
+        self._lock = threading.Lock()
+        self._staging = threading.local()
+
+    def acquire(self, num_frames):
+        with self._lock:
+            free = self._free.get(num_frames)
+            if free:
+                return free.pop()
+        return np.empty((num_frames, FRAME_SIZE, FRAME_SIZE, 3), dtype=np.float32)
+
+    def release(self, buffer):
+        if buffer is None:
+            return
+        with self._lock:
+            free = self._free.setdefault(len(buffer), [])
+            if sum(len(f) for f in self._free.values()) < self.max_free:
+                free.append(buffer)
+
+    def staging(self, num_frames):
+        """Per-thread uint8 scratch block for resized frames (never leaves the thread)."""
+        block = getattr(self._staging, "block", None)
+        if block is None or len(block) < num_frames:
+            block = np.empty((num_frames, FRAME_SIZE, FRAME_SIZE, 3), dtype=np.uint8)
+            self._staging.block = block
+        return block[:num_frames]
+
+
+frame_buffers = FrameBufferPool()
+
+
+def to_model_pixels(frame, out=None):
+    """Resize one decoded BGR frame to a 299x299 uint8 RGB frame (into `out` if given)."""
+    # Resize first: the BGR->RGB swap is per-pixel, so doing it on the
+    # 299x299 frame gives identical output for much less work.
+    small = cv2.resize(frame, (FRAME_SIZE, FRAME_SIZE))
+    return cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=out)
+
+
+def frames_to_buffer(bgr_frames, num_frames, out=None, mode=None):
+    """
+    Resize + convert decoded BGR frames into a float32 (num_frames, 299, 299, 3)
+    RGB buffer, zero-padding missing frames.
+
+    Args:
+        bgr_frames: iterable of decoded frames (any size)
+        num_frames: number of output slots
+        out: optional preallocated buffer (e.g. from frame_buffers.acquire)
+        mode: pixel scaling, see XCEPTION_PREPROCESS
+
+    Returns:
+        (buffer, number of real frames written)
+    """
+    pixels = frame_buffers.staging(num_frames)
+    count = 0
+    for frame in bgr_frames:
+        if count == num_frames:
+            break
+        to_model_pixels(frame, out=pixels[count])
+        count += 1
+
+    if out is None:
+        out = np.empty((num_frames, FRAME_SIZE, FRAME_SIZE, 3), dtype=np.float32)
+    normalize_frames(pixels[:count], out[:count], mode)
+    # Pad with zeros if needed
+    out[count:] = 0.0
+    return out, count
+
+
+# ============================================================
+#  Preprocess video
+# ============================================================
+def video_info(video_path):
+    """
+    probe_file() metadata for `video_path`, or None. An unreadable file is
+    None too: opening it with OpenCV then fails with the usual ValueError.
+    """
+    try:
+        return probe_file(video_path)
+    except OSError:
+        return None
+
+
+def preprocess_video(video_path, num_frames=10, out=None, slots=None, offset=0.0, info=None):
+    """
+    Extract and preprocess frames from video. Pass `info` when the header
+    was already probed (see video_info); callers that decode the same file
+    several times, like adaptive sampling, probe it once.
+    """
+    # Header metadata first: exact frame count and GOP, where the container has them
+    if info is None:
+        info = video_info(video_path)
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return preprocess_capture(cap, num_frames, source=video_path, out=out, slots=slots, offset=offset,
+                                  info=info)
+    finally:
+        cap.release()
+
+
+def sample_grid(frame_count, num_frames=10, offset=0.0):
+    """
+    `num_frames` evenly spaced frame indices. `offset` shifts the grid by a
+    fraction of the spacing (0.5 = midway between the default samples).
+    """
+    grid = np.linspace(0, frame_count - 1, num_frames)
+    if offset:
+        grid = np.minimum(grid + offset * (frame_count - 1) / max(1, num_frames - 1), frame_count - 1)
+    return grid.astype(int)
+
+
+def preprocess_capture(cap, num_frames=10, strategy=None, source="video", out=None, slots=None, offset=0.0,
+                       info=None):
+    """
+    Sample and preprocess frames from an already opened cv2.VideoCapture.
+    Non-seekable sources (pipes) must pass strategy="sequential".
+    
+    Frames are written into a float32 buffer (`out` if given, e.g. from
+    frame_buffers) and scaled per XCEPTION_PREPROCESS. With `slots`, only
+    those positions of the `num_frames` grid are decoded (used by adaptive
+    sampling). `info` is the probe.probe_file() metadata, when there is any;
+    its frame count replaces OpenCV's estimate.
+    """
+    frame_count = info["frame_count"] if info else int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    if frame_count <= 0:
+        raise ValueError(f"Could not read frames from {source}")
+    
+    frame_indices = sample_grid(frame_count, num_frames, offset)
+    if slots is not None:
+        frame_indices = frame_indices[list(slots)]
+        num_frames = len(frame_indices)
+        if strategy is None and FRAME_SAMPLER == "auto" and info and info["vfr"] is False:
+            # A few spread-out slots (adaptive sampling's coarse round) include
+            # the last grid position; a sequential pass would decode the whole
+            # clip to reach it, seeking skips the gaps between slots. Only for
+            # containers whose header says the frame rate is constant (OpenCV's
+            # header read can't tell: vfr is None)
+            strategy = "seek"
+
+    # Decode only the sampled frames (sequential grab() pass or keyframe-aligned seeks)
+    with span("decode"):
+        decoded = sample_frames(cap, frame_indices, strategy=strategy, frame_count=frame_count, info=info)
+    if FACE_CROP:
+        # Square crops around the tracked face (whole frames where none is found)
+        with span("face_crop"):
+            decoded = crop_faces(decoded)
+    with span("resize"):
+        frames, count = frames_to_buffer(decoded, num_frames, out=out)
+
+    if count == 0:
+        raise ValueError(f"Could not decode any frames from {source}")
+
+    return frames  # shape: (num_frames, 299, 299, 3), float32
@@ -0,0 +1,318 @@
+"""
+Container header probe.
+
+Reads duration, frame count, frame rate, resolution, codec and keyframe
+spacing from the container's index without decoding anything:
+
+- MP4/MOV (ISO BMFF): the moov box. The video track's stts table gives the
+  exact frame count and shows whether the frame rate is variable; stss lists
+  the keyframes.
+- AVI (RIFF): the hdrl list (avih, and strh/strf of the video stream).
+
+Uploads are validated against this before any decode or model work, and
+frame sampling uses the probed frame count rather than OpenCV's
+CAP_PROP_FRAME_COUNT, which is estimated from duration x fps for many
+variable-frame-rate files. Other containers (Matroska/WebM, MPEG-TS,
+fragmented MP4) fall back to the OpenCV header read in probe_video().
+"""
+import io
+import os
+import struct
+
+import cv2
+
+# Largest frame accepted, in pixels (default: 8K UHD)
+MAX_VIDEO_PIXELS = int(os.getenv("MAX_VIDEO_PIXELS", str(7680 * 4320)))
+# Leading bytes of a streamed upload inspected before it is accepted
+PROBE_HEAD_BYTES = int(os.getenv("PROBE_HEAD_BYTES", str(256 * 1024)))
+
+# moov boxes beyond this are treated as corrupt (a 1h H.264 file has a few MB)
+_MAX_MOOV_BYTES = 64 * 2**20
+_MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+
+class InvalidVideo(ValueError):
+    pass
+
+
+class _Incomplete(Exception):
+    """The header runs past the bytes we have (probe_bytes on a partial upload)."""
+
+
+def _info(container, codec, width, height, frame_count, duration, vfr=False, gop=None):
+    fps = frame_count / duration if duration > 0 else 0.0
+    return {"container": container, "codec": codec, "width": width, "height": height,
+            "frame_count": frame_count, "fps": fps, "duration": duration, "vfr": vfr, "gop": gop}
+
+
+def _fourcc(raw):
+    return raw.decode("latin-1")
+
+
+# ============================================================
+#  MP4 / MOV
+# ============================================================
+def _iter_boxes(data, start=0, end=None):
+    """(type, payload start, payload end) for each box in data[start:end]."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                raise InvalidVideo("Truncated MP4 box header")
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise InvalidVideo(f"Malformed MP4 box {kind!r}")
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _find_moov(f, size, complete):
+    """Walk the top-level boxes by seeking (moov may come after mdat) and return the moov payload."""
+    pos = 0
+    while pos + 8 <= size:
+        f.seek(pos)
+        head = f.read(16)
+        box_size, kind = struct.unpack_from(">I4s", head)
+        header = 8
+        if box_size == 1:
+            box_size = struct.unpack_from(">Q", head, 8)[0]
+            header = 16
+        elif box_size == 0:
+            box_size = size - pos
+        if box_size < header:
+            raise InvalidVideo(f"Malformed MP4 box {kind!r}")
+        if kind == b"moov":
+            if box_size > _MAX_MOOV_BYTES:
+                raise InvalidVideo("MP4 moov box is implausibly large")
+            if pos + box_size > size:
+                if not complete:
+                    raise _Incomplete()
+                raise InvalidVideo("Truncated MP4 moov box")
+            f.seek(pos + header)
+            return f.read(box_size - header)
+        if kind == b"moof" or pos + box_size > size:
+            # Fragmented (index spread over the file) or the data we have ends here
+            break
+        pos += box_size
+    if not complete:
+        raise _Incomplete()
+    return None
+
+
+def _full_box_times(data, start):
+    """(timescale, duration) from an mvhd/mdhd payload."""
+    if data[start] == 1:
+        return struct.unpack_from(">IQ", data, start + 20)
+    return struct.unpack_from(">II", data, start + 12)
+
+
+def _children(data, start, end):
+    return {kind: (s, e) for kind, s, e in _iter_boxes(data, start, end)}
+
+
+def _video_track(moov):
+    for kind, start, end in _iter_boxes(moov):
+        if kind != b"trak":
+            continue
+        mdia = _children(moov, start, end).get(b"mdia")
+        if mdia is None:
+            continue
+        boxes = _children(moov, *mdia)
+        hdlr = boxes.get(b"hdlr")
+        if hdlr is not None and moov[hdlr[0] + 8:hdlr[0] + 12] == b"vide":
+            return boxes
+    return None
+
+
+def _parse_moov(moov):
+    track = _video_track(moov)
+    if track is None or b"mdhd" not in track or b"minf" not in track:
+        raise InvalidVideo("No video track in MP4")
+    timescale, duration = _full_box_times(moov, track[b"mdhd"][0])
+    stbl = _children(moov, *track[b"minf"]).get(b"stbl")
+    if stbl is None:
+        raise InvalidVideo("MP4 video track has no sample table")
+    tables = _children(moov, *stbl)
+
+    codec, width, height = "", 0, 0
+    if b"stsd" in tables:
+        start, end = tables[b"stsd"]
+        # First sample entry: size, format, then the VisualSampleEntry fields
+        if end - start >= 44:
+            codec = _fourcc(moov[start + 12:start + 16])
+            width, height = struct.unpack_from(">HH", moov, start + 40)
+
+    frame_count, deltas = 0, []
+    if b"stts" in tables:
+        start, _ = tables[b"stts"]
+        entries = struct.unpack_from(">I", moov, start + 4)[0]
+        pairs = struct.unpack_from(f">{2 * entries}I", moov, start + 8)
+        counts, deltas = pairs[0::2], list(pairs[1::2])
+        frame_count = sum(counts)
+        # Muxers often give the final frame its own duration; that alone isn't VFR
+        if len(deltas) > 1 and counts[-1] == 1:
+            deltas.pop()
+    if frame_count == 0:
+        # Fragmented MP4: samples live in moof boxes, not here
+        return None
+
+    gop = 1
+    if b"stss" in tables:
+        start, _ = tables[b"stss"]
+        keyframes = struct.unpack_from(">I", moov, start + 4)[0]
+        gop = max(1, round(frame_count / max(1, keyframes)))
+
+    if not timescale:
+        raise InvalidVideo("MP4 video track has no timescale")
+    return _info("mp4", codec, width, height, frame_count, duration / timescale,
+                 vfr=len(set(deltas)) > 1, gop=gop)
+
+
+def _probe_mp4(f, size, complete):
+    moov = _find_moov(f, size, complete)
+    if moov is None:
+        if size > 0 and _has_moof(f, size):
+            return None
+        raise InvalidVideo("MP4 has no moov box")
+    return _parse_moov(moov)
+
+
+def _has_moof(f, size):
+    f.seek(0)
+    return b"moof" in f.read(min(size, 1 << 20))
+
+
+# ============================================================
+#  AVI
+# ============================================================
+def _iter_chunks(data, start, end):
+    pos = start
+    while pos + 8 <= end:
+        kind, size = struct.unpack_from("<4sI", data, pos)
+        if pos + 8 + size > end:
+            raise _Incomplete()
+        yield kind, pos + 8, pos + 8 + size
+        pos += 8 + size + (size & 1)
+
+
+def _probe_avi(f, size, complete):
+    f.seek(12)
+    head = f.read(12)
+    if len(head) < 12 or head[0:4] != b"LIST" or head[8:12] != b"hdrl":
+        raise InvalidVideo("AVI has no header list")
+    hdrl_size = struct.unpack_from("<I", head, 4)[0]
+    hdrl = f.read(hdrl_size - 4)
+    try:
+        if len(hdrl) < hdrl_size - 4:
+            raise _Incomplete()
+        total_frames = 0
+        for kind, start, end in _iter_chunks(hdrl, 0, len(hdrl)):
+            if kind == b"avih":
+                total_frames = struct.unpack_from("<I", hdrl, start + 16)[0]
+            elif kind == b"LIST" and hdrl[start:start + 4] == b"odml":
+                for sub, s, _ in _iter_chunks(hdrl, start + 4, end):
+                    if sub == b"dmlh":
+                        total_frames = max(total_frames, struct.unpack_from("<I", hdrl, s)[0])
+            elif kind == b"LIST" and hdrl[start:start + 4] == b"strl":
+                stream = {sub: (s, e) for sub, s, e in _iter_chunks(hdrl, start + 4, end)}
+                strh = stream.get(b"strh")
+                if strh is None or hdrl[strh[0]:strh[0] + 4] != b"vids":
+                    continue
+                scale, rate, _, length = struct.unpack_from("<IIII", hdrl, strh[0] + 20)
+                codec, width, height = _fourcc(hdrl[strh[0] + 4:strh[0] + 8]), 0, 0
+                strf = stream.get(b"strf")
+                if strf is not None and strf[1] - strf[0] >= 20:
+                    width, height, _, _, compression = struct.unpack_from("<iiHH4s", hdrl, strf[0] + 4)
+                    codec = _fourcc(compression)
+                    height = abs(height)
+                if not scale or not rate:
+                    raise InvalidVideo("AVI video stream has no frame rate")
+                fps = rate / scale
+                # dwLength covers the whole stream, also past the first RIFF of an OpenDML file
+                frame_count = max(length, total_frames)
+                return _info("avi", codec, width, height, frame_count, frame_count / fps)
+    except _Incomplete:
+        if not complete:
+            raise
+        raise InvalidVideo("Truncated AVI header")
+    raise InvalidVideo("No video stream in AVI")
+
+
+# ============================================================
+#  Public API
+# ============================================================
+def _probe(f, size, complete):
+    f.seek(0)
+    head = f.read(12)
+    if len(head) < 12:
+        if not complete:
+            raise _Incomplete()
+        raise InvalidVideo("File is too short to be a video")
+    if head[0:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return _probe_avi(f, size, complete)
+    if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+        return _probe_mp4(f, size, complete)
+    return None
+
+
+def probe_file(path):
+    """
+    Header metadata of the video at `path` as a dict (container, codec,
+    width, height, frame_count, fps, duration, vfr, gop), or None when the
+    container isn't one parsed here. Raises InvalidVideo when it is, but the
+    header is corrupt or has no video track.
+    """
+    with open(path, "rb") as f:
+        try:
+            return _probe(f, os.fstat(f.fileno()).st_size, complete=True)
+        except struct.error:
+            raise InvalidVideo("Corrupt video header")
+
+
+def probe_bytes(data):
+    """Like probe_file for the first bytes of an upload; None until the header is all there."""
+    try:
+        return _probe(io.BytesIO(data), len(data), complete=False)
+    except (_Incomplete, struct.error):
+        return None
+
+
+def _probe_capture(path):
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise InvalidVideo("Unrecognized or corrupt video file")
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        code = int(cap.get(cv2.CAP_PROP_FOURCC))
+        codec = "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+    duration = frame_count / fps if frame_count > 0 and fps and 0 < fps <= 1000 else 0.0
+    # OpenCV doesn't say whether the frame rate varies
+    return _info("other", codec, width, height, max(0, frame_count), duration, vfr=None)
+
+
+def probe_video(path):
+    """probe_file, falling back to OpenCV's header read for other containers."""
+    return probe_file(path) or _probe_capture(path)
+
+
+def validate_video(info):
+    """Raise InvalidVideo for metadata no decode would get anything useful out of."""
+    if info["frame_count"] <= 0:
+        raise InvalidVideo("Video has no frames")
+    if info["width"] <= 0 or info["height"] <= 0:
+        raise InvalidVideo("Video has no frame size")
+    if info["width"] * info["height"] > MAX_VIDEO_PIXELS:
+        raise InvalidVideo(f"Video resolution {info['width']}x{info['height']} exceeds "
+                           f"{MAX_VIDEO_PIXELS} pixels per frame")
+    return info
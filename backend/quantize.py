@@ -0,0 +1,198 @@
+"""
+Build reduced-precision Xception models and check them against float32.
+
+Usage (from backend/):
+    # float16 weights (no calibration needed)
+    python quantize.py convert --mode fp16
+
+    # full-integer int8, calibrated on frames from sample videos
+    python quantize.py convert --mode int8 --calibration calibration.txt [--calibration-frames 200]
+
+    # accuracy parity vs. the float32 model on a held-out set of videos
+    python quantize.py parity --mode int8 --manifest heldout.txt --report quant_reports/int8.json
+
+Manifests use the batch_scoring.py format (one video path per line). Keep
+the held-out videos separate from the calibration ones. Serve a model with
+the fp16 or int8 engine from engines.py (INFERENCE_ENGINE=fp16 or int8).
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from batch_scoring import read_manifest
+from preprocessing import preprocess_video, XCEPTION_PREPROCESS
+from tflite_cnn import TFLITE_MODES, TFLiteCNN, tflite_path, write_metadata
+from weights import weights_digest
+
+
+def calibration_frames(paths, max_frames):
+    """Preprocessed frames from `paths` (10 per video), up to `max_frames`."""
+    frames = []
+    for path in paths:
+        try:
+            frames.extend(preprocess_video(path))
+        except ValueError as e:
+            print(f"[WARN] Skipping {path}: {e}")
+        if len(frames) >= max_frames:
+            break
+    if not frames:
+        raise ValueError("No calibration frames could be decoded")
+    return np.stack(frames[:max_frames])
+
+
+# ============================================================
+#  Conversion
+# ============================================================
+def convert(mode, calibration=None, output=None):
+    """
+    Convert the custom-weighted Xception base model to TFLite.
+
+    Args:
+        mode: "fp16" (float16 weights, float compute) or "int8" (full-integer
+            weights and activations, float32 input/output)
+        calibration: (n, 299, 299, 3) frames for int8 activation ranges
+    """
+    import tensorflow as tf
+    from model import get_base_cnn, XCEPTION_WEIGHTS_PATH
+
+    # Weights are frozen into the graph; the batch dimension stays dynamic and
+    # is resized per call by the interpreter
+    converter = tf.lite.TFLiteConverter.from_keras_model(get_base_cnn())
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == "fp16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == "int8":
+        if calibration is None or not len(calibration):
+            raise ValueError("int8 needs calibration frames (--calibration)")
+
+        def representative_dataset():
+            for frame in calibration:
+                yield [frame[None].astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    else:
+        raise ValueError(f"Unknown mode: {mode!r} (expected one of {TFLITE_MODES})")
+
+    start = time.perf_counter()
+    model_bytes = converter.convert()
+    output = output or tflite_path(mode)
+    with open(output, "wb") as f:
+        f.write(model_bytes)
+    write_metadata(output, {
+        "mode": mode,
+        "weights_sha256": weights_digest(XCEPTION_WEIGHTS_PATH),
+        "preprocess": XCEPTION_PREPROCESS,
+        "calibration_frames": 0 if calibration is None else len(calibration),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    print(f"✅ Wrote {output} ({len(model_bytes) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+    return output
+
+
+# ============================================================
+#  Accuracy parity
+# ============================================================
+def _cosine(a, b):
+    return np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12)
+
+
+def parity(mode, paths, batch_size=16, threshold=None):
+    """
+    Score `paths` with the float32 graph and with the TFLite model for `mode`
+    (same GRU head) and compare features, scores and labels.
+    """
+    from model import (XCEPTION_WEIGHTS_PATH, DEFAULT_THRESHOLD, _run_cnn_float32, classify_features,
+                       label_from_score)
+
+    threshold = DEFAULT_THRESHOLD if threshold is None else threshold
+    quantized = TFLiteCNN.load(mode, XCEPTION_WEIGHTS_PATH, XCEPTION_PREPROCESS)
+    cosines, score_diffs, agree = [], [], []
+    timings = {"float32": 0.0, mode: 0.0}
+    frames_run = 0
+    per_video = []
+    for path in paths:
+        try:
+            frames = preprocess_video(path)
+        except ValueError as e:
+            print(f"[WARN] Skipping {path}: {e}")
+            continue
+
+        start = time.perf_counter()
+        reference = _run_cnn_float32(frames, batch_size)
+        timings["float32"] += time.perf_counter() - start
+        start = time.perf_counter()
+        features = quantized.run(frames, batch_size)
+        timings[mode] += time.perf_counter() - start
+        frames_run += len(frames)
+
+        ref_score, q_score = (float(s) for s in classify_features(np.stack([reference, features])))
+        ref_label, _ = label_from_score(ref_score, threshold)
+        q_label, _ = label_from_score(q_score, threshold)
+        cosines.extend(_cosine(reference, features).tolist())
+        score_diffs.append(abs(ref_score - q_score))
+        agree.append(ref_label == q_label)
+        per_video.append({"path": path, "float32_score": ref_score, f"{mode}_score": q_score,
+                          "label_match": ref_label == q_label})
+
+    if not per_video:
+        raise ValueError("None of the held-out videos could be decoded")
+    score_diffs = np.asarray(score_diffs)
+    return {
+        "mode": mode,
+        "videos": len(per_video),
+        "frames": frames_run,
+        "threshold": threshold,
+        "model_mb": round(os.path.getsize(quantized.path) / 1e6, 2),
+        "feature_cosine_mean": round(float(np.mean(cosines)), 6),
+        "feature_cosine_min": round(float(np.min(cosines)), 6),
+        "score_abs_diff_mean": round(float(score_diffs.mean()), 6),
+        "score_abs_diff_p95": round(float(np.percentile(score_diffs, 95)), 6),
+        "score_abs_diff_max": round(float(score_diffs.max()), 6),
+        "label_agreement": round(float(np.mean(agree)), 4),
+        "ms_per_frame": {k: round(v / frames_run * 1000, 2) for k, v in timings.items()},
+        "per_video": per_video,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_convert = sub.add_parser("convert", help="build saved_models/xception_<mode>.tflite")
+    p_convert.add_argument("--mode", choices=TFLITE_MODES, required=True)
+    p_convert.add_argument("--calibration", help="manifest of calibration videos (required for int8)")
+    p_convert.add_argument("--calibration-frames", type=int, default=200)
+
+    p_parity = sub.add_parser("parity", help="compare against float32 on held-out videos")
+    p_parity.add_argument("--mode", choices=TFLITE_MODES, required=True)
+    p_parity.add_argument("--manifest", required=True, help="held-out videos (not used for calibration)")
+    p_parity.add_argument("--threshold", type=float, default=None)
+    p_parity.add_argument("--report", default=None, help="write the JSON report to this path")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        calibration = None
+        if args.calibration:
+            calibration = calibration_frames(read_manifest(args.calibration), args.calibration_frames)
+            print(f"[INFO] Calibrating on {len(calibration)} frames")
+        convert(args.mode, calibration)
+        return
+
+    report = parity(args.mode, read_manifest(args.manifest), threshold=args.threshold)
+    summary = {k: v for k, v in report.items() if k != "per_video"}
+    print(json.dumps(summary, indent=2))
+    if args.report:
+        directory = os.path.dirname(args.report)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+from model import XCEPTION_WEIGHTS_PATH, GRU_WEIGHTS_PATH, DENSE_WEIGHTS_PATH, DEFAULT_THRESHOLD, cnn_signature
+from adaptive import adaptive_signature
+from face_crop import FACE_CROP
+from preprocessing import XCEPTION_PREPROCESS
+from weights import source_signature
+from windowed import windowed_signature
+from logger import get_logger
+
+log = get_logger("result_cache")
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+# Persist cached results in MongoDB so they survive restarts and are shared by workers
+RESULT_CACHE_MONGO = os.getenv("RESULT_CACHE_MONGO", "0") == "1"
+# How often replaced weight files are looked for (the fingerprint stats every .npy file)
+RESULT_CACHE_REFRESH_SEC = float(os.getenv("RESULT_CACHE_REFRESH_SEC", "30"))
+
+
+def model_fingerprint(threshold=DEFAULT_THRESHOLD):
+    """
+    Identify the model configuration a cached result was produced with.
+    Changes whenever a weight file is replaced, or the threshold, input
+    scaling, face cropping, adaptive sampling, long-video windowing or
+    Xception backend changes.
+    """
+    h = hashlib.sha256(f"threshold={threshold}|preprocess={XCEPTION_PREPROCESS}|face_crop={FACE_CROP}"
+                       f"|cnn={cnn_signature()}|adaptive={adaptive_signature()}"
+                       f"|windowed={windowed_signature()}".encode())
+    for path in (XCEPTION_WEIGHTS_PATH, GRU_WEIGHTS_PATH, DENSE_WEIGHTS_PATH):
+        h.update(f"|{source_signature(path)}".encode())
+    return h.hexdigest()[:16]
+
+
+# ============================================================
+#  Content-hash result cache
+# ============================================================
+class ResultCache:
+    """
+    Maps an upload's SHA-256 to the (label, confidence, details) it was
+    scored as; `details` is the window timeline of a long video, else None.
+
+    An in-process LRU sits in front of an optional MongoDB collection. Entries
+    are tagged with the model fingerprint, so replacing the weights or changing
+    the threshold invalidates everything cached before. The fingerprint is
+    computed once and then refreshed off the event loop by `watch()`, so
+    lookups never touch the weight files.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, collection=None, threshold=DEFAULT_THRESHOLD):
+        self.max_entries = max_entries
+        self.collection = collection
+        self.threshold = threshold
+        self.fingerprint = model_fingerprint(threshold)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def refresh(self):
+        """Recompute the fingerprint on a worker thread; drop every entry if it changed."""
+        loop = asyncio.get_running_loop()
+        current = await loop.run_in_executor(None, model_fingerprint, self.threshold)
+        if current != self.fingerprint:
+            log.info(f"Model fingerprint changed ({self.fingerprint} -> {current}); result cache cleared")
+            self.fingerprint = current
+            self._entries.clear()
+
+    async def watch(self, interval=RESULT_CACHE_REFRESH_SEC):
+        """Refresh every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.warning(f"Could not refresh the model fingerprint: {e}")
+
+    async def get(self, digest):
+        """Return the cached (label, confidence, details) for `digest`, or None."""
+        if digest in self._entries:
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return self._entries[digest]
+
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one({"_id": digest, "model_version": self.fingerprint})
+            except Exception as e:
+                # The persistent tier is best-effort; fall through to a miss
+                log.warning(f"Result cache lookup failed: {e}")
+                doc = None
+            if doc is not None:
+                result = (doc["label"], doc["confidence"], doc.get("details"))
+                self._remember(digest, result)
+                self.hits += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    async def put(self, digest, label, confidence, details=None):
+        self._remember(digest, (label, confidence, details))
+        if self.collection is not None:
+            try:
+                await self.collection.replace_one(
+                    {"_id": digest},
+                    {
+                        "label": label,
+                        "confidence": confidence,
+                        "details": details,
+                        "model_version": self.fingerprint,
+                        "created_at": datetime.utcnow(),
+                    },
+                    upsert=True,
+                )
+            except Exception as e:
+                log.warning(f"Result cache write failed: {e}")
+
+    def _remember(self, digest, result):
+        self._entries[digest] = result
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def purge_stale(self):
+        """Drop persisted entries produced by a different model configuration."""
+        if self.collection is not None:
+            try:
+                await self.collection.delete_many({"model_version": {"$ne": self.fingerprint}})
+            except Exception as e:
+                log.warning(f"Could not purge stale result cache entries: {e}")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "persistent": self.collection is not None,
+            "model_version": self.fingerprint,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,143 @@
+import os
+
+import cv2
+
+# Strategy override: "auto", "sequential" or "seek"
+FRAME_SAMPLER = os.getenv("FRAME_SAMPLER", "auto")
+
+# Assumed keyframe interval in seconds when the container doesn't tell us
+# (typical for H.264 encoders is 2-10s; 2s is the conservative end).
+DEFAULT_KEYFRAME_INTERVAL_SEC = float(os.getenv("KEYFRAME_INTERVAL_SEC", "2.0"))
+
+# Intra-only codecs: every frame is a keyframe, so seeking is always cheap
+INTRA_ONLY_FOURCCS = {"MJPG", "mjpa", "mjpb", "jpeg", "png ", "PNG ", "ap4h", "apch", "apcn", "apcs", "apco"}
+
+
+def _fourcc(cap):
+    code = int(cap.get(cv2.CAP_PROP_FOURCC))
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+
+
+def estimate_gop_size(cap):
+    """
+    Rough keyframe interval (in frames) from container metadata.
+    OpenCV doesn't expose the GOP, so derive it from codec and frame rate.
+    """
+    if _fourcc(cap) in INTRA_ONLY_FOURCCS:
+        return 1
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    if fps <= 0 or fps > 240:
+        fps = 30.0
+    return max(1, int(round(fps * DEFAULT_KEYFRAME_INTERVAL_SEC)))
+
+
+def choose_strategy(frame_count, num_samples, gop_size):
+    """
+    Pick the cheaper strategy by estimated decode cost.
+
+    - sequential: decodes every frame up to the last sample once (~frame_count)
+    - seek: each seek decodes from the previous keyframe, on average half a GOP
+      per sample, but only for samples further apart than one GOP
+    """
+    if num_samples <= 0 or frame_count <= 0:
+        return "sequential"
+    spacing = frame_count / num_samples
+    if spacing <= gop_size:
+        # Samples are closer together than keyframes; seeking would re-decode
+        # the same GOPs over and over.
+        return "sequential"
+    seek_cost = num_samples * (gop_size / 2 + 1)
+    return "seek" if seek_cost < frame_count else "sequential"
+
+
+# ============================================================
+#  Sampling strategies
+# ============================================================
+def _sample_sequential(cap, indices):
+    """
+    Single forward pass: grab() every frame (demux + decode, no color
+    conversion/copy) and retrieve() only the ones we want.
+    """
+    wanted = sorted(set(int(i) for i in indices))
+    pos = 0
+    for target in wanted:
+        while pos < target:
+            if not cap.grab():
+                return
+            pos += 1
+        if not cap.grab():
+            return
+        pos += 1
+        ret, frame = cap.retrieve()
+        if ret:
+            yield target, frame
+
+
+def _sample_seek(cap, indices, gop_size):
+    """
+    Keyframe-aligned seeking: jump (decoder restarts at the previous keyframe)
+    only when the next sample is more than one GOP ahead; otherwise keep
+    decoding forward with grab() so a GOP is never decoded twice.
+    """
+    wanted = sorted(set(int(i) for i in indices))
+    pos = None  # index of the next frame grab() will return
+    for target in wanted:
+        if pos is None or target < pos or target - pos > gop_size:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            pos = target
+        while pos < target:
+            if not cap.grab():
+                return
+            pos += 1
+        if not cap.grab():
+            # A bad seek shouldn't end sampling; try the next target afresh
+            pos = None
+            continue
+        pos += 1
+        ret, frame = cap.retrieve()
+        if ret:
+            yield target, frame
+
+
+def iter_sampled_frames(cap, indices, strategy=None, frame_count=None, info=None):
+    """
+    Like sample_frames, but yields (index, frame) for each distinct index as
+    soon as it is decoded, in increasing index order.
+    """
+    strategy = strategy or FRAME_SAMPLER
+    # The container's keyframe table beats a guess from codec and fps
+    gop_size = info["gop"] if info and info["gop"] else estimate_gop_size(cap)
+    if strategy == "auto":
+        if info and info["vfr"]:
+            # OpenCV turns a frame index into a timestamp at the average frame
+            # rate, so seeks land on the wrong frames when the rate varies
+            strategy = "sequential"
+        else:
+            if frame_count is None:
+                frame_count = info["frame_count"] if info else int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            strategy = choose_strategy(frame_count, len(indices), gop_size)
+
+    if strategy == "sequential":
+        return _sample_sequential(cap, indices)
+    if strategy == "seek":
+        return _sample_seek(cap, indices, gop_size)
+    raise ValueError(f"Unknown frame sampling strategy: {strategy!r}")
+
+
+def sample_frames(cap, indices, strategy=None, frame_count=None, info=None):
+    """
+    Decode the frames at `indices` from an opened cv2.VideoCapture.
+
+    Args:
+        cap: opened cv2.VideoCapture
+        indices: frame indices to return
+        strategy: "auto", "sequential" or "seek" (defaults to FRAME_SAMPLER)
+        frame_count: total frames, if already known
+        info: probe.probe_file() metadata (keyframe spacing, variable frame rate)
+
+    Returns:
+        list of BGR frames, one per entry of `indices` (frames that could not
+        be decoded are skipped)
+    """
+    frames = dict(iter_sampled_frames(cap, indices, strategy, frame_count, info))
+    return [frames[int(i)] for i in indices if int(i) in frames]
@@ -0,0 +1,210 @@
+"""
+Preforking API server: load once in a parent process, fork the workers.
+
+`uvicorn app:app --workers N` starts N fresh interpreters, so every worker
+loads the weights on its own. Here the parent preloads only the engine's
+weight arrays (memory-mapped from the .npy directories written by
+extract_weights.py), then forks WEB_WORKERS uvicorn workers that accept on
+one shared listening socket. The workers inherit those pages and share them
+with each other copy-on-write; the NumPy GRU head computes on them in place.
+
+The parent doesn't import the app: each worker imports it after the fork,
+so TensorFlow's thread pools, the MongoDB client and every other client or
+pool it creates belong to that worker alone (pymongo clients aren't
+fork-safe). Each worker builds its own Xception during warmup. The float32
+graph copies its weights into TensorFlow variables in every worker. The
+TFLite engines (INFERENCE_ENGINE=fp16/int8) map the .tflite file instead,
+and those pages are shared through the page cache.
+
+The parent restarts workers that exit and logs each worker's RSS, PSS and
+USS every MEMORY_REPORT_SEC, or immediately on SIGUSR1. With CPU_AFFINITY
+set, each worker is pinned to its own share of the cores (see cpu.py).
+Async jobs must be shared between workers (JOB_BACKEND=redis); with the
+in-memory backend a single worker is started. POSIX only.
+
+Usage (from backend/):
+    python serve.py [--workers 4] [--host 0.0.0.0] [--port 8000]
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from cpu import pin_cpus, worker_cpus
+from jobs import JOB_BACKEND
+from logger import get_logger
+from metrics import process_memory
+from worker_files import WORKER_ID_ENV
+
+log = get_logger("serve")
+
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "2"))
+# How often the parent logs per-worker memory (0 = only on SIGUSR1)
+MEMORY_REPORT_SEC = float(os.getenv("MEMORY_REPORT_SEC", "300"))
+# Time workers get to finish in-flight requests on shutdown before they are killed
+GRACEFUL_TIMEOUT_SEC = float(os.getenv("GRACEFUL_TIMEOUT_SEC", "30"))
+
+# A worker slot is restarted at most once per this many seconds
+_RESPAWN_DELAY_SEC = 1.0
+_POLL_SEC = 0.5
+
+
+def preload(workers):
+    """
+    Load the weight arrays the configured engine uses, without importing the
+    app or TensorFlow. Returns the app's import string for the workers.
+    """
+    from engines import get_engine
+    from weights import preload_weight_arrays, weights_exist
+
+    engine = get_engine()
+    size = sum(preload_weight_arrays(path) for path in engine.weight_paths() if weights_exist(path))
+    log.info(f"✅ Preloaded {size / 1e6:.0f} MB of weights for the {engine.name} engine, "
+             f"shared by {workers} workers")
+    return "app:app"
+
+
+def bind(host, port):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+# ============================================================
+#  Worker processes
+# ============================================================
+class Prefork:
+    def __init__(self, app, sock, workers=WEB_WORKERS, access_log=True):
+        self.app = app
+        self.sock = sock
+        self.workers = max(1, workers)
+        self.access_log = access_log
+        self._pids = {}      # slot -> pid
+        self._started = {}   # slot -> spawn time
+        self._stopping = False
+        self._report_now = False
+
+    def _spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(slot)
+        self._pids[slot] = pid
+        self._started[slot] = time.monotonic()
+        log.info(f"✅ Worker {slot} started (pid {pid})")
+
+    def _run_worker(self, slot):
+        code = 0
+        try:
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+                signal.signal(sig, signal.SIG_DFL)
+            # Read when the app starts up: the prediction journal and feature cache files are per worker
+            os.environ[WORKER_ID_ENV] = str(slot)
+            # Pin before TensorFlow and OpenCV start their thread pools, so they size to these cores
+            cpus = worker_cpus(slot, self.workers)
+            if cpus and pin_cpus(cpus):
+                log.info(f"Worker {slot} pinned to CPUs {cpus}")
+            config = uvicorn.Config(self.app, access_log=self.access_log)
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except BaseException as e:
+            log.error(f"Worker {os.getpid()} failed: {e}")
+            code = 1
+        finally:
+            # Never fall back into the parent's loop
+            os._exit(code)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGUSR1, self._on_report)
+        for slot in range(self.workers):
+            self._spawn(slot)
+        next_report = time.monotonic() + MEMORY_REPORT_SEC if MEMORY_REPORT_SEC > 0 else None
+        while not self._stopping:
+            self._reap()
+            now = time.monotonic()
+            for slot in range(self.workers):
+                if slot not in self._pids and now - self._started.get(slot, 0) >= _RESPAWN_DELAY_SEC:
+                    self._spawn(slot)
+            if self._report_now or (next_report is not None and now >= next_report):
+                self._report_now = False
+                self.report()
+                if next_report is not None:
+                    next_report = now + MEMORY_REPORT_SEC
+            time.sleep(_POLL_SEC)
+        self._shutdown()
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    def _on_report(self, signum, frame):
+        self._report_now = True
+
+    def _reap(self):
+        for slot, pid in list(self._pids.items()):
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                del self._pids[slot]
+                if not self._stopping:
+                    log.warning(f"⚠️ Worker {slot} (pid {pid}) exited with status {status}; restarting")
+
+    def _shutdown(self):
+        log.info(f"Stopping {len(self._pids)} workers...")
+        for pid in self._pids.values():
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT_SEC
+        while self._pids and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(_POLL_SEC)
+        for slot, pid in self._pids.items():
+            log.warning(f"⚠️ Worker {slot} (pid {pid}) did not stop in {GRACEFUL_TIMEOUT_SEC:.0f}s; killing it")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self._pids.clear()
+
+    def report(self):
+        """Log RSS/PSS/USS per process. Summed PSS is the real footprint of the whole server."""
+        rows = [("parent", os.getpid())] + [(f"worker {slot}", pid) for slot, pid in sorted(self._pids.items())]
+        total_pss = 0
+        for name, pid in rows:
+            memory = process_memory(pid)
+            if memory is None:
+                continue
+            total_pss += memory["pss"]
+            log.info(f"📊 {name:<9} pid {pid:<7} rss {memory['rss'] / 2**20:7.0f} MB  "
+                     f"pss {memory['pss'] / 2**20:7.0f} MB  uss {memory['uss'] / 2**20:7.0f} MB  "
+                     f"shared {memory['shared'] / 2**20:7.0f} MB")
+        log.info(f"📊 total pss {total_pss / 2**20:.0f} MB for {len(rows) - 1} workers")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    parser.add_argument("--no-access-log", action="store_true")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork; on this platform run: uvicorn app:app --workers N")
+    if args.workers > 1 and JOB_BACKEND == "memory":
+        # Each worker would have its own job table, and polls landing on another worker would 404
+        log.warning(f"⚠️ JOB_BACKEND=memory keeps async jobs inside one process; starting 1 worker "
+                    f"instead of {args.workers}. Set JOB_BACKEND=redis to run several.")
+        args.workers = 1
+
+    app = preload(args.workers)
+    sock = bind(args.host, args.port)
+    log.info(f"🚀 Listening on http://{args.host}:{args.port} with {args.workers} workers")
+    Prefork(app, sock, args.workers, access_log=not args.no_access_log).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""/batch job state seen from another API worker."""
+import json
+
+import pytest
+
+from batch_scoring import BatchJobManager
+
+
+def test_status_is_visible_to_other_managers(tmp_path):
+    owner = BatchJobManager(results_dir=str(tmp_path))
+    other = BatchJobManager(results_dir=str(tmp_path))
+    job_id = owner.submit(["a.mp4", "b.mp4"], job_id="job-1")
+
+    status = other.status(job_id)
+    assert status["status"] == "queued"
+    assert status["total"] == 2
+    assert "pid" not in status
+    assert other.results_path(job_id) == owner.results_path(job_id)
+
+
+def test_running_job_cannot_be_submitted_twice(tmp_path):
+    BatchJobManager(results_dir=str(tmp_path)).submit(["a.mp4"], job_id="job-1")
+    with pytest.raises(ValueError):
+        BatchJobManager(results_dir=str(tmp_path)).submit(["a.mp4"], job_id="job-1")
+
+
+def test_job_of_exited_worker_reads_as_interrupted(tmp_path):
+    manager = BatchJobManager(results_dir=str(tmp_path))
+    manager.submit(["a.mp4"], job_id="job-1")
+    path = manager.status_path("job-1")
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    state.update(status="running", pid=2**22 + 1)  # above Linux's pid_max: never a live process
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+    other = BatchJobManager(results_dir=str(tmp_path))
+    assert other.status("job-1")["status"] == "interrupted"
+    assert other.submit(["a.mp4"], job_id="job-1") == "job-1"
@@ -0,0 +1,36 @@
+"""/batch input paths: denied without BATCH_INPUT_ROOT, confined to it with one."""
+import os
+
+import pytest
+
+pytest.importorskip("tensorflow")
+pytest.importorskip("motor")
+
+from fastapi import HTTPException
+
+# Never contacted: importing the app only needs a URL to configure the client with
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:1/?serverSelectionTimeoutMS=300")
+
+import app  # noqa: E402
+
+
+def test_batch_is_refused_without_an_input_root(monkeypatch):
+    monkeypatch.setattr(app, "BATCH_INPUT_ROOT", None)
+    with pytest.raises(HTTPException) as e:
+        app._resolve_batch_paths(["/etc/passwd"])
+    assert e.value.status_code == 503
+
+
+def test_paths_are_resolved_against_the_root(tmp_path, monkeypatch):
+    root = tmp_path / "archive"
+    root.mkdir()
+    os.symlink("/etc", root / "escape")
+    monkeypatch.setattr(app, "BATCH_INPUT_ROOT", str(root))
+
+    real_root = os.path.realpath(root)
+    assert app._resolve_batch_paths(["a.mp4", str(root / "b" / "c.mp4")]) == [
+        os.path.join(real_root, "a.mp4"), os.path.join(real_root, "b", "c.mp4")]
+    for path in ("../a.mp4", "/etc/passwd", "escape/passwd"):
+        with pytest.raises(HTTPException) as e:
+            app._resolve_batch_paths([path])
+        assert e.value.status_code == 400
@@ -0,0 +1,43 @@
+"""NumPy GRU head vs Keras, on small random weights."""
+import numpy as np
+import pytest
+
+from gru_head import NumpyGRUHead
+
+tf = pytest.importorskip("tensorflow")
+
+INPUT_DIM = 32
+UNITS = 16
+STEPS = 10
+
+
+def _keras_head(reset_after, seed):
+    tf.keras.utils.set_random_seed(seed)
+    inputs = tf.keras.Input(shape=(STEPS, INPUT_DIM))
+    x = tf.keras.layers.GRU(UNITS, reset_after=reset_after, name="gru")(inputs)
+    outputs = tf.keras.layers.Dense(1, activation="sigmoid", name="dense")(x)
+    model = tf.keras.Model(inputs, outputs)
+    # Non-zero biases, so the bias layout is exercised too
+    rng = np.random.default_rng(seed)
+    model.set_weights([rng.normal(0, 0.5, size=w.shape).astype(np.float32) for w in model.get_weights()])
+    return model
+
+
+@pytest.mark.parametrize("reset_after", [True, False])
+def test_matches_keras(reset_after):
+    model = _keras_head(reset_after, seed=0)
+    head = NumpyGRUHead(*model.get_layer("gru").get_weights(), *model.get_layer("dense").get_weights())
+    features = np.random.default_rng(1).normal(0, 1, size=(4, STEPS, INPUT_DIM)).astype(np.float32)
+
+    expected = model.predict(features, verbose=0)[:, 0]
+    np.testing.assert_allclose(head.predict(features), expected, atol=1e-5)
+
+
+def test_batch_rows_are_independent():
+    model = _keras_head(True, seed=2)
+    head = NumpyGRUHead(*model.get_layer("gru").get_weights(), *model.get_layer("dense").get_weights())
+    features = np.random.default_rng(3).normal(0, 1, size=(3, STEPS, INPUT_DIM)).astype(np.float32)
+
+    batched = head.predict(features)
+    single = np.concatenate([head.predict(features[i:i + 1]) for i in range(3)])
+    np.testing.assert_allclose(batched, single, atol=1e-6)
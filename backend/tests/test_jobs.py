@@ -0,0 +1,75 @@
+"""Async job queues: shutdown of the in-memory queue and Redis leases."""
+import asyncio
+import time
+
+import pytest
+
+from jobs import InMemoryJobQueue, JobRunner, RedisJobQueue, new_job
+
+
+def test_queued_jobs_fail_and_lose_their_upload_at_shutdown(tmp_path):
+    upload = tmp_path / "clip.mp4"
+    upload.write_bytes(b"video")
+
+    async def scenario():
+        queue = InMemoryJobQueue()
+        job = new_job({"path": str(upload)})
+        await queue.submit(job)
+        runner = JobRunner(queue, handler=None, concurrency=0)
+        runner.start()
+        await runner.stop()
+        return await queue.get(job["id"])
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "failed"
+    assert job["finished_at"] is not None
+    assert not upload.exists()
+
+
+@pytest.fixture
+def redis_queue():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("redis")
+    queue = RedisJobQueue(lease=0.05, max_attempts=2)
+    queue._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    return queue
+
+
+def test_job_of_a_lost_worker_is_requeued_then_failed(redis_queue, tmp_path):
+    upload = tmp_path / "clip.mp4"
+    upload.write_bytes(b"video")
+
+    async def scenario():
+        job = new_job({"path": str(upload)})
+        await redis_queue.submit(job)
+        # First worker claims the job and dies without renewing
+        assert (await redis_queue.claim(timeout=1))["attempts"] == 1
+        await asyncio.sleep(0.1)
+        assert await redis_queue.requeue_expired() == 1
+        requeued = await redis_queue.get(job["id"])
+        # Second worker dies too: out of attempts
+        assert (await redis_queue.claim(timeout=1))["attempts"] == 2
+        await asyncio.sleep(0.1)
+        assert await redis_queue.requeue_expired() == 0
+        return requeued, await redis_queue.get(job["id"])
+
+    requeued, failed = asyncio.run(scenario())
+    assert requeued["status"] == "queued"
+    assert failed["status"] == "failed"
+    assert not upload.exists()
+
+
+def test_renewed_and_finished_jobs_are_left_alone(redis_queue):
+    async def scenario():
+        job = new_job({})
+        await redis_queue.submit(job)
+        await redis_queue.claim(timeout=1)
+        redis_queue.lease = 60
+        await redis_queue.renew(job["id"])
+        assert await redis_queue.requeue_expired() == 0
+        await redis_queue.update(job["id"], status="completed", finished_at=time.time())
+        return await redis_queue._redis.zcard(redis_queue.LEASE_KEY), await redis_queue.get(job["id"])
+
+    leases, job = asyncio.run(scenario())
+    assert leases == 0
+    assert job["status"] == "completed"
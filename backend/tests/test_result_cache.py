@@ -0,0 +1,89 @@
+"""Result cache invalidation by the model fingerprint."""
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+
+import result_cache
+from result_cache import ResultCache, model_fingerprint
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        doc = self.docs.get(query["_id"])
+        if doc is not None and doc["model_version"] == query["model_version"]:
+            return doc
+        return None
+
+    async def replace_one(self, query, doc, upsert=False):
+        self.docs[query["_id"]] = doc
+
+
+@pytest.fixture
+def weight_files(tmp_path, monkeypatch):
+    paths = []
+    for name in ("xception", "gru", "dense"):
+        path = str(tmp_path / f"{name}.npz")
+        np.savez(path, w=np.zeros(4, dtype=np.float32))
+        paths.append(path)
+    monkeypatch.setattr(result_cache, "XCEPTION_WEIGHTS_PATH", paths[0])
+    monkeypatch.setattr(result_cache, "GRU_WEIGHTS_PATH", paths[1])
+    monkeypatch.setattr(result_cache, "DENSE_WEIGHTS_PATH", paths[2])
+    return paths
+
+
+def test_replaced_weights_invalidate_entries(weight_files):
+    async def scenario():
+        cache = ResultCache(max_entries=8)
+        await cache.put("abc", "FAKE", 0.9)
+        assert await cache.get("abc") == ("FAKE", 0.9, None)
+
+        np.savez(weight_files[1], w=np.ones(8, dtype=np.float32))
+        st = os.stat(weight_files[1])
+        os.utime(weight_files[1], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        await cache.refresh()
+        return await cache.get("abc")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_unchanged_weights_keep_entries(weight_files):
+    async def scenario():
+        cache = ResultCache(max_entries=8)
+        await cache.put("abc", "REAL", 0.7)
+        await cache.refresh()
+        return await cache.get("abc")
+
+    assert asyncio.run(scenario()) == ("REAL", 0.7, None)
+
+
+def test_changed_threshold_misses_persisted_entries(weight_files):
+    async def scenario():
+        collection = FakeCollection()
+        await ResultCache(collection=collection, threshold=0.55).put("abc", "FAKE", 0.9)
+        same = await ResultCache(collection=collection, threshold=0.55).get("abc")
+        changed = await ResultCache(collection=collection, threshold=0.6).get("abc")
+        return same, changed
+
+    same, changed = asyncio.run(scenario())
+    assert same == ("FAKE", 0.9, None)
+    assert changed is None
+    assert model_fingerprint(0.55) != model_fingerprint(0.6)
+
+
+def test_window_timeline_is_cached_with_the_verdict(weight_files):
+    details = {"windows": 1, "aggregate": "mean",
+               "timeline": [{"start_sec": 0.0, "end_sec": 10.0, "label": "FAKE", "confidence": 0.8, "score": 0.2}]}
+
+    async def scenario():
+        collection = FakeCollection()
+        await ResultCache(collection=collection).put("abc", "FAKE", 0.8, details)
+        return await ResultCache(collection=collection).get("abc")
+
+    assert asyncio.run(scenario()) == ("FAKE", 0.8, details)
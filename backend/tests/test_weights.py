@@ -0,0 +1,63 @@
+"""Choosing between an .npz and its extracted .npy directory."""
+import os
+
+import numpy as np
+import pytest
+
+import weights
+from weights import load_weight_arrays, npy_dir, save_weight_arrays, weights_source
+
+
+@pytest.fixture
+def npz(tmp_path, monkeypatch):
+    monkeypatch.setattr(weights, "_fresh", {})
+    path = str(tmp_path / "head_weights.npz")
+    np.savez_compressed(path, np.ones((2, 3), np.float32), np.zeros(3, np.float32))
+    return path
+
+
+def _extract(path):
+    data = np.load(path)
+    save_weight_arrays(path, [data[f"arr_{i}"] for i in range(len(data.files))])
+    weights._fresh.clear()
+
+
+def test_prefers_extracted_directory(npz):
+    _extract(npz)
+    assert weights_source(npz) == npy_dir(npz)
+
+
+def test_replaced_npz_wins_over_stale_directory(npz):
+    _extract(npz)
+    np.savez_compressed(npz, np.full((2, 3), 7, np.float32), np.zeros(3, np.float32))
+    assert weights_source(npz) == npz
+    assert load_weight_arrays(npz)[0][0, 0] == 7
+
+
+def test_touched_npz_with_same_content_keeps_directory(npz):
+    _extract(npz)
+    st = os.stat(npz)
+    os.utime(npz, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert weights_source(npz) == npy_dir(npz)
+
+
+def test_directory_without_record_is_judged_by_mtime(npz):
+    _extract(npz)
+    os.remove(os.path.join(npy_dir(npz), "source.json"))
+    assert weights_source(npz) == npy_dir(npz)
+    weights._fresh.clear()
+    later = os.path.getmtime(npz) + 60
+    os.utime(npz, (later, later))
+    assert weights_source(npz) == npz
+
+
+def test_digest_follows_contents_not_files(npz):
+    before = weights.weights_digest(npz)
+    _extract(npz)
+    assert weights.weights_digest(npz) == before
+    st = os.stat(npz)
+    os.utime(npz, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert weights.weights_digest(npz) == before
+    weights._fresh.clear()
+    np.savez_compressed(npz, np.full((2, 3), 7, np.float32), np.zeros(3, np.float32))
+    assert weights.weights_digest(npz) != before
@@ -0,0 +1,57 @@
+"""InferencePool admission: slots, measured waiters and load shedding."""
+import asyncio
+
+import pytest
+
+from worker_pool import InferencePool, PoolFullError
+
+
+def test_waiters_are_counted_and_excess_rejected():
+    async def scenario():
+        pool = InferencePool(max_workers=1, max_queue=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with pool.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert (pool.in_flight, pool.queue_depth) == (1, 1)
+        assert not pool.has_free_slot()
+        with pytest.raises(PoolFullError):
+            async with pool.slot():
+                pass
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert (pool.in_flight, pool.queue_depth, pool.rejected) == (0, 0, 1)
+    assert pool.has_free_slot()
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        pool = InferencePool(max_workers=1, max_queue=4)
+        release = asyncio.Event()
+
+        async def hold():
+            async with pool.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert pool.queue_depth == 0
+        release.set()
+        await holder
+        async with pool.slot():
+            return pool.in_flight
+
+    assert asyncio.run(scenario()) == 1
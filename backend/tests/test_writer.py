@@ -0,0 +1,95 @@
+"""PredictionWriter journaling when several writers share one journal."""
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("bson")
+
+from bson import ObjectId
+
+from database.writer import PredictionWriter
+
+
+class FakeCollection:
+    def __init__(self):
+        self.up = False
+        self.docs = {}
+
+    async def insert_many(self, docs, ordered=False):
+        await asyncio.sleep(0)
+        if not self.up:
+            raise ConnectionError("database down")
+        for doc in docs:
+            self.docs.setdefault(doc["_id"], doc)
+
+
+def _writer(collection, path):
+    return PredictionWriter(collection, batch_size=5, flush_interval=0.01, max_buffer=1,
+                            journal_path=str(path))
+
+
+def test_shared_journal_is_replayed_once_and_writers_survive(tmp_path):
+    async def scenario():
+        collection = FakeCollection()
+        path = tmp_path / "journal" / "predictions.jsonl"
+        writers = [_writer(collection, path), _writer(collection, path)]
+        for writer in writers:
+            writer.start()
+        # max_buffer=1: everything past the first document spills to the shared journal
+        for i in range(40):
+            writers[i % 2].enqueue({"n": i})
+        await asyncio.sleep(0.1)
+        collection.up = True
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if len(collection.docs) == 40 and not any(w.journal_pending() for w in writers):
+                break
+        alive = [writer._task is not None and not writer._task.done() for writer in writers]
+        for writer in writers:
+            await writer.stop()
+        return collection, alive
+
+    collection, alive = asyncio.run(scenario())
+    assert alive == [True, True]
+    assert sorted(doc["n"] for doc in collection.docs.values()) == list(range(40))
+
+
+def test_unreadable_journal_line_is_skipped(tmp_path):
+    async def scenario():
+        collection = FakeCollection()
+        collection.up = True
+        path = tmp_path / "predictions.jsonl"
+        writer = _writer(collection, path)
+        writer._journal([(0.0, {"_id": ObjectId(), "n": 1})])
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"_id": "cut sho')
+        assert await writer._replay_journal()
+        return collection, writer
+
+    collection, writer = asyncio.run(scenario())
+    assert [doc["n"] for doc in collection.docs.values()] == [1]
+    assert not writer.journal_pending()
+
+
+def test_journal_io_stays_off_the_event_loop(tmp_path):
+    async def scenario():
+        collection = FakeCollection()
+        writer = _writer(collection, tmp_path / "predictions.jsonl")
+        threads = []
+        journal = writer._journal
+
+        def recording_journal(batch):
+            threads.append(threading.current_thread().name)
+            journal(batch)
+
+        writer._journal = recording_journal
+        writer.start()
+        for i in range(5):
+            writer.enqueue({"n": i})
+        await writer.stop()
+        return threads, writer
+
+    threads, writer = asyncio.run(scenario())
+    assert threads and all(name.startswith("journal") for name in threads)
+    assert writer.journaled == 5
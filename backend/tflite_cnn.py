@@ -0,0 +1,109 @@
+"""
+Reduced-precision Xception runtime (TFLite, XNNPACK on CPU).
+
+The .tflite files are built by quantize.py from the custom-weighted base
+CNN. A JSON sidecar records a content hash of the weights and the input
+scaling they were built from, so a stale file is refused instead of
+silently serving features from old weights.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+from cpu import available_cpus
+from weights import source_signature, weights_digest
+
+TFLITE_MODES = ("fp16", "int8")
+TFLITE_DIR = "saved_models"
+# Interpreter threads per process (XNNPACK parallelizes each forward pass);
+# 0 = one per CPU the process may run on, counted when the model is loaded
+TFLITE_THREADS = int(os.getenv("TFLITE_THREADS", "0"))
+
+
+def tflite_path(mode, directory=TFLITE_DIR):
+    return os.path.join(directory, f"xception_{mode}.tflite")
+
+
+def metadata_path(path):
+    return path + ".json"
+
+
+def write_metadata(path, metadata):
+    with open(metadata_path(path), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+
+def read_metadata(path):
+    with open(metadata_path(path), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def tflite_signature(mode):
+    """Size/mtime signature of the .tflite file for `mode`, for cache invalidation."""
+    return f"{mode}|{source_signature(tflite_path(mode))}"
+
+
+def _interpreter_class():
+    # The standalone LiteRT runtime if installed, otherwise the copy bundled with TensorFlow
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+# ============================================================
+#  Interpreter wrapper
+# ============================================================
+class TFLiteCNN:
+    """
+    Runs a converted Xception model over (n, 299, 299, 3) float32 frames and
+    returns (n, 2048) features, like model._run_cnn. The interpreter isn't
+    thread-safe, so calls are serialized.
+    """
+
+    def __init__(self, path, num_threads=TFLITE_THREADS):
+        self.path = path
+        num_threads = num_threads or len(available_cpus())
+        self._interpreter = _interpreter_class()(model_path=path, num_threads=num_threads)
+        self._input = self._interpreter.get_input_details()[0]["index"]
+        self._output = self._interpreter.get_output_details()[0]["index"]
+        self._batch = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, mode, weights_path, preprocess, num_threads=TFLITE_THREADS):
+        """Load the model for `mode`, refusing it if it was built from other weights or scaling."""
+        if mode not in TFLITE_MODES:
+            raise ValueError(f"Unknown TFLite mode: {mode!r} (expected one of {TFLITE_MODES})")
+        path = tflite_path(mode)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; build it with: python quantize.py convert --mode {mode}")
+        metadata = read_metadata(path)
+        if metadata.get("weights_sha256") != weights_digest(weights_path):
+            raise ValueError(f"{path} was built from different Xception weights; re-run quantize.py convert")
+        if metadata.get("preprocess") != preprocess:
+            raise ValueError(f"{path} was calibrated for XCEPTION_PREPROCESS={metadata.get('preprocess')!r}, "
+                             f"not {preprocess!r}")
+        return cls(path, num_threads)
+
+    def _resize(self, batch):
+        if batch != self._batch:
+            self._interpreter.resize_tensor_input(self._input, [batch, 299, 299, 3])
+            self._interpreter.allocate_tensors()
+            self._batch = batch
+
+    def run(self, frames, batch_size):
+        frames = np.asarray(frames, dtype=np.float32)
+        features = []
+        with self._lock:
+            for start in range(0, len(frames), batch_size):
+                batch = frames[start:start + batch_size]
+                self._resize(len(batch))
+                self._interpreter.set_tensor(self._input, batch)
+                self._interpreter.invoke()
+                features.append(self._interpreter.get_tensor(self._output).copy())
+        return np.concatenate(features, axis=0)
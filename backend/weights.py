@@ -0,0 +1,190 @@
+"""
+Weight file loading.
+
+Weights come either as the compressed .npz files saved in Colab
+(saved_models/xception_weights.npz, ...) or as a directory of uncompressed
+.npy files next to them (saved_models/xception_weights/arr_0.npy, ...) written
+by extract_weights.py. The .npy directory is preferred: arrays are
+memory-mapped instead of decompressed, so loading is close to free and the
+pages can be shared between processes.
+
+extract_weights.py records which .npz each directory came from (size, mtime
+and SHA-256). If the .npz is replaced afterwards, the directory is stale: the
+.npz is loaded instead, with a warning to re-run the extraction, so new
+weights are never shadowed by old ones.
+
+serve.py preloads the arrays in its parent process before forking workers,
+so every worker reuses the same mappings (or, for .npz files, the same
+decompressed arrays, copy-on-write) instead of loading its own. This module
+doesn't import TensorFlow, so the parent never does.
+"""
+import hashlib
+import json
+from mmap import PAGESIZE
+import os
+
+import numpy as np
+
+from logger import get_logger
+
+log = get_logger("weights")
+
+# Weights of the deployed model, as saved in Colab
+XCEPTION_WEIGHTS_PATH = "saved_models/xception_weights.npz"
+GRU_WEIGHTS_PATH = "saved_models/gru_weights.npz"
+DENSE_WEIGHTS_PATH = "saved_models/dense_weights.npz"
+
+# npz path -> arrays loaded by preload_weight_arrays(), inherited by forked workers
+_preloaded = {}
+# .npy directory -> whether it still matches its .npz (checked once per process)
+_fresh = {}
+# source_signature() -> weights_digest(), so each set of files is hashed once per process
+_digests = {}
+
+# Written by save_weight_arrays() next to the arr_<i>.npy files
+_SOURCE_FILE = "source.json"
+
+
+def npy_dir(npz_path):
+    """Directory holding the uncompressed .npy arrays for an .npz path."""
+    return os.path.splitext(npz_path)[0]
+
+
+def _npy_files(directory):
+    files = [f for f in os.listdir(directory) if f.startswith("arr_") and f.endswith(".npy")]
+    return [os.path.join(directory, f) for f in sorted(files, key=lambda f: int(f[4:-4]))]
+
+
+def weights_exist(npz_path):
+    return weights_source(npz_path) is not None
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _npz_stamp(npz_path, with_hash=False):
+    st = os.stat(npz_path)
+    stamp = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if with_hash:
+        stamp["sha256"] = _file_sha256(npz_path)
+    return stamp
+
+
+def _directory_is_fresh(npz_path, directory):
+    """Whether the .npy directory was extracted from the current .npz."""
+    try:
+        with open(os.path.join(directory, _SOURCE_FILE), encoding="utf-8") as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        # Extracted before sources were recorded: go by modification times
+        newest = max(os.path.getmtime(path) for path in _npy_files(directory))
+        return os.path.getmtime(npz_path) <= newest
+    current = _npz_stamp(npz_path)
+    if current["size"] != recorded.get("size"):
+        return False
+    if current["mtime_ns"] == recorded.get("mtime_ns"):
+        return True
+    # Touched or copied without preserving times: compare contents
+    return _file_sha256(npz_path) == recorded.get("sha256")
+
+
+def weights_source(npz_path):
+    """
+    The path weights will actually be loaded from, or None. The .npy
+    directory is preferred unless its .npz has changed since extraction.
+    """
+    directory = npy_dir(npz_path)
+    has_directory = os.path.isdir(directory) and bool(_npy_files(directory))
+    if not os.path.exists(npz_path):
+        return directory if has_directory else None
+    if not has_directory:
+        return npz_path
+    if directory not in _fresh:
+        _fresh[directory] = _directory_is_fresh(npz_path, directory)
+        if not _fresh[directory]:
+            log.warning(f"⚠️ {npz_path} is newer than {directory}/; loading the .npz. "
+                        f"Re-run extract_weights.py --from-npz to memory-map it again.")
+    return directory if _fresh[directory] else npz_path
+
+
+def load_weight_arrays(npz_path, mmap=True):
+    """
+    Load the list of weight arrays (arr_0, arr_1, ...) for `npz_path`.
+    From the .npy directory they are memory-mapped read-only when `mmap` is set.
+    Preloaded arrays are returned as they are.
+    """
+    if mmap and npz_path in _preloaded:
+        return _preloaded[npz_path]
+    source = weights_source(npz_path)
+    if source is None:
+        raise FileNotFoundError(f"No weights found at {npz_path} or {npy_dir(npz_path)}/")
+    if os.path.isdir(source):
+        return [np.load(path, mmap_mode="r" if mmap else None) for path in _npy_files(source)]
+    data = np.load(source)
+    return [data[f"arr_{i}"] for i in range(len(data.files))]
+
+
+def preload_weight_arrays(npz_path):
+    """
+    Load the arrays for `npz_path` once and fault in every page, so that
+    load_weight_arrays() in this process and in processes forked from it
+    returns them without touching the disk. Returns the size in bytes.
+    """
+    arrays = load_weight_arrays(npz_path)
+    for array in arrays:
+        # One read per page brings the mapping into memory
+        array.reshape(-1).view(np.uint8)[::PAGESIZE].sum()
+    _preloaded[npz_path] = arrays
+    return sum(array.nbytes for array in arrays)
+
+
+def save_weight_arrays(npz_path, arrays):
+    """Write `arrays` uncompressed as <npz_path without .npz>/arr_<i>.npy."""
+    directory = npy_dir(npz_path)
+    os.makedirs(directory, exist_ok=True)
+    for stale in _npy_files(directory):
+        os.remove(stale)
+    for i, array in enumerate(arrays):
+        np.save(os.path.join(directory, f"arr_{i}.npy"), np.ascontiguousarray(array))
+    record = os.path.join(directory, _SOURCE_FILE)
+    if os.path.exists(npz_path):
+        with open(record, "w", encoding="utf-8") as f:
+            json.dump(_npz_stamp(npz_path, with_hash=True), f)
+    elif os.path.exists(record):
+        os.remove(record)
+    _fresh.pop(directory, None)
+    return directory
+
+
+def source_signature(npz_path):
+    """Size/mtime signature of the weights in use, for cache invalidation."""
+    source = weights_source(npz_path)
+    if source is None:
+        return f"{npz_path}:missing"
+    paths = _npy_files(source) if os.path.isdir(source) else [source]
+    parts = []
+    for path in paths:
+        st = os.stat(path)
+        parts.append(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}")
+    return f"{source}|" + ",".join(parts)
+
+
+def weights_digest(npz_path):
+    """
+    SHA-256 of the weight arrays' shapes, dtypes and contents. Unlike
+    source_signature() it is the same for the .npz and its .npy directory,
+    and survives checkouts and copies that don't keep modification times.
+    """
+    signature = source_signature(npz_path)
+    if signature not in _digests:
+        h = hashlib.sha256()
+        for array in load_weight_arrays(npz_path):
+            h.update(f"{array.dtype.str}{array.shape}|".encode())
+            h.update(np.ascontiguousarray(array).reshape(-1).view(np.uint8))
+        _digests[signature] = h.hexdigest()
+    return _digests[signature]
@@ -0,0 +1,224 @@
+"""
+Sliding-window scoring for long videos.
+
+The GRU head is trained on 10-frame sequences, so sampling 10 frames across
+minutes of footage says little about any part of it. Instead, frames are
+sampled at a fixed rate (WINDOW_SAMPLE_FPS) in one sequential decode pass,
+grouped into consecutive 10-frame windows, and every window is scored. The
+window scores give a per-segment timeline and are aggregated into one
+verdict for the video.
+
+Decoding is streamed in chunks of WINDOW_CHUNK_FRAMES: only one chunk of
+preprocessed frames plus the last few feature vectors are held at a time,
+so memory stays flat however long the video is.
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+from face_crop import FACE_CROP, face_tracker
+from metrics import STAGE_SECONDS
+from preprocessing import FRAME_SIZE, normalize_frames, to_model_pixels
+from probe import probe_file
+
+# Videos longer than this are scored in windows instead of one 10-frame sample
+WINDOWED_MIN_DURATION_SEC = float(os.getenv("WINDOWED_MIN_DURATION_SEC", "30"))
+# Longest video accepted at all; one costs duration x WINDOW_SAMPLE_FPS Xception frames
+WINDOWED_MAX_DURATION_SEC = float(os.getenv("WINDOWED_MAX_DURATION_SEC", "600"))
+# Frames sampled per second of video (1.0 -> each window covers 10 s)
+WINDOW_SAMPLE_FPS = float(os.getenv("WINDOW_SAMPLE_FPS", "1.0"))
+# Sampled frames between window starts (10 = back to back, 5 = half overlap)
+WINDOW_STRIDE = int(os.getenv("WINDOW_STRIDE", "10"))
+# Frames decoded and sent through Xception at a time
+WINDOW_CHUNK_FRAMES = int(os.getenv("WINDOW_CHUNK_FRAMES", "40"))
+# How window scores become the video score: "mean", or "min" (the most fake window decides)
+WINDOW_AGGREGATE = os.getenv("WINDOW_AGGREGATE", "mean")
+WINDOW_AGGREGATES = ("mean", "min")
+
+WINDOW_SIZE = 10
+
+
+def windowed_signature():
+    """Settings that change long-video results, for result cache invalidation."""
+    return (f"min={WINDOWED_MIN_DURATION_SEC}|fps={WINDOW_SAMPLE_FPS}|stride={WINDOW_STRIDE}"
+            f"|aggregate={WINDOW_AGGREGATE}")
+
+
+# ============================================================
+#  Streamed decoding
+# ============================================================
+def iter_frame_chunks(video_path, sample_fps=WINDOW_SAMPLE_FPS, chunk_frames=WINDOW_CHUNK_FRAMES, info=None):
+    """
+    Yield (timestamps, frames) chunks: up to `chunk_frames` preprocessed
+    (n, 299, 299, 3) float32 frames sampled every 1/sample_fps seconds, from
+    one sequential pass over the video. `info` is the probed header, if the
+    caller already has it.
+    """
+    if info is None:
+        info = probe_file(video_path)
+    cap = cv2.VideoCapture(video_path)
+    try:
+        # Average rate from the container's frame table: OpenCV reports the
+        # nominal rate, far off for variable-frame-rate files
+        fps = info["fps"] if info else cap.get(cv2.CAP_PROP_FPS)
+        if not fps or fps <= 0 or fps > 1000:
+            fps = 30.0
+        step = max(1, int(round(fps / sample_fps)))
+        tracker = face_tracker() if FACE_CROP else None
+        pixels = np.empty((chunk_frames, FRAME_SIZE, FRAME_SIZE, 3), dtype=np.uint8)
+        timestamps = []
+        index = 0
+        # Stage time is summed per chunk rather than recorded per frame
+        stages = dict.fromkeys(("decode", "face_crop", "resize"), 0.0)
+        while True:
+            start = time.perf_counter()
+            ok = cap.grab()
+            frame = None
+            if ok and index % step == 0:
+                ok, frame = cap.retrieve()
+            stages["decode"] += time.perf_counter() - start
+            if not ok:
+                break
+            if frame is not None:
+                if tracker is not None:
+                    start = time.perf_counter()
+                    frame = tracker.crop(frame)
+                    stages["face_crop"] += time.perf_counter() - start
+                start = time.perf_counter()
+                to_model_pixels(frame, out=pixels[len(timestamps)])
+                stages["resize"] += time.perf_counter() - start
+                timestamps.append(index / fps)
+                if len(timestamps) == chunk_frames:
+                    yield _finish_chunk(pixels, timestamps, stages)
+                    timestamps = []
+            index += 1
+        if timestamps:
+            yield _finish_chunk(pixels, timestamps, stages)
+    finally:
+        cap.release()
+
+
+def _finish_chunk(pixels, timestamps, stages):
+    # A fresh float32 block per chunk: the previous one may still be in the CNN batch
+    count = len(timestamps)
+    start = time.perf_counter()
+    frames = np.empty((count, FRAME_SIZE, FRAME_SIZE, 3), dtype=np.float32)
+    normalize_frames(pixels[:count], frames)
+    stages["resize"] += time.perf_counter() - start
+    for stage, seconds in stages.items():
+        if seconds:
+            STAGE_SECONDS.observe(seconds, stage=stage)
+        stages[stage] = 0.0
+    return np.asarray(timestamps), frames
+
+
+# ============================================================
+#  Windows and aggregation
+# ============================================================
+class WindowAccumulator:
+    """
+    Turns a stream of per-frame features into 10-frame windows, `stride`
+    frames apart. Only the features a future window can still use are kept.
+    """
+
+    def __init__(self, size=WINDOW_SIZE, stride=WINDOW_STRIDE):
+        self.size = size
+        self.stride = max(1, min(stride, size))
+        self._features = np.empty((0, 2048), dtype=np.float32)
+        self._times = np.empty(0)
+        self._first = 0        # absolute index of self._features[0]
+        self._next_start = 0   # absolute index where the next window starts
+        self._total = 0
+        self._last_end = 0     # absolute end (exclusive) of the last emitted window
+
+    def add(self, features, timestamps):
+        """Append features; return the (start_time, end_time, (10, 2048) features) windows completed."""
+        self._features = np.concatenate([self._features, np.asarray(features, dtype=np.float32)])
+        self._times = np.concatenate([self._times, timestamps])
+        self._total += len(features)
+        windows = []
+        while self._next_start + self.size <= self._total:
+            windows.append(self._window(self._next_start))
+            self._next_start += self.stride
+        # Keep enough for the next window, and for a final window aligned to the end
+        keep_from = max(0, min(self._next_start, self._total - self.size))
+        drop = keep_from - self._first
+        if drop > 0:
+            self._features = self._features[drop:]
+            self._times = self._times[drop:]
+            self._first = keep_from
+        return windows
+
+    def finish(self):
+        """Windows covering the tail: one aligned to the end, or a stretched one for short videos."""
+        if self._total == 0:
+            return []
+        if self._total < self.size:
+            # Too short for a full window: repeat frames up to 10 timesteps
+            idx = np.linspace(0, self._total - 1, self.size).round().astype(int)
+            return [(self._times[0], self._times[-1], self._features[idx])]
+        if self._last_end < self._total:
+            return [self._window(self._total - self.size)]
+        return []
+
+    def _window(self, start):
+        rel = start - self._first
+        self._last_end = start + self.size
+        return self._times[rel], self._times[rel + self.size - 1], self._features[rel:rel + self.size]
+
+
+def aggregate(scores, method=WINDOW_AGGREGATE):
+    if method == "mean":
+        return float(np.mean(scores))
+    if method == "min":
+        return float(np.min(scores))
+    raise ValueError(f"Unknown WINDOW_AGGREGATE: {method!r} (expected one of {WINDOW_AGGREGATES})")
+
+
+def build_result(spans, scores, threshold, label_from_score, sample_fps=WINDOW_SAMPLE_FPS):
+    """
+    Video verdict plus timeline from the window (start, end) times and scores.
+    Each timeline entry spans from its first sampled frame to one sample
+    interval past its last.
+    """
+    if not scores:
+        raise ValueError("Could not decode any frames")
+    interval = 1.0 / sample_fps
+    timeline = []
+    for (start, end), score in zip(spans, scores):
+        label, confidence = label_from_score(score, threshold)
+        timeline.append({"start_sec": round(float(start), 2), "end_sec": round(float(end) + interval, 2),
+                         "label": label, "confidence": confidence, "score": round(float(score), 4)})
+    label, confidence = label_from_score(aggregate(scores), threshold)
+    return {
+        "label": label,
+        "confidence": confidence,
+        "windows": len(timeline),
+        "aggregate": WINDOW_AGGREGATE,
+        "timeline": timeline,
+    }
+
+
+def score_windowed(video_path, threshold, extract, classify, label_from_score):
+    """
+    Synchronous windowed scoring.
+
+    Args:
+        extract: (n, 299, 299, 3) frames -> (n, 2048) features
+        classify: (batch, 10, 2048) windows -> (batch,) raw scores
+    """
+    accumulator = WindowAccumulator()
+    spans, scores = [], []
+
+    def score(ready):
+        if ready:
+            scores.extend(float(s) for s in classify(np.stack([features for _, _, features in ready])))
+            # Only the times are kept; the window features are dropped here
+            spans.extend((start, end) for start, end, _ in ready)
+
+    for timestamps, frames in iter_frame_chunks(video_path):
+        score(accumulator.add(extract(frames), timestamps))
+    score(accumulator.finish())
+    return build_result(spans, scores, threshold, label_from_score)
@@ -0,0 +1,26 @@
+"""
+Per-worker file names for the API workers started by serve.py.
+
+serve.py sets WEB_WORKER_ID in each worker it forks. Files a process keeps
+appending to or maps read-write (the prediction journal, the feature
+cache's disk tier) get the worker's slot in their name, so no two workers
+write the same file. A restarted worker gets its slot back, and with it the
+journal its predecessor left behind. Outside serve.py names are unchanged.
+"""
+import os
+
+WORKER_ID_ENV = "WEB_WORKER_ID"
+
+
+def worker_id():
+    """This process's serve.py worker slot, or None."""
+    return os.getenv(WORKER_ID_ENV) or None
+
+
+def worker_path(path):
+    """`path` with the worker slot before its extension: journal/predictions.w1.jsonl."""
+    slot = worker_id()
+    if slot is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.w{slot}{ext}"
@@ -0,0 +1,114 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+# Pool sizing: "thread" or "process" workers, and how many requests may wait
+# for a worker before new ones are turned away.
+INFERENCE_POOL_KIND = os.getenv("INFERENCE_POOL_KIND", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "16"))
+
+
+class PoolFullError(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+# ============================================================
+#  Bounded worker pool for blocking inference work
+# ============================================================
+class InferencePool:
+    """
+    Runs CPU-bound work (decode, preprocessing) off the asyncio event loop.
+
+    Requests are admitted with `slot()` once their upload is on disk, for
+    decode and inference only. At most `max_workers` hold a slot at once and
+    at most `max_queue` more wait for one; beyond that `slot()` raises
+    PoolFullError so the API can shed load instead of queueing without limit.
+    """
+
+    def __init__(self, kind=INFERENCE_POOL_KIND, max_workers=INFERENCE_WORKERS, max_queue=INFERENCE_MAX_QUEUE):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown pool kind: {kind!r} (expected 'thread' or 'process')")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._slots = None
+        self._executor = None
+        self._thread_executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        return self._executor
+
+    @property
+    def thread_executor(self):
+        """
+        Threads for work that can't be sent to another process, such as a
+        decoder that keeps state between calls: the pool itself for
+        kind="thread", else a thread pool of the same size.
+        """
+        if self.kind == "thread":
+            return self.executor
+        if self._thread_executor is None:
+            self._thread_executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                       thread_name_prefix="inference-stateful")
+        return self._thread_executor
+
+    def shutdown(self):
+        for executor in (self._executor, self._thread_executor):
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        self._thread_executor = None
+
+    @property
+    def queue_depth(self):
+        """Requests waiting for a slot right now."""
+        return self.waiting
+
+    def has_free_slot(self):
+        return self._slots is None or not self._slots.locked()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of `max_workers` slots, waiting for it if needed; PoolFullError if the wait queue is full."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise PoolFullError(f"Inference queue is full ({self.waiting} waiting)")
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def run(self, fn, *args):
+        """Run a blocking function on the pool and await its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "rejected": self.rejected,
+        }